@@ -1,44 +1,49 @@
 """
-AI service module: generate Bazi interpretations using the OpenAI API.
-If the OpenAI API is not available, this module can be adapted to other AI
-services (for example Claude, local models, etc.).
+AI service module: generate Bazi interpretations and chat replies through the
+pluggable provider layer in llm_providers (OpenAI, OpenAI-compatible servers,
+or the local stub). Without a configured provider it falls back to rule-based
+interpretations.
 """
-import os
-from typing import Optional
+from typing import Iterator, Optional
 
 try:
-    import openai
-    OPENAI_AVAILABLE = True
+    from . import llm_providers
+    from .chat_context import build_chat_context
+    from .interpretation_cache import get_store as get_interpretation_store
 except ImportError:
-    OPENAI_AVAILABLE = False
+    import llm_providers
+    from chat_context import build_chat_context
+    from interpretation_cache import get_store as get_interpretation_store
 
 # You can also plug in other AI services here (for example via HTTP APIs).
-def generate_bazi_interpretation(
-    year_pillar: dict,
-    month_pillar: dict,
+def generate_signature_interpretation(
     day_pillar: dict,
-    hour_pillar: Optional[dict] = None,
+    element_balance: Optional[str],
+    use_god: Optional[str],
+    avoid_god: Optional[str],
     language: str = "zh",
     analysis_focus: Optional[str] = None,
 ) -> Optional[str]:
     """
-    Generate a Bazi (Four Pillars) interpretation using an AI API.
+    AI interpretation of a chart signature (see interpretation_cache.chart_signature).
+    The prompt holds only the signature fields, so the text fits every chart that
+    shares the signature and can be cached under it. Provider errors are raised.
+    """
+    signature_info = f"日柱（日主）：{day_pillar['stem']}{day_pillar['branch']}（{day_pillar['element']}）"
+    signature_info += f"\n五行平衡：{element_balance or '未知'}"
+    signature_info += f"\n用神：{use_god or '无'}；忌神：{avoid_god or '无'}"
+    return _complete_interpretation(_interpretation_prompt(signature_info, SIGNATURE_HEADINGS, language, analysis_focus))
 
-    Args:
-        year_pillar, month_pillar, day_pillar, hour_pillar: Four Pillars info.
-        language: language code (\"zh\", \"en\", \"mi\").
-        analysis_focus: optional focus area for the interpretation.
 
-    Returns:
-        Interpretation text, or None if generation fails.
-    """
-    # 构建八字信息
-    pillars_info = f"年柱：{year_pillar['stem']}{year_pillar['branch']}（{year_pillar['element']}）"
-    pillars_info += f"\n月柱：{month_pillar['stem']}{month_pillar['branch']}（{month_pillar['element']}）"
-    pillars_info += f"\n日柱：{day_pillar['stem']}{day_pillar['branch']}（{day_pillar['element']}）"
-    if hour_pillar:
-        pillars_info += f"\n时柱：{hour_pillar['stem']}{hour_pillar['branch']}（{hour_pillar['element']}）"
-    
+# 提示词末尾的命盘信息标题
+SIGNATURE_HEADINGS = {
+    "zh": "命盘特征如下（只给出日柱与五行结构，请据此分析，不要推断或提及年柱、月柱、时柱）：",
+    "en": "Chart features (only the day pillar and the element structure are given; do not infer or mention the year, month or hour pillars):",
+    "mi": "Ngā āhuatanga o te mahere (ko te pou rā me te hanganga o ngā Rima anake; kaua e whakaaro, e whakahua rānei i ngā pou tau, marama, hāora):",
+}
+
+
+def _interpretation_prompt(chart_info: str, headings: dict, language: str, analysis_focus: Optional[str]) -> str:
     # 额外的侧重点说明（命运 / 财运 / 事业 / 感情 / 健康 / 家庭等）
     focus_map_zh = {
         "career": "在分析时，请在保持整体结构的前提下，更加聚焦于事业、专业发展、职业节奏与合作模式的解读；",
@@ -70,8 +75,8 @@ def generate_bazi_interpretation(
 - 建议要偏向方向性和日常行为调整，而不是保证具体结果；
 - 语气务实、温和、可信，避免夸张、恐吓或宿命论。
 
-四柱信息如下（如时柱缺失，可说明信息有限）：
-{pillars_info}""",
+{headings['zh']}
+{chart_info}""",
         "en": f"""You are a professional and experienced Bazi (Four Pillars) analyst.
 Your task is NOT to mystically predict the future, but to give an explanatory analysis
 of the person's current life pattern, strengths and potential challenges,
@@ -91,8 +96,8 @@ Guidelines:
 - Suggestions should be directional (mindset, behavior, focus), not promises of specific outcomes;
 - Keep the tone steady, warm and non-fatalistic.
 
-Four Pillars:
-{pillars_info}""",
+{headings['en']}
+{chart_info}""",
         "mi": f"""He mātanga koe mō te tātari Bazi (Ngā Pou e Whā), he tōtika, he whai wheako.
 Ehara tō mahi i te matapae makutu i te āpōpō, engari he whakamārama i ngā tauira oranga o nāianei,
 ngā kaha me ngā wero pea, i runga i te hanganga o ngā pou, ngā rima o ngā mea, me ngā Atua Tekau.
@@ -111,43 +116,67 @@ Arataki:
 - Me whakaatu tohutohu aronga noa mō te whanonga me te wairua, kaua e whakapūmau hua;
 - Kia mārie te reo, kaua e whakamataku, kaua hoki e hāngai ki te matapōkere.
 
-Ngā Pou e Whā:
-{pillars_info}"""
+{headings['mi']}
+{chart_info}"""
     }
     
-    prompt = prompts.get(language, prompts["zh"])
-    
-    # Method 1: use the OpenAI API
-    if OPENAI_AVAILABLE:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if api_key:
-            try:
-                from openai import OpenAI
-                client = OpenAI(api_key=api_key)
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "你是一位专业的命理师，擅长用通俗易懂的语言解读八字。"},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=300,
-                    temperature=0.7,
-                )
-                return response.choices[0].message.content.strip()
-            except Exception as e:
-                print(f"OpenAI API error: {e}")
-    
-    # Method 2: use HTTP requests to call other AI services (examples):
-    # - Anthropic Claude API
-    # - locally deployed models
-    # - other AI providers
-    
+    return prompts.get(language, prompts["zh"])
+
+
+def _complete_interpretation(prompt: str) -> Optional[str]:
+    return llm_providers.complete(
+        "interpretation",
+        [
+            {"role": "system", "content": "你是一位专业的命理师，擅长用通俗易懂的语言解读八字。"},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=300,
+        temperature=0.7,
+    ) or None
+
+
+def get_cached_interpretation(
+    signature: str,
+    chart,
+    language: str = "zh",
+    analysis_focus: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Interpretation for a chart signature: served from the interpretation store when
+    present (see warm_interpretations.py), otherwise generated from the signature
+    fields and written through. Rule-based fallbacks are returned but never stored.
+    """
+    # Method 1: a stored interpretation for the signature
+    store = get_interpretation_store()
+    interpretation = store.get(signature)
+    if interpretation is not None:
+        return interpretation
+    # Method 2: use the configured LLM provider and write the reply through
+    analysis = chart.analysis
+    try:
+        interpretation = generate_signature_interpretation(
+            chart.day_pillar.dict(),
+            analysis.element_analysis.element_balance,
+            analysis.use_god,
+            analysis.avoid_god,
+            language=language,
+            analysis_focus=analysis_focus,
+        )
+    except Exception as e:
+        print(f"LLM interpretation error: {e}")
+        interpretation = None
+    if interpretation:
+        try:
+            store.put(signature, interpretation)
+        except Exception as e:
+            print(f"Warning: Failed to store interpretation: {e}")
+        return interpretation
     # Method 3: if no AI service is available, fall back to a basic interpretation
     return generate_basic_interpretation(
-        year_pillar,
-        month_pillar,
-        day_pillar,
-        hour_pillar,
+        chart.year_pillar.dict(),
+        chart.month_pillar.dict(),
+        chart.day_pillar.dict(),
+        chart.hour_pillar.dict() if chart.hour_pillar else None,
         language=language,
         analysis=None,
         analysis_focus=analysis_focus,
@@ -395,50 +424,86 @@ def get_personality_trait(element: str, language: str) -> str:
     return traits.get(language, {}).get(element, "")
 
 
-def chat_with_master(messages: list, language: str = "zh") -> str:
+CHAT_SYSTEM_PROMPTS = {
+    "zh": "你是「AI 大师」在线解读助手，擅长八字、星座、塔罗、运势等命理与心理层面的解读。"
+    "回答时保持温和、理性、不夸大不恐吓；可结合传统文化与心理学给出建议，避免具体事件预言。"
+    "用简洁易懂的中文回复。",
+    "en": "You are the AI Fortune Master assistant, skilled in Bazi, zodiac, tarot, and fortune interpretation. "
+    "Keep replies warm, rational, and non-alarming; you may combine tradition with psychology for advice, "
+    "but avoid predicting specific events. Reply in clear, concise English.",
+    "mi": "Ko koe te kaiāwhina AI Fortune Master, he tohunga ki te Bazi, te whetū, te tarot me te whakamārama waimarie. "
+    "Kia ngāwari, kia tōtika ō whakautu; ka taea te whakauru i ngā tikanga tawhito me te hinengaro, "
+    "engari kaua e matapae kaupapa. Whakautu mai ki te reo Māori māmā.",
+}
+
+CHAT_FALLBACKS = {
+    "zh": "暂时无法连接解读服务。请稍后再试，或先试试八字、塔罗等其他功能。",
+    "en": "The interpretation service is temporarily unavailable. Please try again later or use Bazi, Tarot, etc.",
+    "mi": "Kāore e taea te hono ki te ratonga whakamārama. Tēnā whakamātau ā muri ake, ka taea rānei te Bazi, Tarot.",
+}
+
+
+def _build_chat_messages(messages: list, language: str, chart_digest: Optional[str]) -> list:
+    """System prompt (plus optional chart digest) and history, fitted to the token budget."""
+    system_content = CHAT_SYSTEM_PROMPTS.get(language, CHAT_SYSTEM_PROMPTS["zh"])
+    if chart_digest:
+        system_content = f"{system_content}\n\n{chart_digest}"
+    return build_chat_context(system_content, messages, language)
+
+
+def chat_fallback(language: str = "zh") -> str:
+    """Reply used when no AI service is reachable."""
+    return CHAT_FALLBACKS.get(language, CHAT_FALLBACKS["en"])
+
+
+def chat_with_master(messages: list, language: str = "zh", chart_digest: Optional[str] = None) -> str:
     """
     Chat with the AI fortune master. Accepts a list of {role, content} and returns
     the assistant's reply. Uses OpenAI if available; otherwise returns a fallback.
+    chart_digest (from a stored reading) is appended to the system prompt so the
+    prompt prefix stays identical across follow-up turns about the same chart.
     """
-    system_prompts = {
-        "zh": "你是「AI 大师」在线解读助手，擅长八字、星座、塔罗、运势等命理与心理层面的解读。"
-        "回答时保持温和、理性、不夸大不恐吓；可结合传统文化与心理学给出建议，避免具体事件预言。"
-        "用简洁易懂的中文回复。",
-        "en": "You are the AI Fortune Master assistant, skilled in Bazi, zodiac, tarot, and fortune interpretation. "
-        "Keep replies warm, rational, and non-alarming; you may combine tradition with psychology for advice, "
-        "but avoid predicting specific events. Reply in clear, concise English.",
-        "mi": "Ko koe te kaiāwhina AI Fortune Master, he tohunga ki te Bazi, te whetū, te tarot me te whakamārama waimarie. "
-        "Kia ngāwari, kia tōtika ō whakautu; ka taea te whakauru i ngā tikanga tawhito me te hinengaro, "
-        "engari kaua e matapae kaupapa. Whakautu mai ki te reo Māori māmā.",
-    }
-    system_content = system_prompts.get(language, system_prompts["zh"])
-
-    if OPENAI_AVAILABLE:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if api_key:
-            try:
-                from openai import OpenAI
-                client = OpenAI(api_key=api_key)
-                api_messages = [{"role": "system", "content": system_content}]
-                for m in messages:
-                    role = (m.get("role") or "user").lower()
-                    if role == "system":
-                        continue
-                    api_messages.append({"role": role if role in ("user", "assistant") else "user", "content": (m.get("content") or "").strip()})
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=api_messages,
-                    max_tokens=500,
-                    temperature=0.7,
-                )
-                return (response.choices[0].message.content or "").strip()
-            except Exception as e:
-                print(f"OpenAI chat error: {e}")
-
-    fallbacks = {
-        "zh": "暂时无法连接解读服务。请稍后再试，或先试试八字、塔罗等其他功能。",
-        "en": "The interpretation service is temporarily unavailable. Please try again later or use Bazi, Tarot, etc.",
-        "mi": "Kāore e taea te hono ki te ratonga whakamārama. Tēnā whakamātau ā muri ake, ka taea rānei te Bazi, Tarot.",
-    }
-    return fallbacks.get(language, fallbacks["en"])
+    try:
+        reply = llm_providers.complete(
+            "chat",
+            _build_chat_messages(messages, language, chart_digest),
+            max_tokens=500,
+            temperature=0.7,
+        )
+        if reply is not None:
+            return reply
+    except Exception as e:
+        print(f"LLM chat error: {e}")
+
+    return chat_fallback(language)
 
+
+def stream_chat_with_master(messages: list, language: str = "zh", chart_digest: Optional[str] = None) -> Iterator[str]:
+    """
+    Streaming variant of chat_with_master: yields the reply in chunks as the model
+    produces them. Closing the generator closes the upstream stream, so an abandoned
+    generation stops consuming tokens. Falls back to the same reply as chat_with_master.
+    """
+    chunks = None
+    produced = False
+    try:
+        chunks = llm_providers.stream(
+            "chat",
+            _build_chat_messages(messages, language, chart_digest),
+            max_tokens=500,
+            temperature=0.7,
+        )
+        if chunks is not None:
+            for chunk in chunks:
+                produced = True
+                yield chunk
+            return
+    except Exception as e:
+        print(f"LLM chat stream error: {e}")
+        if produced:
+            return
+    finally:
+        if chunks is not None:
+            chunks.close()
+
+    yield chat_fallback(language)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Almanac (黄历) tables.
+
+One binary file per year (ALMANAC_DIR/<year>.bin) holds a fixed-size record
+per day: day stem, day branch, current solar term (节气), 建除十二神 officer
+and the 宜/忌 activity bitmasks. Files are memory-mapped read-only, so all
+worker processes share the same page-cache copy, and a lookup is one
+struct.unpack_from at a fixed offset.
+
+    python almanac.py --start 1901 --end 2099     # prebuild the files
+
+Missing years are built on first use. Solar terms use the century formula
+floor(Y*D + C) - L (D = 0.2422, L = leap days since the century start; the
+小寒..雨水 terms count leap days up to the previous year); the well-known
+single-day exceptions of the formula are not corrected. The 建除 officer of
+a day follows from its branch against the month branch set by the last 节.
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import threading
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+try:
+    from .bazi import EARTHLY_BRANCHES, HEAVENLY_STEMS, compute_day_pillar
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from bazi import EARTHLY_BRANCHES, HEAVENLY_STEMS, compute_day_pillar
+
+DEFAULT_ALMANAC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "almanac")
+MIN_YEAR, MAX_YEAR = 1901, 2099
+
+HEADER = struct.Struct("<4sHH")  # magic, year, number of days
+RECORD = struct.Struct("<BBBBHH")  # stem, branch, term (bit 7: starts today), officer, yi mask, ji mask
+MAGIC = b"ALM1"
+TERM_STARTS_TODAY = 0x80
+
+# 24 solar terms in calendar order starting from 小寒; even indexes are 节 (month boundaries)
+SOLAR_TERMS = [
+    "小寒", "大寒", "立春", "雨水", "惊蛰", "春分", "清明", "谷雨", "立夏", "小满", "芒种", "夏至",
+    "小暑", "大暑", "立秋", "处暑", "白露", "秋分", "寒露", "霜降", "立冬", "小雪", "大雪", "冬至",
+]
+SOLAR_TERMS_EN = [
+    "Minor Cold", "Major Cold", "Start of Spring", "Rain Water", "Awakening of Insects", "Spring Equinox",
+    "Clear and Bright", "Grain Rain", "Start of Summer", "Grain Full", "Grain in Ear", "Summer Solstice",
+    "Minor Heat", "Major Heat", "Start of Autumn", "End of Heat", "White Dew", "Autumn Equinox",
+    "Cold Dew", "Frost's Descent", "Start of Winter", "Minor Snow", "Major Snow", "Winter Solstice",
+]
+TERM_C = {
+    19: [6.11, 20.84, 4.6295, 19.4599, 6.3826, 21.4155, 5.59, 20.888, 6.318, 21.86, 6.5, 22.20,
+         7.928, 23.65, 8.35, 23.95, 8.44, 23.822, 9.098, 24.218, 8.218, 23.08, 7.9, 22.60],
+    20: [5.4055, 20.12, 3.87, 18.73, 5.63, 20.646, 4.81, 20.1, 5.52, 21.04, 5.678, 21.37,
+         7.108, 22.83, 7.5, 23.13, 7.646, 23.042, 8.318, 23.438, 7.438, 22.36, 7.18, 21.94],
+}
+TERM_D = 0.2422
+
+OFFICERS = ["建", "除", "满", "平", "定", "执", "破", "危", "成", "收", "开", "闭"]
+OFFICERS_EN = ["Establish", "Remove", "Full", "Balance", "Stable", "Initiate", "Destruction", "Danger",
+               "Success", "Receive", "Open", "Close"]
+
+ACTIVITIES = ["祭祀", "祈福", "出行", "嫁娶", "开市", "交易", "入宅", "移徙",
+              "动土", "修造", "安葬", "求医", "纳财", "签约", "入学", "栽种"]
+ACTIVITIES_EN = ["Worship", "Prayer", "Travel", "Wedding", "Open business", "Trade", "Move in", "Relocate",
+                 "Break ground", "Renovate", "Burial", "Medical care", "Collect money", "Sign contracts",
+                 "Start school", "Planting"]
+
+# 建除十二神 -> (宜, 忌)
+OFFICER_ACTIVITIES = {
+    "建": (["出行", "祈福", "入学"], ["动土", "安葬", "开市"]),
+    "除": (["祭祀", "求医", "修造"], ["嫁娶", "开市"]),
+    "满": (["祈福", "开市", "交易", "纳财"], ["安葬", "动土", "求医"]),
+    "平": (["祭祀", "修造", "栽种"], ["移徙", "开市"]),
+    "定": (["嫁娶", "签约", "交易", "入学", "祭祀"], ["出行", "求医"]),
+    "执": (["栽种", "纳财", "修造"], ["移徙", "出行", "开市"]),
+    "破": (["求医", "祭祀"], ["嫁娶", "开市", "签约", "入宅", "移徙", "出行"]),
+    "危": (["祭祀", "祈福"], ["出行", "动土", "入宅"]),
+    "成": (["嫁娶", "开市", "交易", "入宅", "入学", "签约", "移徙"], ["安葬"]),
+    "收": (["纳财", "交易", "栽种", "祭祀"], ["安葬", "出行"]),
+    "开": (["开市", "出行", "嫁娶", "入宅", "入学", "交易"], ["安葬", "动土"]),
+    "闭": (["安葬", "修造", "栽种"], ["开市", "出行", "求医", "嫁娶"]),
+}
+
+
+def _mask(names: List[str]) -> int:
+    mask = 0
+    for name in names:
+        mask |= 1 << ACTIVITIES.index(name)
+    return mask
+
+
+OFFICER_MASKS = [(_mask(OFFICER_ACTIVITIES[o][0]), _mask(OFFICER_ACTIVITIES[o][1])) for o in OFFICERS]
+
+
+def solar_term_dates(year: int) -> List[date]:
+    """Dates of the 24 solar terms of a year, in SOLAR_TERMS order."""
+    century = TERM_C[(year - 1) // 100]
+    y = year % 100 if year % 100 else 100
+    dates = []
+    for i, c in enumerate(century):
+        # 小寒 大寒 立春 雨水 fall before the year's leap day
+        leap_days = (y - 1) // 4 if i < 4 else y // 4
+        dates.append(date(year, i // 2 + 1, int(y * TERM_D + c) - leap_days))
+    return dates
+
+
+def build_year(year: int) -> bytes:
+    """Header plus one record per day of the year."""
+    terms = solar_term_dates(year)
+    start = date(year, 1, 1)
+    days = (date(year + 1, 1, 1) - start).days
+    out = bytearray(HEADER.pack(MAGIC, year, days))
+    term = 23  # 冬至 of the previous year until 小寒
+    month_branch = 0  # 子月, set by the previous year's 大雪
+    next_term = 0
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        starts_today = 0
+        # Terms are two weeks apart, so at most one begins on any day
+        if next_term < len(terms) and day >= terms[next_term]:
+            term = next_term
+            next_term += 1
+            starts_today = TERM_STARTS_TODAY
+            if term % 2 == 0:
+                month_branch = (1 + term // 2) % 12  # 小寒 starts 丑月, 立春 寅月, ...
+        pillar = compute_day_pillar(day.year, day.month, day.day)
+        stem = HEAVENLY_STEMS.index(pillar.stem)
+        branch = EARTHLY_BRANCHES.index(pillar.branch)
+        officer = (branch - month_branch) % 12
+        yi, ji = OFFICER_MASKS[officer]
+        out += RECORD.pack(stem, branch, term | starts_today, officer, yi, ji)
+    return bytes(out)
+
+
+class AlmanacStore:
+    """Memory-mapped per-year tables, built on first use when missing."""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.getenv("ALMANAC_DIR", DEFAULT_ALMANAC_DIR)
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._lock = threading.Lock()
+
+    def path(self, year: int) -> str:
+        return os.path.join(self.directory, f"{year}.bin")
+
+    def write_year(self, year: int) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(year)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(build_year(year))
+        os.replace(tmp, path)
+        return path
+
+    def _map(self, year: int) -> mmap.mmap:
+        table = self._maps.get(year)
+        if table is not None:
+            return table
+        with self._lock:
+            table = self._maps.get(year)
+            if table is None:
+                path = self.path(year)
+                if not os.path.exists(path):
+                    self.write_year(year)
+                with open(path, "rb") as f:
+                    table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, file_year, _ = HEADER.unpack_from(table, 0)
+                if magic != MAGIC or file_year != year:
+                    table.close()
+                    raise ValueError(f"Corrupt almanac table {path}")
+                self._maps[year] = table
+        return table
+
+    def record(self, day: date) -> tuple:
+        if not MIN_YEAR <= day.year <= MAX_YEAR:
+            raise ValueError(f"Almanac covers {MIN_YEAR}-{MAX_YEAR}")
+        offset = HEADER.size + (day.timetuple().tm_yday - 1) * RECORD.size
+        return RECORD.unpack_from(self._map(day.year), offset)
+
+    def lookup(self, day: date, language: str = "zh") -> dict:
+        stem, branch, term, officer, yi, ji = self.record(day)
+        en = language != "zh"
+        terms = SOLAR_TERMS_EN if en else SOLAR_TERMS
+        activities = ACTIVITIES_EN if en else ACTIVITIES
+        term_index = term & ~TERM_STARTS_TODAY
+        return {
+            "date": day.isoformat(),
+            "day_pillar": f"{HEAVENLY_STEMS[stem]}{EARTHLY_BRANCHES[branch]}",
+            "day_stem": HEAVENLY_STEMS[stem],
+            "day_branch": EARTHLY_BRANCHES[branch],
+            "solar_term": terms[term_index],
+            "solar_term_starts_today": bool(term & TERM_STARTS_TODAY),
+            "officer": (OFFICERS_EN if en else OFFICERS)[officer],
+            "yi": [activities[i] for i in range(len(ACTIVITIES)) if yi >> i & 1],
+            "ji": [activities[i] for i in range(len(ACTIVITIES)) if ji >> i & 1],
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            for table in self._maps.values():
+                table.close()
+            self._maps.clear()
+
+
+almanac_store = AlmanacStore()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Prebuild almanac year tables")
+    parser.add_argument("--start", type=int, default=date.today().year - 1)
+    parser.add_argument("--end", type=int, default=date.today().year + 5)
+    parser.add_argument("--dir", default=None, help="output directory (default ALMANAC_DIR)")
+    args = parser.parse_args()
+    store = AlmanacStore(args.dir)
+    for year in range(max(args.start, MIN_YEAR), min(args.end, MAX_YEAR) + 1):
+        store.write_year(year)
+    print(f"Wrote almanac tables {args.start}-{args.end} to {store.directory}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Analytics rollups over readings.
+
+Dashboards ("element distribution this week", "most common day masters by
+focus") read only reading_rollups: one count per
+(day, type, day_master, dominant_element, analysis_focus). Nothing on the
+request path parses Reading.result for analytics.
+
+A tailing job keeps the rollups current. It reads readings in id order after
+a watermark, in batches of ANALYTICS_BATCH, parses each result once (shared
+chart_results are parsed once per chart hash), and adds the counts with an
+upsert (count = count + excluded.count). Every worker runs the job, but one
+at a time holds the tailer lock (pg advisory lock on the rollup database, a
+lock file for SQLite) and reads the source; the others skip the round. The
+watermark moves in the same transaction as the counts, guarded by a
+compare-and-set on its old value, so a cron run next to the app does not
+double count either. Rows newer than
+ANALYTICS_SETTLE_SECONDS wait for the next run, so a transaction that
+committed a lower id late is not skipped.
+
+Keeping analytics off the OLTP database:
+- ANALYTICS_DATABASE_URL: where rollups live (default: the main database)
+- ANALYTICS_SOURCE_URL: where readings are tailed from, e.g. a read replica
+  (default: the main database)
+
+    python analytics.py      # catch up once (e.g. from cron instead of the app)
+"""
+import argparse
+import asyncio
+import fcntl
+import json
+import os
+import sys
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Column, Date, DateTime, Integer, String, create_engine, func, select, text, update
+from sqlalchemy.orm import declarative_base
+
+try:
+    from .db import engine as main_engine, _engine_options
+    from .lru import LRUCache
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from db import engine as main_engine, _engine_options
+    from lru import LRUCache
+
+ANALYTICS_DATABASE_URL = os.getenv("ANALYTICS_DATABASE_URL")
+ANALYTICS_SOURCE_URL = os.getenv("ANALYTICS_SOURCE_URL")
+ANALYTICS_INTERVAL = float(os.getenv("ANALYTICS_INTERVAL", "60"))
+ANALYTICS_BATCH = int(os.getenv("ANALYTICS_BATCH", "5000"))
+ANALYTICS_SETTLE_SECONDS = float(os.getenv("ANALYTICS_SETTLE_SECONDS", "5"))
+WATERMARK_NAME = "reading_rollups"
+# pg_advisory_lock key, so only one worker tails the source at a time
+ANALYTICS_LOCK_KEY = 0x616E616C
+DEFAULT_LOCK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "analytics.lock")
+
+DIMENSIONS = ["day", "type", "day_master", "dominant_element", "analysis_focus"]
+
+AnalyticsBase = declarative_base()
+
+
+class ReadingRollup(AnalyticsBase):
+    __tablename__ = "reading_rollups"
+
+    # "" instead of NULL for readings without the dimension (primary key columns)
+    day = Column(Date, primary_key=True)
+    type = Column(String(64), primary_key=True)
+    day_master = Column(String(8), primary_key=True, default="")
+    dominant_element = Column(String(16), primary_key=True, default="")
+    analysis_focus = Column(String(32), primary_key=True, default="")
+    count = Column(Integer, nullable=False, default=0)
+
+
+class AnalyticsWatermark(AnalyticsBase):
+    __tablename__ = "analytics_watermarks"
+
+    name = Column(String(64), primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+_engines = {}
+
+
+def _engine_for(url: Optional[str]):
+    if not url:
+        return main_engine
+    engine = _engines.get(url)
+    if engine is None:
+        engine = _engines[url] = create_engine(url, future=True, **_engine_options(url))
+    return engine
+
+
+def rollup_engine():
+    return _engine_for(ANALYTICS_DATABASE_URL)
+
+
+def source_engine():
+    return _engine_for(ANALYTICS_SOURCE_URL)
+
+
+def init_tables() -> None:
+    AnalyticsBase.metadata.create_all(bind=rollup_engine())
+
+
+# -- parsing -----------------------------------------------------------------
+
+CHART_DIMENSIONS_CACHE = 65536
+_chart_dimensions = LRUCache(CHART_DIMENSIONS_CACHE)
+
+
+def _result_dimensions(result: Optional[str]) -> Tuple[str, str]:
+    """(day_master, dominant_element) of a Bazi result; empty strings when absent."""
+    try:
+        analysis = json.loads(result).get("analysis") or {}
+    except (TypeError, ValueError, AttributeError):
+        return "", ""
+    elements = analysis.get("element_analysis") or {}
+    return (analysis.get("day_master") or "")[:8], (elements.get("dominant_element") or "")[:16]
+
+
+def reading_dimensions(reading_type: str, input_data: Optional[str], result: Optional[str], chart_hash: Optional[str]) -> Tuple[str, str, str]:
+    if reading_type != "bazi":
+        return "", "", ""
+    if chart_hash is not None:
+        dims = _chart_dimensions.get(chart_hash)
+        if dims is None:
+            dims = _result_dimensions(result)
+            _chart_dimensions.put(chart_hash, dims)
+    else:
+        dims = _result_dimensions(result)
+    try:
+        focus = json.loads(input_data).get("analysis_focus") or ""
+    except (TypeError, ValueError, AttributeError):
+        focus = ""
+    return dims[0], dims[1], str(focus)[:32]
+
+
+# -- tailing job -------------------------------------------------------------
+
+def _watermark(conn) -> int:
+    value = conn.execute(select(AnalyticsWatermark.last_id).where(AnalyticsWatermark.name == WATERMARK_NAME)).scalar()
+    if value is None:
+        conn.execute(AnalyticsWatermark.__table__.insert().values(name=WATERMARK_NAME, last_id=0, updated_at=datetime.utcnow()))
+        return 0
+    return value
+
+
+def _upsert_counts(conn, counts: Counter) -> None:
+    rows = [dict(zip(DIMENSIONS, key), count=n) for key, n in counts.items()]
+    table = ReadingRollup.__table__
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise RuntimeError(f"Analytics rollups need PostgreSQL or SQLite, not {dialect}")
+    statement = dialect_insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=DIMENSIONS,
+        set_={"count": table.c.count + statement.excluded.count},
+    )
+    conn.execute(statement, rows)
+
+
+def _parse_created(value) -> Optional[datetime]:
+    if isinstance(value, str):  # SQLite text() results
+        return datetime.fromisoformat(value)
+    return value
+
+
+def run_batch() -> int:
+    """Roll up the next batch after the watermark; returns the number of readings counted."""
+    with rollup_engine().begin() as conn:
+        last_id = _watermark(conn)
+    settled = datetime.utcnow() - timedelta(seconds=ANALYTICS_SETTLE_SECONDS)
+    with source_engine().connect() as source:
+        rows = source.execute(text(
+            "SELECT r.id, r.type, r.input_data, coalesce(r.result, c.result), r.chart_hash, r.created_at "
+            "FROM readings r LEFT JOIN chart_results c ON c.hash = r.chart_hash "
+            "WHERE r.id > :last_id ORDER BY r.id LIMIT :limit"
+        ), {"last_id": last_id, "limit": ANALYTICS_BATCH}).all()
+    counts: Counter = Counter()
+    new_id = last_id
+    for reading_id, reading_type, input_data, result, chart_hash, created_at in rows:
+        created_at = _parse_created(created_at)
+        if created_at is not None and created_at > settled:
+            break
+        day = (created_at or datetime.utcnow()).date()
+        counts[(day, reading_type or "", *reading_dimensions(reading_type, input_data, result, chart_hash))] += 1
+        new_id = reading_id
+    if new_id == last_id:
+        return 0
+    with rollup_engine().begin() as conn:
+        moved = conn.execute(
+            update(AnalyticsWatermark)
+            .where(AnalyticsWatermark.name == WATERMARK_NAME, AnalyticsWatermark.last_id == last_id)
+            .values(last_id=new_id, updated_at=datetime.utcnow())
+        ).rowcount
+        if not moved:
+            # Another worker rolled up this batch first; the transaction (nothing written yet) ends here
+            return 0
+        _upsert_counts(conn, counts)
+    return sum(counts.values())
+
+
+def catch_up(max_batches: int = 100) -> int:
+    total = 0
+    for _ in range(max_batches):
+        counted = run_batch()
+        if not counted:
+            break
+        total += counted
+    return total
+
+
+def _try_lock(conn):
+    """Tailer election: pg advisory lock on the rollup database, or a lock file for SQLite."""
+    if conn.dialect.name == "postgresql":
+        return conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": ANALYTICS_LOCK_KEY}).scalar()
+    path = os.getenv("ANALYTICS_LOCK_FILE", DEFAULT_LOCK_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handle = open(path, "w")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def catch_up_elected(max_batches: int = 100) -> Optional[int]:
+    """catch_up() if this worker gets the tailer lock; None when another worker is tailing."""
+    with rollup_engine().connect() as lock_conn:
+        lock = _try_lock(lock_conn)
+        if not lock:
+            return None
+        try:
+            return catch_up(max_batches)
+        finally:
+            if lock_conn.dialect.name == "postgresql":
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ANALYTICS_LOCK_KEY})
+            else:
+                lock.close()
+
+
+async def tail_loop(interval: float = ANALYTICS_INTERVAL) -> None:
+    """Keep the rollups current until cancelled (started in every worker; one tails per round)."""
+    if interval <= 0:
+        return
+    try:
+        await asyncio.to_thread(init_tables)
+    except Exception as e:
+        print(f"Warning: Analytics tables unavailable: {e}")
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(catch_up_elected)
+        except Exception as e:
+            print(f"Warning: Analytics rollup failed: {e}")
+
+
+# -- queries -----------------------------------------------------------------
+
+def query_rollups(
+    group_by: List[str],
+    start: date,
+    end: date,
+    reading_type: Optional[str] = None,
+    analysis_focus: Optional[str] = None,
+    limit: int = 100,
+) -> dict:
+    """Counts grouped by the given dimensions for days in [start, end], largest first."""
+    table = ReadingRollup.__table__
+    columns = [table.c[name] for name in group_by]
+    total = func.sum(table.c.count).label("count")
+    query = select(*columns, total).where(table.c.day >= start, table.c.day <= end)
+    if reading_type:
+        query = query.where(table.c.type == reading_type)
+    if analysis_focus is not None:
+        query = query.where(table.c.analysis_focus == analysis_focus)
+    query = query.group_by(*columns).order_by(total.desc(), *columns).limit(limit)
+    with rollup_engine().connect() as conn:
+        rows = conn.execute(query).all()
+        watermark = conn.execute(select(AnalyticsWatermark.last_id).where(AnalyticsWatermark.name == WATERMARK_NAME)).scalar()
+    return {
+        "rows": [
+            {**{name: (value.isoformat() if isinstance(value, date) else value) for name, value in zip(group_by, row)}, "count": row[-1]}
+            for row in rows
+        ],
+        "watermark": watermark or 0,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bring the analytics rollups up to date")
+    parser.add_argument("--max-batches", type=int, default=1000)
+    args = parser.parse_args()
+    init_tables()
+    print(f"Rolled up {catch_up(args.max_batches)} readings")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Compact chart digests for chart-aware chat.
+
+Instead of pasting a whole Bazi chart and interpretation into the chat, the
+client sends a reading_id. The stored reading is condensed once into a short
+digest (pillars, Day Master, element balance, Ten Gods, use/avoid god) that is
+appended to the fixed system prompt, giving a stable prompt prefix per chart.
+POST /bazi returns the reading_id of the reading it stores. A reading's
+result never changes after it is written (archiving moves the row to the cold
+archive as it is, and the digest then comes from there), so digests are
+cached per (reading_id, language) without invalidation.
+"""
+import json
+
+from fastapi import HTTPException
+
+try:
+    from . import models
+    from .lru import LRUCache
+    from .reading_partitions import find_archived
+except ImportError:
+    import models
+    from lru import LRUCache
+    from reading_partitions import find_archived
+
+DIGEST_CACHE_SIZE = 4096
+
+DIGEST_LABELS = {
+    "zh": {
+        "header": "以下是用户已保存的八字命盘摘要，回答时以此为依据：",
+        "pillars": "四柱",
+        "hour_missing": "时柱未知",
+        "day_master": "日主",
+        "elements": "五行",
+        "balance": "平衡",
+        "ten_gods": "十神",
+        "use_god": "用神",
+        "avoid_god": "忌神",
+        "none": "无",
+    },
+    "en": {
+        "header": "The user's saved Bazi chart (base your answers on it):",
+        "pillars": "Pillars",
+        "hour_missing": "hour unknown",
+        "day_master": "Day Master",
+        "elements": "Elements",
+        "balance": "Balance",
+        "ten_gods": "Ten Gods",
+        "use_god": "Use God",
+        "avoid_god": "Avoid God",
+        "none": "none",
+    },
+    "mi": {
+        "header": "Te mahere Bazi kua tiakina a te kaiwhakamahi (whakamahia hei tūāpapa):",
+        "pillars": "Ngā Pou",
+        "hour_missing": "kāore te hāora e mōhiotia",
+        "day_master": "Rangatira Rā",
+        "elements": "Ngā Rima",
+        "balance": "Te taurite",
+        "ten_gods": "Ngā Atua Tekau",
+        "use_god": "Atua Whakamahi",
+        "avoid_god": "Atua Pare",
+        "none": "kore",
+    },
+}
+
+
+def _format_count(value) -> str:
+    return str(int(value)) if value == int(value) else f"{value:.1f}"
+
+
+def build_chart_digest(result: dict, language: str = "zh") -> str:
+    """
+    Condense a stored Bazi result (as written by POST /bazi) into a few lines.
+    Uses the stored BaziAnalysis when present; older readings without it fall
+    back to the pillars alone.
+    """
+    labels = DIGEST_LABELS.get(language, DIGEST_LABELS["en"])
+    pillars = []
+    for key in ("year_pillar", "month_pillar", "day_pillar", "hour_pillar"):
+        pillar = result.get(key)
+        if pillar:
+            ten_god = f"/{pillar['ten_god']}" if pillar.get("ten_god") else ""
+            pillars.append(f"{pillar['stem']}{pillar['branch']}({pillar['element']}{ten_god})")
+        elif key == "hour_pillar":
+            pillars.append(labels["hour_missing"])
+    lines = [labels["header"], f"{labels['pillars']}: {' '.join(pillars)}"]
+
+    analysis = result.get("analysis")
+    if analysis:
+        element_analysis = analysis.get("element_analysis") or {}
+        counts = element_analysis.get("element_count") or {}
+        lines.append(f"{labels['day_master']}: {analysis.get('day_master')}({analysis.get('day_master_element')})")
+        if counts:
+            lines.append(
+                f"{labels['elements']}: "
+                + " ".join(f"{k}{_format_count(v)}" for k, v in counts.items() if v)
+                + (f"; {labels['balance']}: {element_analysis['element_balance']}" if element_analysis.get("element_balance") else "")
+            )
+        ten_god_summary = (analysis.get("ten_god_analysis") or {}).get("ten_god_summary")
+        if ten_god_summary:
+            lines.append(f"{labels['ten_gods']}: {ten_god_summary}")
+        if analysis.get("use_god"):
+            lines.append(
+                f"{labels['use_god']}: {analysis['use_god']}; "
+                f"{labels['avoid_god']}: {analysis.get('avoid_god') or labels['none']}"
+            )
+    elif result.get("summary"):
+        lines.append(result["summary"])
+    return "\n".join(lines)
+
+
+# Digests keyed by (reading_id, language)
+digest_cache = LRUCache(DIGEST_CACHE_SIZE)
+
+
+def get_reading_digest(db, reading_id: int, language: str = "zh") -> str:
+    """
+    Digest for a stored Bazi reading, computed once and cached.
+    Cache hits skip the database entirely; follow-up turns only pay the lookup once.
+    """
+    key = (reading_id, language)
+    digest = digest_cache.get(key)
+    if digest is not None:
+        return digest
+
+    reading = db.get(models.Reading, reading_id)
+    if reading is not None:
+        reading_type, raw_result = reading.type, reading.full_result
+    else:
+        # Months past the retention window are only in the cold archive (files
+        # whose id range does not cover reading_id are not opened)
+        archived = find_archived(reading_id)
+        if archived is None:
+            raise HTTPException(status_code=404, detail=f"Reading {reading_id} not found")
+        reading_type, raw_result = archived["type"], archived["result"]
+    try:
+        result = json.loads(raw_result)
+    except (TypeError, ValueError):
+        result = None
+    if reading_type != "bazi" or not isinstance(result, dict) or "day_pillar" not in result:
+        raise HTTPException(status_code=400, detail=f"Reading {reading_id} is not a Bazi chart")
+    digest = build_chart_digest(result, language)
+    digest_cache.put(key, digest)
+    return digest
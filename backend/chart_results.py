@@ -0,0 +1,123 @@
+"""
+Content-addressed storage of reading results.
+
+Everyone born on the same date and 2-hour block gets the same chart, so the
+result text of a server-computed Bazi reading (chart, analysis and
+interpretation) is stored once in chart_results under its sha256, and the
+readings row keeps only the per-user data (user_id, input_data, created_at)
+plus chart_hash. Other readings (draws, ziwei, client-supplied results) are
+rarely shared and keep their result inline. Writing a chart is an
+insert-if-absent (ON CONFLICT DO NOTHING); hashes this worker has written in
+the last CHART_HASH_TTL seconds (CHART_HASH_CACHE_SIZE most recent) skip
+even that, so a popular chart costs one small readings row per request.
+
+Readers merge the result back: Reading.full_result for ORM objects, or an
+outer join on chart_hash for queries.
+
+The archiver calls collect_orphans() with the hashes of the rows it removed:
+charts no reading references any more are deleted. A cached hash always has a
+reading younger than CHART_HASH_TTL, which is far from being archived, and on
+PostgreSQL the delete locks out writers that are between their chart upsert
+and their commit.
+"""
+import hashlib
+import os
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import bindparam, insert, select, text
+
+try:
+    from . import models
+    from .lru import LRUCache
+except ImportError:
+    import models
+    from lru import LRUCache
+
+CHART_HASH_CACHE_SIZE = int(os.getenv("CHART_HASH_CACHE_SIZE", "65536"))
+# Must stay well below the archive retention, see collect_orphans()
+CHART_HASH_TTL = float(os.getenv("CHART_HASH_TTL", "86400"))
+# Reading types whose results are shared through chart_results
+SHARED_RESULT_TYPES = {"bazi"}
+ORPHAN_BATCH = 1000
+
+_known_hashes = LRUCache(CHART_HASH_CACHE_SIZE, CHART_HASH_TTL)
+
+
+def result_hash(result: str) -> str:
+    return hashlib.sha256(result.encode("utf-8")).hexdigest()
+
+
+def split_results(rows: List[dict]) -> Tuple[List[dict], Dict[str, str]]:
+    """
+    (readings rows with Bazi results moved out, {hash: result} of charts to store).
+    The input rows are left untouched, so they can still be spooled as they are.
+    """
+    readings, charts = [], {}
+    for row in rows:
+        result = row.get("result")
+        if result is None or row.get("type") not in SHARED_RESULT_TYPES:
+            readings.append({**row, "chart_hash": row.get("chart_hash")})
+            continue
+        digest = result_hash(result)
+        if digest not in _known_hashes:
+            charts[digest] = result
+        readings.append({**row, "result": None, "chart_hash": digest})
+    return readings, charts
+
+
+def _insert_if_absent(dialect: str):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(models.ChartResult).on_conflict_do_nothing(index_elements=["hash"])
+
+
+async def upsert_charts(session, charts: Dict[str, str]) -> None:
+    """Insert the charts that are not stored yet (in the caller's transaction)."""
+    if not charts:
+        return
+    statement = _insert_if_absent(session.bind.dialect.name)
+    if statement is None:
+        existing = await session.execute(select(models.ChartResult.hash).where(models.ChartResult.hash.in_(list(charts))))
+        charts = {h: r for h, r in charts.items() if h not in set(existing.scalars())}
+        if not charts:
+            return
+        statement = insert(models.ChartResult)
+    await session.execute(statement, [{"hash": h, "result": r} for h, r in charts.items()])
+
+
+def remember(charts: Dict[str, str]) -> None:
+    """Call after the transaction that stored charts has committed."""
+    for digest in charts:
+        _known_hashes.put(digest, True)
+
+
+async def insert_readings(session, rows: List[dict]) -> List[int]:
+    """Store reading rows with shared results, then commit; returns their ids in row order."""
+    readings, charts = split_results(rows)
+    await upsert_charts(session, charts)
+    statement = insert(models.Reading).returning(models.Reading.id, sort_by_parameter_order=True)
+    ids = list((await session.execute(statement, readings)).scalars())
+    await session.commit()
+    remember(charts)
+    return ids
+
+
+def collect_orphans(bind, hashes: Iterable[str]) -> int:
+    """Delete the charts among hashes that no reading references any more; returns charts deleted."""
+    hashes = sorted(hashes)
+    statement = text(
+        "DELETE FROM chart_results WHERE hash IN :hashes "
+        "AND NOT EXISTS (SELECT 1 FROM readings r WHERE r.chart_hash = chart_results.hash)"
+    ).bindparams(bindparam("hashes", expanding=True))
+    deleted = 0
+    for i in range(0, len(hashes), ORPHAN_BATCH):
+        with bind.begin() as conn:
+            if bind.dialect.name == "postgresql":
+                # Writers that already upserted a chart commit their reading first; new ones wait
+                conn.execute(text("LOCK TABLE chart_results IN SHARE ROW EXCLUSIVE MODE"))
+            deleted += conn.execute(statement, {"hashes": hashes[i:i + ORPHAN_BATCH]}).rowcount
+    return deleted
@@ -0,0 +1,339 @@
+"""
+Chat context window management for chat_with_master.
+
+Long chat sessions are trimmed to a per-language prompt-token budget before
+they are sent to the model:
+- the system prompt and the last N turns are kept verbatim;
+- older turns are folded into a rolling summary that is cached by conversation
+  prefix, so each new request only summarizes the turns folded since last time;
+- tokens are counted locally (tiktoken when installed, otherwise a CJK-aware
+  estimate), so no request is spent just to measure the prompt;
+- if that is still too much, the longest messages keep their tail (at least
+  MIN_MESSAGE_TOKENS each), then the summary goes, then the system prompt
+  keeps its head (the chart digest is appended last, so it is cut first).
+  A budget too small even for that raises ValueError; no message is ever
+  sent empty.
+"""
+import hashlib
+import os
+from typing import Callable, Dict, List, Optional
+
+try:
+    from .lru import LRUCache
+except ImportError:
+    from lru import LRUCache
+
+# Default prompt-token budgets per language (system prompt + summary + recent turns).
+# Chinese text is denser per token, so it gets a slightly smaller budget.
+DEFAULT_PROMPT_TOKEN_BUDGETS = {
+    "zh": 1500,
+    "en": 2000,
+    "mi": 2000,
+}
+DEFAULT_KEEP_TURNS = 4
+# Upper bound for the rolling summary itself (older lines are dropped first)
+DEFAULT_SUMMARY_TOKEN_LIMIT = 300
+# Approximate per-message overhead of the chat format (role, separators)
+MESSAGE_TOKEN_OVERHEAD = 4
+# Truncated messages keep at least this many tokens
+MIN_MESSAGE_TOKENS = 16
+
+SUMMARY_HEADERS = {
+    "zh": "以下是本次对话较早内容的摘要，供参考：",
+    "en": "Summary of the earlier part of this conversation, for reference:",
+    "mi": "He whakarāpopototanga o te wāhanga tōmua o tēnei kōrero:",
+}
+ROLE_LABELS = {
+    "zh": {"user": "用户", "assistant": "大师"},
+    "en": {"user": "User", "assistant": "Master"},
+    "mi": {"user": "Kaiwhakamahi", "assistant": "Tohunga"},
+}
+
+_encoder = None
+_encoder_loaded = False
+
+
+def _get_encoder():
+    """Load the optional tiktoken encoder once; None if tiktoken is not installed."""
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoder = None
+        _encoder_loaded = True
+    return _encoder
+
+
+def _is_cjk(ch: str) -> bool:
+    code = ord(ch)
+    return (
+        0x4E00 <= code <= 0x9FFF  # CJK Unified Ideographs
+        or 0x3400 <= code <= 0x4DBF  # Extension A
+        or 0x3000 <= code <= 0x303F  # CJK punctuation
+        or 0xFF00 <= code <= 0xFFEF  # Full-width forms
+    )
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens in a piece of text locally.
+    Uses tiktoken when available; otherwise estimates one token per CJK
+    character and roughly four characters per token for everything else.
+    """
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    cjk = 0
+    other = 0
+    for ch in text:
+        if _is_cjk(ch):
+            cjk += 1
+        elif not ch.isspace():
+            other += 1
+    words = len(text.split())
+    return cjk + max((other + 3) // 4, words if other else 0)
+
+
+def count_message_tokens(messages: List[dict]) -> int:
+    """Token count of a list of {role, content} messages including format overhead."""
+    return sum(count_tokens(m.get("content") or "") + MESSAGE_TOKEN_OVERHEAD for m in messages)
+
+
+def get_prompt_token_budget(language: str) -> int:
+    """
+    Prompt-token budget for a language.
+    Override per language with CHAT_PROMPT_TOKEN_BUDGET_<LANG> (e.g. CHAT_PROMPT_TOKEN_BUDGET_ZH)
+    or for all languages with CHAT_PROMPT_TOKEN_BUDGET.
+    """
+    for name in (f"CHAT_PROMPT_TOKEN_BUDGET_{language.upper()}", "CHAT_PROMPT_TOKEN_BUDGET"):
+        value = os.getenv(name)
+        if value:
+            try:
+                return int(value)
+            except ValueError:
+                print(f"Warning: Ignoring invalid {name}={value!r}")
+    return DEFAULT_PROMPT_TOKEN_BUDGETS.get(language, DEFAULT_PROMPT_TOKEN_BUDGETS["en"])
+
+
+def normalize_messages(messages: list) -> List[dict]:
+    """Drop client-supplied system messages and coerce roles to user/assistant."""
+    normalized = []
+    for m in messages:
+        role = (m.get("role") or "user").lower()
+        if role == "system":
+            continue
+        content = (m.get("content") or "").strip()
+        if not content:
+            continue
+        normalized.append({"role": role if role in ("user", "assistant") else "user", "content": content})
+    return normalized
+
+
+def group_turns(messages: List[dict]) -> List[List[dict]]:
+    """Group messages into turns; each user message starts a new turn."""
+    turns: List[List[dict]] = []
+    for m in messages:
+        if m["role"] == "user" or not turns:
+            turns.append([m])
+        else:
+            turns[-1].append(m)
+    return turns
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit].rstrip() + "…"
+
+
+def extractive_summarizer(previous: str, turns: List[List[dict]], language: str) -> str:
+    """
+    Default summarizer: append one clipped line per folded message to the previous summary.
+    Runs locally, so folding turns never costs an extra model call.
+    """
+    labels = ROLE_LABELS.get(language, ROLE_LABELS["en"])
+    lines = [previous] if previous else []
+    for turn in turns:
+        for m in turn:
+            limit = 60 if m["role"] == "user" else 90
+            lines.append(f"- {labels[m['role']]}: {_clip(m['content'], limit)}")
+    return "\n".join(lines)
+
+
+def _limit_summary(summary: str, limit: int) -> str:
+    """Drop the oldest summary lines until the summary fits within `limit` tokens."""
+    if not summary or limit <= 0:
+        return ""
+    lines = summary.split("\n")
+    while lines and count_tokens("\n".join(lines)) > limit:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class RollingSummaryCache:
+    """
+    LRU cache of rolling summaries keyed by a chained hash of the folded turns.
+    A summary for turns[0:k] is built from the longest cached prefix, so only
+    newly folded turns are summarized on each request.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries = LRUCache(maxsize)
+
+    @staticmethod
+    def prefix_keys(turns: List[List[dict]], language: str) -> List[str]:
+        """keys[i] identifies the prefix turns[0:i + 1]."""
+        keys = []
+        digest = hashlib.sha1(language.encode("utf-8")).hexdigest()
+        for turn in turns:
+            h = hashlib.sha1(digest.encode("utf-8"))
+            for m in turn:
+                h.update(b"\x00" + m["role"].encode("utf-8") + b"\x01" + m["content"].encode("utf-8"))
+            digest = h.hexdigest()
+            keys.append(digest)
+        return keys
+
+    def get(self, key: str) -> Optional[str]:
+        return self._entries.get(key)
+
+    def put(self, key: str, summary: str) -> None:
+        self._entries.put(key, summary)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class ChatContextManager:
+    """Fits a chat history into a prompt-token budget for one model call."""
+
+    def __init__(
+        self,
+        keep_turns: Optional[int] = None,
+        summary_token_limit: int = DEFAULT_SUMMARY_TOKEN_LIMIT,
+        summarizer: Callable[[str, List[List[dict]], str], str] = extractive_summarizer,
+        cache: Optional[RollingSummaryCache] = None,
+        budgets: Optional[Dict[str, int]] = None,
+    ):
+        if keep_turns is None:
+            keep_turns = int(os.getenv("CHAT_KEEP_TURNS", DEFAULT_KEEP_TURNS))
+        self.keep_turns = max(1, keep_turns)
+        self.summary_token_limit = summary_token_limit
+        self.summarizer = summarizer
+        self.cache = cache or RollingSummaryCache()
+        self.budgets = budgets
+
+    def budget_for(self, language: str) -> int:
+        if self.budgets and language in self.budgets:
+            return self.budgets[language]
+        return get_prompt_token_budget(language)
+
+    def summarize(self, turns: List[List[dict]], language: str) -> str:
+        """Rolling summary of `turns`, extending the longest cached prefix."""
+        if not turns:
+            return ""
+        keys = self.cache.prefix_keys(turns, language)
+        summary = ""
+        start = 0
+        for i in range(len(keys) - 1, -1, -1):
+            cached = self.cache.get(keys[i])
+            if cached is not None:
+                summary, start = cached, i + 1
+                break
+        for i in range(start, len(turns)):
+            summary = _limit_summary(self.summarizer(summary, [turns[i]], language), self.summary_token_limit)
+            self.cache.put(keys[i], summary)
+        return summary
+
+    def build(self, system_content: str, messages: list, language: str = "zh") -> List[dict]:
+        """
+        Return the message list to send to the model: the system prompt, an optional
+        summary of older turns, and as many recent turns as fit in the budget.
+        """
+        budget = self.budget_for(language)
+        turns = group_turns(normalize_messages(messages))
+        split = max(0, len(turns) - self.keep_turns)
+
+        while True:
+            older, recent = turns[:split], turns[split:]
+            summary = self.summarize(older, language)
+            recent_messages = [dict(m) for turn in recent for m in turn]
+            used = count_message_tokens([{"role": "system", "content": system_content}] + recent_messages)
+            if used + self._summary_cost(summary, language) <= budget or len(recent) <= 1:
+                break
+            split += 1
+
+        api_messages = [{"role": "system", "content": system_content}]
+        # Whatever budget the recent turns leave is available to the summary
+        lines = summary.split("\n") if summary else []
+        while lines and used + self._summary_cost("\n".join(lines), language) > budget:
+            lines.pop(0)
+        summary = "\n".join(lines)
+        if summary:
+            header = SUMMARY_HEADERS.get(language, SUMMARY_HEADERS["en"])
+            api_messages.append({"role": "system", "content": f"{header}\n{summary}"})
+        api_messages.extend(recent_messages)
+        return self._truncate_longest(api_messages, budget, first=len(api_messages) - len(recent_messages))
+
+    @staticmethod
+    def _summary_cost(summary: str, language: str) -> int:
+        header = SUMMARY_HEADERS.get(language, SUMMARY_HEADERS["en"])
+        return count_tokens(f"{header}\n{summary}") + MESSAGE_TOKEN_OVERHEAD
+
+    @staticmethod
+    def _truncate_longest(api_messages: List[dict], budget: int, first: int) -> List[dict]:
+        """
+        Fit messages that are still over budget: shrink the longest recent
+        messages (keeping their tail), then drop the summary, then shrink the
+        system prompt (keeping its head). ValueError if even that does not fit.
+        """
+        overflow = count_message_tokens(api_messages) - budget
+        while overflow > 0:
+            shrinkable = [m for m in api_messages[first:] if count_tokens(m["content"]) > MIN_MESSAGE_TOKENS]
+            if not shrinkable:
+                break
+            longest = max(shrinkable, key=lambda m: count_tokens(m["content"]))
+            tokens = count_tokens(longest["content"])
+            longest["content"] = _shrink(longest["content"], max(MIN_MESSAGE_TOKENS, tokens - overflow), keep_tail=True)
+            overflow = count_message_tokens(api_messages) - budget
+        if overflow > 0 and first > 1:
+            del api_messages[1:first]  # the summary
+            overflow = count_message_tokens(api_messages) - budget
+        if overflow > 0:
+            system = api_messages[0]
+            keep = count_tokens(system["content"]) - overflow
+            if keep < MIN_MESSAGE_TOKENS:
+                raise ValueError(f"Prompt token budget {budget} is too small for the system prompt and the last message")
+            system["content"] = _shrink(system["content"], keep, keep_tail=False)
+        return api_messages
+
+
+def _shrink(content: str, keep: int, keep_tail: bool) -> str:
+    """Longest tail (or head) of content with at most `keep` tokens (binary search: counts are not linear in length)."""
+    low, high = 0, len(content)  # characters to cut
+    while low < high:
+        cut = (low + high) // 2
+        if count_tokens(content[cut:] if keep_tail else content[:len(content) - cut]) <= keep:
+            high = cut
+        else:
+            low = cut + 1
+    return content[low:] if keep_tail else content[:len(content) - low]
+
+
+_default_manager: Optional[ChatContextManager] = None
+
+
+def get_context_manager() -> ChatContextManager:
+    """Process-wide context manager (shares the rolling-summary cache across requests)."""
+    global _default_manager
+    if _default_manager is None:
+        _default_manager = ChatContextManager()
+    return _default_manager
+
+
+def build_chat_context(system_content: str, messages: list, language: str = "zh") -> List[dict]:
+    """Convenience wrapper around the process-wide ChatContextManager."""
+    return get_context_manager().build(system_content, messages, language)
@@ -0,0 +1,187 @@
+"""
+WebSocket session for the chat widget (/ws/chat).
+
+One connection per widget session. Protocol (JSON text frames):
+
+Client -> server
+    {"type": "chat", "messages": [...], "language": "zh", "reading_id": 1}
+        Start a generation (same fields as POST /chat). A new chat message
+        cancels any generation that is still in flight.
+    {"type": "cancel"}
+        Cancel the in-flight generation.
+
+Server -> client
+    {"type": "start", "id": n}
+    {"type": "token", "id": n, "content": "..."}
+    {"type": "end", "id": n, "reply": "..."}
+    {"type": "cancelled", "id": n}
+    {"type": "error", "id": n | null, "detail": "..."}
+
+Every generation ends with exactly one end, cancelled or error frame, also
+when loading the chart or the model stream fails.
+
+Tokens pass through a bounded per-connection send queue: when the client reads
+slowly the producer blocks, which in turn stops pulling from the model stream.
+"""
+import asyncio
+import concurrent.futures
+import json
+import os
+import threading
+from typing import Callable, Iterator, Optional
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from . import schemas
+except ImportError:
+    import schemas
+
+SEND_QUEUE_SIZE = int(os.getenv("CHAT_WS_SEND_QUEUE_SIZE", "32"))
+# How often a blocked producer re-checks whether its generation was cancelled
+PRODUCER_POLL_SECONDS = 0.25
+
+
+class ChatSocketSession:
+    """Serves one /ws/chat connection."""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        stream_reply: Callable[..., Iterator[str]],
+        load_chart_digest: Callable[[int, str], str],
+        send_queue_size: int = SEND_QUEUE_SIZE,
+    ):
+        self.websocket = websocket
+        self.stream_reply = stream_reply
+        self.load_chart_digest = load_chart_digest
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=send_queue_size)
+        self.generation_id = 0
+        self.task: Optional[asyncio.Task] = None
+        self.stop_event: Optional[threading.Event] = None
+
+    async def run(self) -> None:
+        await self.websocket.accept()
+        sender = asyncio.create_task(self._sender())
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                if message.get("text") is None:
+                    await self.queue.put({"type": "error", "id": None, "detail": "Only JSON text frames are supported"})
+                    continue
+                try:
+                    data = json.loads(message["text"])
+                except ValueError:
+                    await self.queue.put({"type": "error", "id": None, "detail": "Invalid JSON"})
+                    continue
+                kind = data.get("type", "chat") if isinstance(data, dict) else None
+                if kind == "cancel":
+                    await self._cancel()
+                elif kind == "chat":
+                    await self._start(data)
+                else:
+                    await self.queue.put({"type": "error", "id": None, "detail": f"Unknown message type: {kind}"})
+        except WebSocketDisconnect:
+            pass
+        finally:
+            await self._cancel(notify=False)
+            sender.cancel()
+
+    async def _sender(self) -> None:
+        """Drain the send queue; drops tokens of generations that are no longer current."""
+        while True:
+            message = await self.queue.get()
+            if message["type"] == "token" and message["id"] != self.generation_id:
+                continue
+            try:
+                await self.websocket.send_json(message)
+            except Exception:
+                return
+
+    async def _start(self, data: dict) -> None:
+        await self._cancel()
+        try:
+            payload = schemas.ChatRequest(**{k: v for k, v in data.items() if k != "type"})
+        except Exception as exc:
+            await self.queue.put({"type": "error", "id": None, "detail": f"Invalid chat message: {exc}"})
+            return
+        self.generation_id += 1
+        self.stop_event = threading.Event()
+        self.task = asyncio.create_task(self._generate(self.generation_id, payload, self.stop_event))
+
+    async def _cancel(self, notify: bool = True) -> None:
+        """Stop the in-flight generation (if any) and wait for it to wind down."""
+        task, stop = self.task, self.stop_event
+        self.task = self.stop_event = None
+        if task is None or task.done():
+            return
+        stop.set()
+        cancelled_id = self.generation_id
+        # Tokens still queued for the cancelled generation are dropped by the sender
+        self.generation_id += 1
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+        if notify:
+            await self.queue.put({"type": "cancelled", "id": cancelled_id})
+
+    async def _generate(self, gen_id: int, payload: schemas.ChatRequest, stop: threading.Event) -> None:
+        language = (payload.language or "zh").strip() or "zh"
+        messages = [{"role": m.role, "content": m.content} for m in payload.messages]
+        chart_digest = None
+        if payload.reading_id is not None:
+            try:
+                chart_digest = await run_in_threadpool(self.load_chart_digest, payload.reading_id, language)
+            except HTTPException as exc:
+                await self.queue.put({"type": "error", "id": gen_id, "detail": exc.detail})
+                return
+            except Exception as exc:
+                print(f"Warning: Chat chart lookup failed: {exc}")
+                await self.queue.put({"type": "error", "id": gen_id, "detail": "Chart is unavailable right now"})
+                return
+
+        await self.queue.put({"type": "start", "id": gen_id})
+        loop = asyncio.get_running_loop()
+
+        def produce() -> str:
+            parts = []
+            chunks = self.stream_reply(messages, language=language, chart_digest=chart_digest)
+            try:
+                for chunk in chunks:
+                    if stop.is_set() or not self._put_blocking(loop, {"type": "token", "id": gen_id, "content": chunk}, stop):
+                        return ""
+                    parts.append(chunk)
+            finally:
+                # Closing the generator closes the upstream model stream
+                chunks.close()
+            return "".join(parts)
+
+        try:
+            reply = await run_in_threadpool(produce)
+        except asyncio.CancelledError:
+            stop.set()
+            raise
+        except Exception as exc:
+            stop.set()
+            print(f"Warning: Chat generation failed: {exc}")
+            await self.queue.put({"type": "error", "id": gen_id, "detail": "Reply generation failed"})
+            return
+        if not stop.is_set():
+            await self.queue.put({"type": "end", "id": gen_id, "reply": reply.strip()})
+
+    def _put_blocking(self, loop: asyncio.AbstractEventLoop, message: dict, stop: threading.Event) -> bool:
+        """Put from the producer thread, blocking while the send queue is full (backpressure)."""
+        future = asyncio.run_coroutine_threadsafe(self.queue.put(message), loop)
+        while True:
+            try:
+                future.result(timeout=PRODUCER_POLL_SECONDS)
+                return True
+            except concurrent.futures.TimeoutError:
+                if stop.is_set():
+                    future.cancel()
+                    return False
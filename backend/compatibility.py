@@ -0,0 +1,297 @@
+"""
+Compatibility (合婚) scoring between Bazi charts.
+
+Charts are integer-coded (stem and branch indexes per pillar plus a
+five-element weight vector) so one chart can be scored against a large
+candidate pool with NumPy broadcasting instead of looping over strings.
+
+Score (0-100) is a weighted sum of three parts:
+- day master: Ten-God relationship of each day stem to the other (both
+  directions); a 天干五合 pair (甲己, 乙庚, ...) scores full marks
+- elements: half how balanced the two element distributions are when
+  combined (how well each fills the other's gaps), half how the partner's
+  elements act on one's day master through the 生 / 克 cycles
+  (ELEMENT_GENERATION / ELEMENT_CONQUEST), in both directions
+- branches: 六合 / 六冲 between the day branches, plus 六合 / 三合 / 六冲
+  between the year branches (zodiac)
+"""
+import re
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from .bazi import (
+        BRANCH_HIDDEN_STEMS,
+        EARTHLY_BRANCHES,
+        ELEMENT_CONQUEST,
+        ELEMENT_GENERATION,
+        ELEMENT_ORDER,
+        FIVE_ELEMENTS,
+        HEAVENLY_STEMS,
+        TEN_GODS,
+        get_ten_god,
+        normalize_element,
+    )
+except ImportError:
+    from bazi import (
+        BRANCH_HIDDEN_STEMS,
+        EARTHLY_BRANCHES,
+        ELEMENT_CONQUEST,
+        ELEMENT_GENERATION,
+        ELEMENT_ORDER,
+        FIVE_ELEMENTS,
+        HEAVENLY_STEMS,
+        TEN_GODS,
+        get_ten_god,
+        normalize_element,
+    )
+
+WEIGHT_DAY_MASTER = 0.35
+WEIGHT_ELEMENTS = 0.35
+WEIGHT_BRANCHES = 0.30
+
+HIDDEN_STEM_WEIGHT = 0.3  # same weighting as analyze_elements
+
+TEN_GOD_NAMES = list(TEN_GODS) + ["未知"]
+# How favourable the partner's day stem is, seen from one's own day master
+TEN_GOD_SCORES = {
+    "比肩": 0.5, "劫财": 0.4, "食神": 0.7, "伤官": 0.4, "偏财": 0.6,
+    "正财": 0.9, "七杀": 0.3, "正官": 0.9, "偏印": 0.5, "正印": 0.8, "未知": 0.5,
+}
+
+BRANCH_RELATION_NAMES = {1: "合", 0: "无", -1: "冲"}
+
+STEM_ELEMENT = np.array([normalize_element(FIVE_ELEMENTS[s]) for s in HEAVENLY_STEMS], dtype=np.int8)
+
+
+def _build_element_interaction() -> np.ndarray:
+    """5x5 effect of element i on element j: +1 when i generates (生) j, -1 when i conquers (克) j."""
+    table = np.zeros((5, 5), dtype=np.float32)
+    for source, target in ELEMENT_GENERATION.items():
+        table[normalize_element(source), normalize_element(target)] = 1.0
+    for source, target in ELEMENT_CONQUEST.items():
+        table[normalize_element(source), normalize_element(target)] = -1.0
+    return table
+
+
+ELEMENT_INTERACTION = _build_element_interaction()
+
+
+def _build_ten_god_table() -> np.ndarray:
+    """10x10 Ten-God codes (index into TEN_GOD_NAMES) for (day stem, other stem)."""
+    table = np.zeros((10, 10), dtype=np.int8)
+    for d, day_stem in enumerate(HEAVENLY_STEMS):
+        for t, target_stem in enumerate(HEAVENLY_STEMS):
+            table[d, t] = TEN_GOD_NAMES.index(get_ten_god(day_stem, target_stem))
+    return table
+
+
+TEN_GOD_TABLE = _build_ten_god_table()
+TEN_GOD_SCORE_VECTOR = np.array([TEN_GOD_SCORES[name] for name in TEN_GOD_NAMES], dtype=np.float32)
+
+_stems = np.arange(10)
+STEM_COMBINATION = (np.abs(_stems[:, None] - _stems[None, :]) == 5)  # 甲己 乙庚 丙辛 丁壬 戊癸
+
+
+def _build_branch_relations(include_trine: bool) -> np.ndarray:
+    b = np.arange(12)
+    rel = np.zeros((12, 12), dtype=np.int8)
+    rel[(b[:, None] + b[None, :]) % 12 == 1] = 1  # 六合: 子丑 寅亥 卯戌 辰酉 巳申 午未
+    if include_trine:
+        trine = (b[:, None] % 4 == b[None, :] % 4) & (b[:, None] != b[None, :])
+        rel[trine] = 1  # 三合: 申子辰 亥卯未 寅午戌 巳酉丑
+    rel[(b[:, None] - b[None, :]) % 12 == 6] = -1  # 六冲
+    return rel
+
+
+DAY_BRANCH_RELATIONS = _build_branch_relations(include_trine=False)
+YEAR_BRANCH_RELATIONS = _build_branch_relations(include_trine=True)
+
+
+def _build_element_weights() -> Tuple[np.ndarray, np.ndarray]:
+    """Per-stem and per-branch (hidden stems) contribution to the 5-element vector."""
+    stem_weights = np.eye(5, dtype=np.float32)[STEM_ELEMENT]
+    branch_weights = np.zeros((12, 5), dtype=np.float32)
+    for i, branch in enumerate(EARTHLY_BRANCHES):
+        for stem in BRANCH_HIDDEN_STEMS[branch]:
+            branch_weights[i, STEM_ELEMENT[HEAVENLY_STEMS.index(stem)]] += HIDDEN_STEM_WEIGHT
+    return stem_weights, branch_weights
+
+
+STEM_ELEMENT_WEIGHTS, BRANCH_ELEMENT_WEIGHTS = _build_element_weights()
+
+_EPOCH_1900 = np.datetime64("1900-01-01", "D")
+
+
+class ChartCodes:
+    """
+    Integer-coded charts. stems / branches are (N, 4) int8 arrays in
+    year, month, day, hour order (-1 for an unknown hour); elements is the
+    (N, 5) element distribution in ELEMENT_ORDER, normalized to sum to 1.
+    """
+
+    __slots__ = ("stems", "branches", "elements")
+
+    def __init__(self, stems: np.ndarray, branches: np.ndarray):
+        self.stems = stems
+        self.branches = branches
+        known = stems >= 0
+        weights = (
+            STEM_ELEMENT_WEIGHTS[np.where(known, stems, 0)] + BRANCH_ELEMENT_WEIGHTS[np.where(known, branches, 0)]
+        ) * known[..., None]
+        totals = weights.sum(axis=(1, 2))
+        self.elements = weights.sum(axis=1) / totals[:, None]
+
+    def __len__(self) -> int:
+        return len(self.stems)
+
+
+def parse_hour(birth_time: Optional[str]) -> Optional[int]:
+    """Hour (0-23) of an HH:MM time; None when missing or unparsable, as in build_chart."""
+    if not birth_time:
+        return None
+    try:
+        hour = int(birth_time.split(":")[0])
+    except (ValueError, IndexError):
+        return None
+    return hour if 0 <= hour <= 23 else None
+
+
+# What datetime.strptime(..., "%Y-%m-%d") accepts; NumPy alone also takes "", "NaT", "1990" and "1990-05"
+DATE_FORMAT = re.compile(r"\d{4}-\d{1,2}-\d{1,2}")
+
+
+def encode_births(birth_dates: Sequence[str], hours: Sequence[Optional[int]]) -> ChartCodes:
+    """
+    Encode many births at once with the same rules as bazi.compute_*_pillar
+    (year from the 1984 甲子 base, 年上起月, day from 1900-01-01 庚子, 日上起时).
+    Raises ValueError for a malformed date, as /bazi does.
+    """
+    for d in birth_dates:
+        if not isinstance(d, str) or not DATE_FORMAT.fullmatch(d):
+            raise ValueError(f"time data {d!r} does not match format '%Y-%m-%d'")
+    try:
+        dates = np.array(birth_dates, dtype="datetime64[D]")
+    except ValueError:
+        # Non-padded dates such as 1990-5-1: normalize through strptime (raises on 1990-02-30)
+        dates = np.array([datetime.strptime(d, "%Y-%m-%d").strftime("%Y-%m-%d") for d in birth_dates], dtype="datetime64[D]")
+    if np.isnat(dates).any():
+        raise ValueError("birth_date must not be NaT")
+    return encode_dates(dates, hours)
+
+
+def encode_dates(dates: np.ndarray, hours: Sequence[Optional[int]]) -> ChartCodes:
+    """encode_births for an already parsed datetime64[D] array."""
+    years = dates.astype("datetime64[Y]").astype(np.int64) + 1970
+    months = dates.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    days = (dates - _EPOCH_1900).astype(np.int64)
+
+    year_offset = (years - 1984) % 60
+    year_stem = year_offset % 10
+    year_branch = year_offset % 12
+
+    lunar_month = np.where(months == 1, 12, months - 1)  # 公历2月 = 寅月
+    month_stem = ((year_stem % 5) * 2 + 2 + lunar_month - 1) % 10
+    month_branch = (lunar_month + 1) % 12
+
+    day_stem = (6 + days) % 10
+    day_branch = days % 12
+
+    hour_arr = np.array([-1 if h is None else h for h in hours], dtype=np.int64)
+    hour_index = ((hour_arr + 1) // 2) % 12
+    has_hour = hour_arr >= 0
+    hour_stem = np.where(has_hour, ((day_stem % 5) * 2 + hour_index) % 10, -1)
+    hour_branch = np.where(has_hour, hour_index, -1)
+
+    stems = np.stack([year_stem, month_stem, day_stem, hour_stem], axis=1).astype(np.int8)
+    branches = np.stack([year_branch, month_branch, day_branch, hour_branch], axis=1).astype(np.int8)
+    return ChartCodes(stems, branches)
+
+
+def score_matrix(a: ChartCodes, b: ChartCodes) -> dict:
+    """Pairwise scores of every chart in a against every chart in b: dict of (N, M) arrays."""
+    dm_a = a.stems[:, 2].astype(np.intp)[:, None]
+    dm_b = b.stems[:, 2].astype(np.intp)[None, :]
+    ten_god_ab = TEN_GOD_TABLE[dm_a, dm_b]
+    ten_god_ba = TEN_GOD_TABLE[dm_b, dm_a]
+    day_master = (TEN_GOD_SCORE_VECTOR[ten_god_ab] + TEN_GOD_SCORE_VECTOR[ten_god_ba]) / 2
+    combined = STEM_COMBINATION[dm_a, dm_b]
+    day_master = np.where(combined, 1.0, day_master)
+
+    # Distance of the combined distribution from a perfectly even one (max L1 is 1.6)
+    mixed = (a.elements[:, None, :] + b.elements[None, :, :]) / 2
+    balance = 1.0 - np.abs(mixed - 0.2).sum(axis=2) / 1.6
+    # Net 生 minus 克 of each partner's elements on the other's day master element (-1..1)
+    on_dm_a = (ELEMENT_INTERACTION[:, STEM_ELEMENT[a.stems[:, 2]]].T @ b.elements.T).astype(np.float32)
+    on_dm_b = (a.elements @ ELEMENT_INTERACTION[:, STEM_ELEMENT[b.stems[:, 2]]]).astype(np.float32)
+    interaction = (on_dm_a + on_dm_b + 2) / 4
+    elements = (balance + interaction) / 2
+
+    day_rel = DAY_BRANCH_RELATIONS[a.branches[:, 2].astype(np.intp)[:, None], b.branches[:, 2].astype(np.intp)[None, :]]
+    year_rel = YEAR_BRANCH_RELATIONS[a.branches[:, 0].astype(np.intp)[:, None], b.branches[:, 0].astype(np.intp)[None, :]]
+    branches = 0.5 + 0.25 * day_rel + 0.25 * year_rel
+
+    total = 100 * (WEIGHT_DAY_MASTER * day_master + WEIGHT_ELEMENTS * elements + WEIGHT_BRANCHES * branches)
+    return {
+        "score": total,
+        "day_master": day_master,
+        "elements": elements,
+        "branches": branches,
+        "ten_god_ab": ten_god_ab,
+        "ten_god_ba": ten_god_ba,
+        "stem_combination": combined,
+        "day_branch_relation": day_rel,
+        "year_branch_relation": year_rel,
+    }
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indexes of the k highest scores, best first (argpartition, then sort only those k)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    part = np.sort(np.argpartition(-scores, k - 1)[:k])  # ties keep candidate order
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def _round(value) -> float:
+    return round(float(value), 1)
+
+
+def pair_compatibility(a_date: str, a_hour: Optional[int], b_date: str, b_hour: Optional[int]) -> dict:
+    """Score two births and name the relationships behind the score."""
+    charts = encode_births([a_date, b_date], [a_hour, b_hour])
+    a = ChartCodes(charts.stems[:1], charts.branches[:1])
+    b = ChartCodes(charts.stems[1:], charts.branches[1:])
+    m = {key: value[0, 0] for key, value in score_matrix(a, b).items()}
+    return {
+        "score": _round(m["score"]),
+        "day_master_score": _round(100 * m["day_master"]),
+        "element_score": _round(100 * m["elements"]),
+        "branch_score": _round(100 * m["branches"]),
+        "day_master_a": HEAVENLY_STEMS[a.stems[0, 2]],
+        "day_master_b": HEAVENLY_STEMS[b.stems[0, 2]],
+        "ten_god_a_to_b": TEN_GOD_NAMES[m["ten_god_ab"]],
+        "ten_god_b_to_a": TEN_GOD_NAMES[m["ten_god_ba"]],
+        "stem_combination": bool(m["stem_combination"]),
+        "day_branch_relation": BRANCH_RELATION_NAMES[int(m["day_branch_relation"])],
+        "year_branch_relation": BRANCH_RELATION_NAMES[int(m["year_branch_relation"])],
+        "elements_a": {ELEMENT_ORDER[i]: _round(100 * v) for i, v in enumerate(a.elements[0])},
+        "elements_b": {ELEMENT_ORDER[i]: _round(100 * v) for i, v in enumerate(b.elements[0])},
+    }
+
+
+def rank_candidates(
+    birth_date: str,
+    hour: Optional[int],
+    candidate_dates: List[str],
+    candidate_hours: List[Optional[int]],
+    k: int,
+) -> List[Tuple[int, float]]:
+    """(candidate index, score) of the k best matches for one birth."""
+    query = encode_births([birth_date], [hour])
+    candidates = encode_births(candidate_dates, candidate_hours)
+    scores = score_matrix(query, candidates)["score"][0]
+    return [(int(i), _round(scores[i])) for i in top_k(scores, k)]
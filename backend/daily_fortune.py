@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Daily fortune (今日运势) per day master.
+
+For each date, the day pillar is crossed with the 10 possible day masters
+(Ten God of the day stem, element relation) and rendered from fixed templates
+in every language. The whole (date x day master x language) table for the
+coming days is small, so it is precomputed, kept in memory as ready-to-send
+JSON bytes, and saved as a gzip file (DAILY_FORTUNE_PATH) that other workers
+and restarts load instead of recomputing. GET /fortune/daily is then a dict
+lookup.
+
+    python daily_fortune.py --days 14     # rebuild the file (e.g. from cron)
+
+The API also refreshes the table in the background (see refresh_loop).
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import sys
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+try:
+    from .bazi import ELEMENT_ORDER, FIVE_ELEMENTS, HEAVENLY_STEMS, compute_day_pillar, element_relation, get_ten_god, normalize_element
+    from .responses import dumps
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from bazi import ELEMENT_ORDER, FIVE_ELEMENTS, HEAVENLY_STEMS, compute_day_pillar, element_relation, get_ten_god, normalize_element
+    from responses import dumps
+
+DEFAULT_FORTUNE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "daily_fortune.json.gz")
+DAILY_FORTUNE_DAYS = int(os.getenv("DAILY_FORTUNE_DAYS", "7"))
+DAILY_FORTUNE_REFRESH_SECONDS = float(os.getenv("DAILY_FORTUNE_REFRESH_SECONDS", "3600"))
+LANGUAGES = ["zh", "en", "mi"]
+
+# 1-5 stars for the day stem's Ten God relative to the day master
+TEN_GOD_RATING = {
+    "正财": 5, "正官": 4, "正印": 4, "食神": 4, "偏财": 4,
+    "比肩": 3, "偏印": 3, "伤官": 2, "劫财": 2, "七杀": 2,
+}
+
+TEN_GOD_TEXT = {
+    "zh": {
+        "比肩": "今日同气相求，适合与朋友、同事合作，但要避免意气之争。",
+        "劫财": "今日易有竞争与破费，理财宜保守，遇事多沟通。",
+        "食神": "今日心情舒畅、灵感充沛，适合创作、学习与享受生活。",
+        "伤官": "今日表达欲强，言辞易锋利，谈判与沟通时需留有余地。",
+        "偏财": "今日偏财机会较多，可把握意外之喜，但忌贪多冒进。",
+        "正财": "今日财运稳健，努力付出容易得到回报，适合处理财务。",
+        "七杀": "今日压力与挑战并存，保持冷静果断，注意身体与安全。",
+        "正官": "今日贵人运佳，适合处理正式事务、面试与承担责任。",
+        "偏印": "今日思考深入、直觉敏锐，适合研究与独处，少做仓促决定。",
+        "正印": "今日易得长辈与贵人相助，适合学习、进修与休养。",
+    },
+    "en": {
+        "比肩": "A day of like minds: good for teamwork with friends and colleagues, but avoid ego clashes.",
+        "劫财": "Competition and unexpected spending are likely; keep finances conservative and talk things through.",
+        "食神": "Relaxed and inspired: a good day for creative work, learning and enjoying life.",
+        "伤官": "You feel like speaking your mind; soften your words in negotiations and discussions.",
+        "偏财": "Windfalls and side opportunities appear; take them, but don't overreach.",
+        "正财": "Steady money luck: effort pays off, and it's a good day to sort out finances.",
+        "七杀": "Pressure and challenges arrive together; stay calm and decisive, and mind your health and safety.",
+        "正官": "Helpful people are around: good for formal matters, interviews and taking responsibility.",
+        "偏印": "Deep thinking and sharp intuition: good for research and quiet time, not for hasty decisions.",
+        "正印": "Support from mentors and elders comes easily; a good day to study, train or rest.",
+    },
+    "mi": {
+        "比肩": "He rā mō te mahi tahi me ō hoa me ō hoamahi; kia tūpato ki ngā tautohe.",
+        "劫财": "Tērā pea he whakataetae, he whakapau moni ohorere; kia tūpato ki ō pūtea, kōrero tahi.",
+        "食神": "He rā ngāwari, ki tonu i te whakaaro hou: pai mō te auaha, te ako me te koa.",
+        "伤官": "Ka hiahia koe ki te kōrero i ō whakaaro; kia ngāwari ō kupu i ngā whiriwhiringa.",
+        "偏财": "Ka puta mai he waimarie ohorere; hopukina, engari kaua e apo.",
+        "正财": "He waimarie pūtea pūmau: ka whai hua tō whakapau kaha.",
+        "七杀": "Ka tae mai te pēhanga me ngā wero; kia mārie, kia tūpato ki tō hauora.",
+        "正官": "Kei te tata mai ngā tāngata āwhina: pai mō ngā take ōkawa me ngā uiuinga.",
+        "偏印": "He rā whakaaro hōhonu: pai mō te rangahau me te noho puku, kaua e kōhukihuki.",
+        "正印": "Ka āwhinatia koe e ngā kaumātua me ngā kaiārahi; pai mō te ako me te okioki.",
+    },
+}
+
+LUCKY_COLOR = {
+    "zh": ["绿色", "红色", "黄色", "白色", "黑色"],
+    "en": ["green", "red", "yellow", "white", "black"],
+    "mi": ["kākāriki", "whero", "kōwhai", "mā", "pango"],
+}
+LUCKY_DIRECTION = {
+    "zh": ["东", "南", "中", "西", "北"],
+    "en": ["east", "south", "centre", "west", "north"],
+    "mi": ["rāwhiti", "tonga", "waenganui", "uru", "raki"],
+}
+
+
+def fortune_key(day: date, day_master: str, language: str) -> str:
+    return f"{day.isoformat()}|{day_master}|{language}"
+
+
+def build_entry(day: date, day_master: str, language: str) -> dict:
+    """Fortune of one date for one day master (the only place analysis code runs)."""
+    pillar = compute_day_pillar(day.year, day.month, day.day)
+    ten_god = get_ten_god(day_master, pillar.stem)
+    master_element = normalize_element(FIVE_ELEMENTS[day_master])
+    # Lucky element: the one that generates the day master (印)
+    lucky = (master_element - 1) % 5
+    texts = TEN_GOD_TEXT.get(language, TEN_GOD_TEXT["en"])
+    return {
+        "date": day.isoformat(),
+        "day_pillar": f"{pillar.stem}{pillar.branch}",
+        "day_master": day_master,
+        "ten_god": ten_god,
+        "relation": element_relation(FIVE_ELEMENTS[day_master], pillar.element),
+        "rating": TEN_GOD_RATING.get(ten_god, 3),
+        "text": texts.get(ten_god, ""),
+        "lucky_element": ELEMENT_ORDER[lucky],
+        "lucky_color": LUCKY_COLOR.get(language, LUCKY_COLOR["en"])[lucky],
+        "lucky_direction": LUCKY_DIRECTION.get(language, LUCKY_DIRECTION["en"])[lucky],
+        "language": language,
+    }
+
+
+def build_table(start: date, days: int, languages: Iterable[str] = LANGUAGES) -> Dict[str, dict]:
+    table = {}
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        for day_master in HEAVENLY_STEMS:
+            for language in languages:
+                table[fortune_key(day, day_master, language)] = build_entry(day, day_master, language)
+    return table
+
+
+class DailyFortuneTable:
+    """In-memory table of serialized entries, backed by a gzip JSON file."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("DAILY_FORTUNE_PATH", DEFAULT_FORTUNE_PATH)
+        self._bodies: Dict[str, bytes] = {}
+        self.last_date: Optional[date] = None
+        self._lock = threading.Lock()
+
+    def get(self, day: date, day_master: str, language: str) -> bytes:
+        """Serialized entry; dates outside the table are built on the spot (not kept)."""
+        body = self._bodies.get(fortune_key(day, day_master, language))
+        if body is None:
+            body = dumps(build_entry(day, day_master, language))
+        return body
+
+    def _install(self, entries: Dict[str, dict]) -> None:
+        bodies = {key: dumps(entry) for key, entry in entries.items()}
+        dates = [date.fromisoformat(key.split("|", 1)[0]) for key in entries]
+        # Swap the whole dict at once so readers never see a partial table
+        self._bodies = bodies
+        self.last_date = max(dates) if dates else None
+
+    def load(self) -> bool:
+        """Load the precomputed file; False when it is missing or unreadable."""
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Warning: Failed to load daily fortune table: {e}")
+            return False
+        self._install(payload["entries"])
+        return True
+
+    def save(self, entries: Dict[str, dict]) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        payload = {"generated_at": datetime.utcnow().isoformat(), "entries": entries}
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+    def covers(self, start: date, days: int) -> bool:
+        return self.last_date is not None and self.last_date >= start + timedelta(days=days - 1) \
+            and fortune_key(start, HEAVENLY_STEMS[0], LANGUAGES[0]) in self._bodies
+
+    def refresh(self, days: int = DAILY_FORTUNE_DAYS, save: bool = True, today: Optional[date] = None) -> bool:
+        """
+        Make sure yesterday (for clients in earlier time zones) through the next
+        `days` days are in memory: load the file if it covers them, otherwise
+        rebuild and save it. Returns True when the table was rebuilt.
+        """
+        start = (today or date.today()) - timedelta(days=1)
+        with self._lock:
+            if self.covers(start, days + 1):
+                return False
+            if self.load() and self.covers(start, days + 1):
+                return False
+            entries = build_table(start, days + 1)
+            self._install(entries)
+            if save:
+                try:
+                    self.save(entries)
+                except OSError as e:
+                    print(f"Warning: Failed to save daily fortune table: {e}")
+            return True
+
+
+daily_fortunes = DailyFortuneTable()
+
+
+async def refresh_loop(table: DailyFortuneTable = daily_fortunes, interval: float = DAILY_FORTUNE_REFRESH_SECONDS) -> None:
+    """Keep the table ahead of the calendar until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(table.refresh)
+        except Exception as e:
+            print(f"Warning: Daily fortune refresh failed: {e}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Precompute the daily fortune table")
+    parser.add_argument("--days", type=int, default=DAILY_FORTUNE_DAYS, help="days ahead to build (plus yesterday)")
+    parser.add_argument("--start", default=None, help="first date (YYYY-MM-DD, default yesterday)")
+    parser.add_argument("--path", default=None, help="output file (default DAILY_FORTUNE_PATH)")
+    args = parser.parse_args()
+
+    start = date.fromisoformat(args.start) if args.start else date.today() - timedelta(days=1)
+    table = DailyFortuneTable(args.path)
+    entries = build_table(start, args.days + 1)
+    table.save(entries)
+    print(f"Wrote {len(entries)} entries ({start} .. {start + timedelta(days=args.days)}) to {table.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""
+Idempotency keys for write endpoints (POST /bazi, POST /readings).
+
+Clients that retry on timeouts send the same Idempotency-Key header with
+every attempt. The first request with a key runs normally and its response
+(status, body, media type) is stored; repeats get the stored response back
+with an Idempotency-Replayed: true header, without recomputing the chart,
+calling the LLM or writing another reading. A repeat that arrives while the
+first request is still running waits for it instead of starting a second one.
+
+Tiers:
+- in-process LRU (IDEMPOTENCY_CACHE_SIZE entries, IDEMPOTENCY_TTL seconds)
+- optional Redis (IDEMPOTENCY_REDIS_URL, falls back to REDIS_URL), which
+  shares stored responses between workers and holds a per-key lock so a
+  duplicate sent to another worker waits as well
+
+A key reused with a different request body is rejected with 422. 5xx
+responses and errors are not stored, so the next retry runs again.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException, Request, Response
+
+try:
+    from .lru import LRUCache
+except ImportError:
+    from lru import LRUCache
+
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+# How long a duplicate waits for the first request before giving up with 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "60"))
+MAX_KEY_LENGTH = 255
+REDIS_PREFIX = "idempotency:"
+REPLAYED_HEADER = "Idempotency-Replayed"
+
+Producer = Callable[[], Awaitable[Response]]
+
+
+class _Stored:
+    __slots__ = ("fingerprint", "status_code", "media_type", "body", "stored_at")
+
+    def __init__(self, fingerprint: str, status_code: int, media_type: Optional[str], body: bytes, stored_at: float):
+        self.fingerprint = fingerprint
+        self.status_code = status_code
+        self.media_type = media_type
+        self.body = body
+        self.stored_at = stored_at
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "f": self.fingerprint,
+            "s": self.status_code,
+            "m": self.media_type,
+            "b": self.body.decode("utf-8"),
+            "t": self.stored_at,
+        })
+
+    @classmethod
+    def from_json(cls, raw) -> "_Stored":
+        payload = json.loads(raw)
+        return cls(payload["f"], payload["s"], payload["m"], payload["b"].encode("utf-8"), payload["t"])
+
+    def response(self) -> Response:
+        return Response(
+            content=self.body,
+            status_code=self.status_code,
+            media_type=self.media_type,
+            headers={REPLAYED_HEADER: "true"},
+        )
+
+
+async def request_fingerprint(request: Request) -> str:
+    """Hash of the path, query string and body (FastAPI has already read and cached the body)."""
+    digest = hashlib.sha256()
+    digest.update(request.url.path.encode())
+    digest.update(b"?" + request.url.query.encode() + b"\n")
+    digest.update(await request.body())
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(
+        self,
+        max_size: int = IDEMPOTENCY_CACHE_SIZE,
+        ttl: float = IDEMPOTENCY_TTL,
+        wait_seconds: float = IDEMPOTENCY_WAIT_SECONDS,
+        redis_url: Optional[str] = None,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.wait_seconds = wait_seconds
+        self.redis_url = redis_url if redis_url is not None else (
+            os.getenv("IDEMPOTENCY_REDIS_URL") or os.getenv("REDIS_URL")
+        )
+        self._entries = LRUCache(max_size, ttl)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._redis = None
+        self.replays = 0
+        self.waits = 0
+
+    def _get_redis(self):
+        if not self.redis_url:
+            return None
+        if self._redis is None:
+            try:
+                import redis.asyncio as redis_asyncio
+            except ImportError:
+                print("Warning: redis package not installed, idempotency keys stay in-process")
+                self.redis_url = None
+                return None
+            self._redis = redis_asyncio.from_url(self.redis_url)
+        return self._redis
+
+    # -- stored responses --------------------------------------------------
+
+    def _local_get(self, key: str) -> Optional[_Stored]:
+        return self._entries.get(key)
+
+    def _local_put(self, key: str, entry: _Stored) -> None:
+        self._entries.put(key, entry)
+
+    async def _shared_get(self, key: str) -> Optional[_Stored]:
+        client = self._get_redis()
+        if client is None:
+            return None
+        try:
+            raw = await client.get(f"{REDIS_PREFIX}r:{key}")
+        except Exception as e:
+            print(f"Warning: Idempotency store read failed: {e}")
+            return None
+        if raw is None:
+            return None
+        entry = _Stored.from_json(raw)
+        self._local_put(key, entry)
+        return entry
+
+    async def _store(self, key: str, entry: _Stored) -> None:
+        self._local_put(key, entry)
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            await client.set(f"{REDIS_PREFIX}r:{key}", entry.to_json(), ex=max(1, int(self.ttl)))
+        except Exception as e:
+            print(f"Warning: Idempotency store write failed: {e}")
+
+    # -- cross-worker lock -------------------------------------------------
+
+    async def _acquire_shared(self, key: str) -> bool:
+        """True when this worker may run the request (no Redis, or the lock was taken)."""
+        client = self._get_redis()
+        if client is None:
+            return True
+        try:
+            return bool(await client.set(f"{REDIS_PREFIX}l:{key}", "1", nx=True, ex=max(1, int(self.wait_seconds))))
+        except Exception as e:
+            print(f"Warning: Idempotency lock failed: {e}")
+            return True
+
+    async def _release_shared(self, key: str) -> None:
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            await client.delete(f"{REDIS_PREFIX}l:{key}")
+        except Exception as e:
+            print(f"Warning: Idempotency unlock failed: {e}")
+
+    # -- request handling --------------------------------------------------
+
+    def _replay(self, entry: _Stored, fingerprint: str) -> Response:
+        if entry.fingerprint != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        self.replays += 1
+        return entry.response()
+
+    async def run(self, scope: str, idempotency_key: str, fingerprint: str, produce: Producer) -> Response:
+        """
+        Response for (scope, idempotency_key): the stored one when the key was
+        seen before, otherwise produce() once while duplicates wait for it.
+        """
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+        key = f"{scope}:{idempotency_key}"
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            entry = self._local_get(key)
+            if entry is not None:
+                return self._replay(entry, fingerprint)
+            pending = self._in_flight.get(key)
+            if pending is not None:
+                # Same worker: wait for the first request; it stores the response or fails
+                self.waits += 1
+                try:
+                    await asyncio.wait_for(asyncio.shield(pending), deadline - time.monotonic())
+                except asyncio.TimeoutError:
+                    break
+                continue
+            entry = await self._shared_get(key)
+            if entry is not None:
+                return self._replay(entry, fingerprint)
+            if await self._acquire_shared(key):
+                return await self._lead(key, fingerprint, produce)
+            # Another worker holds the key: poll until it stores a response or lets go
+            self.waits += 1
+            if time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(0.1)
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+
+    async def _lead(self, key: str, fingerprint: str, produce: Producer) -> Response:
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            response = await produce()
+            if response.status_code < 500:
+                await self._store(key, _Stored(fingerprint, response.status_code, response.media_type, bytes(response.body), time.time()))
+            return response
+        finally:
+            del self._in_flight[key]
+            future.set_result(None)
+            await self._release_shared(key)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "replays": self.replays,
+            "waits": self.waits,
+            "shared": bool(self.redis_url),
+        }
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            try:
+                await self._redis.aclose()
+            except Exception:
+                pass
+            self._redis = None
+
+
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,156 @@
+"""
+Interpretation cache keyed by chart signature.
+
+A signature is (day pillar, element balance, use god, avoid god, focus, language):
+charts that share it get the same interpretation, so the text is generated from
+those fields alone (ai_service.generate_signature_interpretation), never from
+one user's full chart. The set of signatures is
+small, so the offline job in warm_interpretations.py can pre-generate all of
+them; /bazi then serves interpretations from this store instead of calling
+the LLM.
+
+The store is a SQLite file (INTERPRETATION_CACHE_PATH) fronted by an
+in-process dict, so a hit costs one dictionary lookup after first use.
+"""
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "interpretations.sqlite3")
+
+FOCUS_OPTIONS = ["overall", "career", "wealth", "love", "health", "family"]
+# Bumped when what a stored text depends on changes; entries under an older version are never read
+SIGNATURE_VERSION = "v2"
+
+
+def chart_signature(
+    day_pillar,
+    element_balance: str,
+    use_god: Optional[str],
+    avoid_god: Optional[str],
+    analysis_focus: Optional[str],
+    language: str,
+) -> str:
+    """Canonical cache key for an interpretation."""
+    return "|".join([
+        SIGNATURE_VERSION,
+        f"{day_pillar.stem}{day_pillar.branch}",
+        element_balance or "",
+        use_god or "",
+        avoid_god or "",
+        analysis_focus or "overall",
+        language,
+    ])
+
+
+def signature_for_chart(chart, analysis_focus: Optional[str], language: str) -> str:
+    """Signature of a schemas.BaziChart."""
+    analysis = chart.analysis
+    return chart_signature(
+        chart.day_pillar,
+        analysis.element_analysis.element_balance,
+        analysis.use_god,
+        analysis.avoid_god,
+        analysis_focus,
+        language,
+    )
+
+
+class InterpretationStore:
+    """SQLite-backed interpretation store with an in-process read cache."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("INTERPRETATION_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self._memory: Dict[str, str] = {}
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._initialized = False
+        self._loaded = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            if not self._initialized:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS interpretations ("
+                    "signature TEXT PRIMARY KEY, interpretation TEXT NOT NULL, created_at TEXT NOT NULL)"
+                )
+                conn.commit()
+                self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    def get(self, signature: str) -> Optional[str]:
+        text = self._memory.get(signature)
+        if text is not None:
+            return text
+        try:
+            row = self._connect().execute(
+                "SELECT interpretation FROM interpretations WHERE signature = ?", (signature,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Warning: Interpretation cache read failed: {e}")
+            return None
+        if row is None:
+            return None
+        self._memory[signature] = row[0]
+        return row[0]
+
+    def put(self, signature: str, interpretation: str) -> None:
+        self.bulk_put([(signature, interpretation)])
+
+    def bulk_put(self, rows: Iterable[Tuple[str, str]]) -> int:
+        """Insert or replace many interpretations in one transaction."""
+        now = datetime.utcnow().isoformat()
+        rows = [(sig, text, now) for sig, text in rows if text]
+        if not rows:
+            return 0
+        with self._write_lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO interpretations (signature, interpretation, created_at) VALUES (?, ?, ?)",
+                    rows,
+                )
+        for sig, text, _ in rows:
+            self._memory[sig] = text
+        return len(rows)
+
+    def existing_signatures(self) -> Set[str]:
+        return {row[0] for row in self._connect().execute("SELECT signature FROM interpretations")}
+
+    def load_all(self) -> int:
+        """
+        Preload every stored interpretation into memory (the store is small).
+        A no-op when already loaded, so workers forked from a preloaded master
+        keep sharing the parent's pages.
+        """
+        if not self._loaded:
+            for sig, text in self._connect().execute("SELECT signature, interpretation FROM interpretations"):
+                self._memory[sig] = text
+            self._loaded = True
+        return len(self._memory)
+
+    def close(self) -> None:
+        """Close this thread's SQLite connection (call before forking workers)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_store: Optional[InterpretationStore] = None
+
+
+def get_store() -> InterpretationStore:
+    global _store
+    if _store is None:
+        _store = InterpretationStore()
+    return _store
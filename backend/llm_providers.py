@@ -0,0 +1,372 @@
+"""
+Pluggable LLM provider layer used by ai_service.
+
+Providers are configured per purpose ("interpretation", "chat") through
+environment variables. A purpose-specific variable wins over the generic one:
+
+    LLM_PROVIDER / LLM_<PURPOSE>_PROVIDER        openai | stub   (default: openai when an API key is set)
+    LLM_BASE_URL / LLM_<PURPOSE>_BASE_URL        OpenAI-compatible endpoint (self-hosted inference server)
+    LLM_API_KEY / LLM_<PURPOSE>_API_KEY          defaults to OPENAI_API_KEY
+    LLM_MODEL / LLM_<PURPOSE>_MODEL              default gpt-3.5-turbo
+    LLM_TIMEOUT / LLM_<PURPOSE>_TIMEOUT          seconds per request (default 30)
+    LLM_MAX_CONNECTIONS / ...                    connection pool size per provider (default 10)
+    LLM_SUPPORTS_BATCH / ...                     1 if the endpoint accepts batched prompts
+    LLM_BATCH_SIZE / LLM_BATCH_WAIT_MS / ...     micro-batching of concurrent requests
+
+Each purpose gets its own provider instance, hence its own connection pool and
+timeout, so bulk interpretation traffic can go to a cheaper batched local model
+while chat stays on a hosted one.
+"""
+import concurrent.futures
+import hashlib
+import os
+import queue
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+
+def _setting(purpose: str, key: str, default: Optional[str] = None) -> Optional[str]:
+    return os.getenv(f"LLM_{purpose.upper()}_{key}") or os.getenv(f"LLM_{key}") or default
+
+
+class LLMProvider:
+    """Base provider: one chat completion per call; batches fall back to a loop."""
+
+    name = "base"
+    supports_batch = False
+
+    def __init__(self, model: str = DEFAULT_MODEL, timeout: float = 30.0):
+        self.model = model
+        self.timeout = timeout
+
+    def complete(self, messages: List[dict], max_tokens: int = 500, temperature: float = 0.7) -> str:
+        raise NotImplementedError
+
+    def stream(self, messages: List[dict], max_tokens: int = 500, temperature: float = 0.7) -> Iterator[str]:
+        yield self.complete(messages, max_tokens=max_tokens, temperature=temperature)
+
+    def complete_batch(self, batch: List[List[dict]], max_tokens: int = 500, temperature: float = 0.7) -> List[str]:
+        return [self.complete(messages, max_tokens=max_tokens, temperature=temperature) for messages in batch]
+
+    def close(self) -> None:
+        pass
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """
+    OpenAI or any OpenAI-compatible HTTP endpoint (vLLM, llama.cpp server, etc.).
+    Batches use the completions endpoint with a list of prompts, which such
+    servers schedule together; enable with supports_batch.
+    """
+
+    name = "openai"
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        model: str = DEFAULT_MODEL,
+        base_url: Optional[str] = None,
+        timeout: float = 30.0,
+        max_connections: int = 10,
+        supports_batch: bool = False,
+    ):
+        super().__init__(model=model, timeout=timeout)
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.supports_batch = supports_batch
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # The SDK is imported on first use so importing this module stays cheap
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import httpx
+                    from openai import OpenAI
+                    http_client = httpx.Client(
+                        limits=httpx.Limits(
+                            max_connections=self.max_connections,
+                            max_keepalive_connections=self.max_connections,
+                        ),
+                        timeout=self.timeout,
+                    )
+                    self._client = OpenAI(
+                        api_key=self.api_key or "not-needed",
+                        base_url=self.base_url,
+                        timeout=self.timeout,
+                        max_retries=1,
+                        http_client=http_client,
+                    )
+        return self._client
+
+    def complete(self, messages: List[dict], max_tokens: int = 500, temperature: float = 0.7) -> str:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+        )
+        return (response.choices[0].message.content or "").strip()
+
+    def stream(self, messages: List[dict], max_tokens: int = 500, temperature: float = 0.7) -> Iterator[str]:
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+        )
+        try:
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+        finally:
+            stream.close()
+
+    def complete_batch(self, batch: List[List[dict]], max_tokens: int = 500, temperature: float = 0.7) -> List[str]:
+        if not self.supports_batch or len(batch) == 1:
+            return super().complete_batch(batch, max_tokens=max_tokens, temperature=temperature)
+        response = self.client.completions.create(
+            model=self.model,
+            prompt=[render_prompt(messages) for messages in batch],
+            max_tokens=max_tokens,
+            temperature=temperature,
+        )
+        replies = [""] * len(batch)
+        for choice in response.choices:
+            replies[choice.index] = (choice.text or "").strip()
+        return replies
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+class StubProvider(LLMProvider):
+    """
+    Deterministic local provider for tests and benchmarks: the reply depends only
+    on the input messages. STUB_LATENCY_MS simulates upstream latency per call.
+    """
+
+    name = "stub"
+    supports_batch = True
+
+    def __init__(self, model: str = "stub", timeout: float = 30.0, latency_ms: float = 0.0):
+        super().__init__(model=model, timeout=timeout)
+        self.latency_ms = latency_ms
+        self.calls = 0
+        self.batches = 0
+
+    def _reply(self, messages: List[dict]) -> str:
+        digest = hashlib.sha256(render_prompt(messages).encode("utf-8")).hexdigest()[:12]
+        last_user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        return f"[{self.model}:{digest}] {' '.join(last_user.split())[:80]}"
+
+    def complete(self, messages: List[dict], max_tokens: int = 500, temperature: float = 0.7) -> str:
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return self._reply(messages)
+
+    def stream(self, messages: List[dict], max_tokens: int = 500, temperature: float = 0.7) -> Iterator[str]:
+        for word in self.complete(messages, max_tokens=max_tokens, temperature=temperature).split(" "):
+            yield word + " "
+
+    def complete_batch(self, batch: List[List[dict]], max_tokens: int = 500, temperature: float = 0.7) -> List[str]:
+        self.batches += 1
+        self.calls += len(batch)
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return [self._reply(messages) for messages in batch]
+
+
+def render_prompt(messages: List[dict]) -> str:
+    """Flatten chat messages into a single completion prompt."""
+    lines = [f"{m.get('role', 'user').capitalize()}: {m.get('content', '')}" for m in messages]
+    return "\n\n".join(lines) + "\n\nAssistant:"
+
+
+class MicroBatcher:
+    """
+    Collects concurrent completion requests for up to max_wait_ms (or max_batch_size
+    requests) and sends them to the provider as one batch. Callers block until their
+    own reply is ready, so the synchronous call sites stay unchanged.
+    """
+
+    def __init__(self, provider: LLMProvider, max_batch_size: int = 8, max_wait_ms: float = 20.0, workers: int = 2):
+        self.provider = provider
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-batch")
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, messages: List[dict], max_tokens: int = 500, temperature: float = 0.7) -> str:
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        self._ensure_thread()
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        self._queue.put((messages, max_tokens, temperature, future))
+        return future.result(timeout=self.provider.timeout + self.max_wait + 5)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="llm-batcher", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            # Requests can only share a batch when their sampling parameters match
+            groups: Dict[Tuple[int, float], list] = {}
+            for entry in batch:
+                groups.setdefault((entry[1], entry[2]), []).append(entry)
+            for (max_tokens, temperature), entries in groups.items():
+                self._executor.submit(self._dispatch, entries, max_tokens, temperature)
+
+    def _dispatch(self, entries: list, max_tokens: int, temperature: float) -> None:
+        try:
+            replies = self.provider.complete_batch([e[0] for e in entries], max_tokens=max_tokens, temperature=temperature)
+        except Exception as exc:
+            for entry in entries:
+                entry[3].set_exception(exc)
+            return
+        for entry, reply in zip(entries, replies):
+            entry[3].set_result(reply)
+
+    def close(self) -> None:
+        """Stop accepting requests and finish the ones already queued."""
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=self.max_wait + 1)
+        self._executor.shutdown(wait=True)
+
+
+_providers: Dict[str, Optional[LLMProvider]] = {}
+_batchers: Dict[str, MicroBatcher] = {}
+_registry_lock = threading.Lock()
+
+
+def create_provider(purpose: str) -> Optional[LLMProvider]:
+    """Build the provider configured for `purpose`; None if no LLM is configured."""
+    api_key = _setting(purpose, "API_KEY") or os.getenv("OPENAI_API_KEY")
+    base_url = _setting(purpose, "BASE_URL")
+    kind = (_setting(purpose, "PROVIDER") or ("openai" if (api_key or base_url) else "")).lower()
+    model = _setting(purpose, "MODEL")
+    timeout = float(_setting(purpose, "TIMEOUT", "30"))
+    if kind == "stub":
+        return StubProvider(model=model or "stub", timeout=timeout, latency_ms=float(os.getenv("STUB_LATENCY_MS", "0")))
+    if kind == "openai":
+        try:
+            import openai  # noqa: F401
+        except ImportError:
+            print("Warning: openai package is not installed; LLM provider disabled")
+            return None
+        return OpenAICompatibleProvider(
+            api_key=api_key,
+            model=model or DEFAULT_MODEL,
+            base_url=base_url,
+            timeout=timeout,
+            max_connections=int(_setting(purpose, "MAX_CONNECTIONS", "10")),
+            supports_batch=_setting(purpose, "SUPPORTS_BATCH", "0") in ("1", "true", "yes"),
+        )
+    if kind:
+        print(f"Warning: Unknown LLM provider '{kind}' for {purpose}")
+    return None
+
+
+def get_provider(purpose: str) -> Optional[LLMProvider]:
+    """Process-wide provider for a purpose (one pool per purpose)."""
+    if purpose not in _providers:
+        with _registry_lock:
+            if purpose not in _providers:
+                _providers[purpose] = create_provider(purpose)
+    return _providers[purpose]
+
+
+def set_provider(purpose: str, provider: Optional[LLMProvider]) -> None:
+    """Override the provider for a purpose (tests, benchmarks)."""
+    with _registry_lock:
+        batcher = _batchers.pop(purpose, None)
+        if batcher is not None:
+            batcher.close()
+        _providers[purpose] = provider
+
+
+def _get_batcher(purpose: str, provider: LLMProvider) -> Optional[MicroBatcher]:
+    batch_size = int(_setting(purpose, "BATCH_SIZE", "8"))
+    if not provider.supports_batch or batch_size <= 1:
+        return None
+    if purpose not in _batchers:
+        with _registry_lock:
+            if purpose not in _batchers:
+                _batchers[purpose] = MicroBatcher(
+                    provider,
+                    max_batch_size=batch_size,
+                    max_wait_ms=float(_setting(purpose, "BATCH_WAIT_MS", "20")),
+                )
+    return _batchers[purpose]
+
+
+def complete(purpose: str, messages: List[dict], max_tokens: int = 500, temperature: float = 0.7) -> Optional[str]:
+    """
+    Run one completion through the provider for `purpose`, micro-batched when the
+    provider accepts batches. Returns None if no provider is configured.
+    """
+    provider = get_provider(purpose)
+    if provider is None:
+        return None
+    batcher = _get_batcher(purpose, provider)
+    if batcher is not None:
+        return batcher.submit(messages, max_tokens=max_tokens, temperature=temperature)
+    return provider.complete(messages, max_tokens=max_tokens, temperature=temperature)
+
+
+def stream(purpose: str, messages: List[dict], max_tokens: int = 500, temperature: float = 0.7) -> Optional[Iterator[str]]:
+    """Streaming completion; None if no provider is configured."""
+    provider = get_provider(purpose)
+    if provider is None:
+        return None
+    return provider.stream(messages, max_tokens=max_tokens, temperature=temperature)
+
+
+def close_providers() -> None:
+    """Drain pending micro-batches and close provider connection pools (shutdown hook)."""
+    with _registry_lock:
+        batchers = list(_batchers.values())
+        providers = [p for p in _providers.values() if p is not None]
+        _batchers.clear()
+        _providers.clear()
+    for batcher in batchers:
+        batcher.close()
+    for provider in providers:
+        provider.close()
@@ -0,0 +1,59 @@
+"""
+Small bounded LRU map with an optional TTL, shared by the in-process caches
+(chat summaries, chart digests, chart hashes, reading history, idempotency
+keys, analytics dimensions).
+
+get() refreshes recency; `key in cache` does not. Entries older than ttl
+seconds (when set) are dropped on access. Thread-safe, so it can be used
+from the threadpool and from the event loop alike.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and time.monotonic() - stored_at > self.ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return default
+            if self._expired(item[0]):
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return item[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._entries.pop(key, None)
+            return default if item is None else item[1]
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            item = self._entries.get(key)
+            return item is not None and not self._expired(item[0])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -1,47 +1,239 @@
-from typing import List
-from datetime import datetime
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from datetime import date, datetime, timedelta
+import asyncio
+import csv
+import hashlib
+import io
 import json
 import sys
 import os
+import threading
+import time
+import zlib
 
-from fastapi import Depends, FastAPI, File, UploadFile, HTTPException
+from fastapi import Depends, FastAPI, File, Header, UploadFile, HTTPException, Query, Request, Response, WebSocket
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select, tuple_
 from sqlalchemy.orm import Session
 
 # Support both relative and absolute imports
 try:
     from . import models, schemas
-    from .db import Base, engine, get_db
+    from .bazi import (
+        HEAVENLY_STEMS,
+        EARTHLY_BRANCHES,
+        FIVE_ELEMENTS,
+        CHINESE_ZODIAC,
+        BRANCH_HIDDEN_STEMS,
+        TEN_GODS,
+        ELEMENT_GENERATION,
+        ELEMENT_CONQUEST,
+        compute_year_pillar,
+        compute_month_pillar,
+        compute_day_pillar,
+        compute_hour_pillar,
+        get_hidden_stems,
+        get_ten_god,
+        analyze_elements,
+        analyze_ten_gods,
+        analyze_use_god,
+        build_chart,
+        build_lookup_tables,
+        ELEMENT_ORDER,
+        normalize_element,
+    )
+    from .db import (
+        LazyAsyncSession,
+        SessionLocal,
+        dispose_async_engine,
+        get_async_db,
+        get_async_sessionmaker,
+        get_db,
+        init_db,
+    )
     from .ocr import analyze_image_text
+    from .chart_digest import get_reading_digest
+    from .chat_ws import ChatSocketSession
+    from .worker_health import RequestStatsMiddleware, start_heartbeat, worker_stats
+    from .reading_cache import reading_cache
+    from .idempotency import idempotency_store, request_fingerprint
+    from . import analytics
+    from .reading_partitions import archive_loop as readings_archive_loop, iter_archived, read_archived
+    from .reading_spool import db_breaker, is_connection_error, reading_spool, replay_loop as spool_replay_loop, save_readings
+    from .responses import FastJSONResponse, dumps as json_dumps
+    from . import compatibility
+    from .timeline import Timeline, normalize_gender
+    from .almanac import almanac_store
+    from .reverse_index import BRANCH_HOURS, day_to_iso, parse_pillar, reverse_index
+    from .ziwei import build_ziwei_chart
+    from . import reading_engines
+    from . import name_analysis
+    from .daily_fortune import LANGUAGES as FORTUNE_LANGUAGES, daily_fortunes, refresh_loop as daily_fortune_refresh_loop
 except ImportError:
     # If relative imports fail, fall back to absolute imports
     sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
     import models
     import schemas
-    from db import Base, engine, get_db
+    from bazi import (
+        HEAVENLY_STEMS,
+        EARTHLY_BRANCHES,
+        FIVE_ELEMENTS,
+        CHINESE_ZODIAC,
+        BRANCH_HIDDEN_STEMS,
+        TEN_GODS,
+        ELEMENT_GENERATION,
+        ELEMENT_CONQUEST,
+        compute_year_pillar,
+        compute_month_pillar,
+        compute_day_pillar,
+        compute_hour_pillar,
+        get_hidden_stems,
+        get_ten_god,
+        analyze_elements,
+        analyze_ten_gods,
+        analyze_use_god,
+        build_chart,
+        build_lookup_tables,
+        ELEMENT_ORDER,
+        normalize_element,
+    )
+    from db import (
+        LazyAsyncSession,
+        SessionLocal,
+        dispose_async_engine,
+        get_async_db,
+        get_async_sessionmaker,
+        get_db,
+        init_db,
+    )
     from ocr import analyze_image_text
+    from chart_digest import get_reading_digest
+    from chat_ws import ChatSocketSession
+    from worker_health import RequestStatsMiddleware, start_heartbeat, worker_stats
+    from reading_cache import reading_cache
+    from idempotency import idempotency_store, request_fingerprint
+    import analytics
+    from reading_partitions import archive_loop as readings_archive_loop, iter_archived, read_archived
+    from reading_spool import db_breaker, is_connection_error, reading_spool, replay_loop as spool_replay_loop, save_readings
+    from responses import FastJSONResponse, dumps as json_dumps
+    import compatibility
+    from timeline import Timeline, normalize_gender
+    from almanac import almanac_store
+    from reverse_index import BRANCH_HOURS, day_to_iso, parse_pillar, reverse_index
+    from ziwei import build_ziwei_chart
+    import reading_engines
+    import name_analysis
+    from daily_fortune import LANGUAGES as FORTUNE_LANGUAGES, daily_fortunes, refresh_loop as daily_fortune_refresh_loop
 
 # Try to import the AI service; if it fails the core API still works
 try:
     try:
-        from .ai_service import generate_bazi_interpretation, chat_with_master
+        from .ai_service import get_cached_interpretation, chat_with_master, stream_chat_with_master
+        from .interpretation_cache import signature_for_chart
     except ImportError:
-        from ai_service import generate_bazi_interpretation, chat_with_master
+        from ai_service import get_cached_interpretation, chat_with_master, stream_chat_with_master
+        from interpretation_cache import signature_for_chart
     AI_SERVICE_AVAILABLE = True
 except ImportError:
     AI_SERVICE_AVAILABLE = False
-    def chat_with_master(messages, language="zh"):
+    def chat_with_master(messages, language="zh", chart_digest=None):
         return "Interpretation service is not available." if language == "en" else "解读服务暂不可用。"
+    def stream_chat_with_master(messages, language="zh", chart_digest=None):
+        yield chat_with_master(messages, language=language, chart_digest=chart_digest)
     print("Warning: AI service not available, will use basic interpretation")
 
-# Try to create database tables; if this fails the API can still respond
+# Optional AI helpers whose shutdown hooks run in the lifespan
 try:
-    Base.metadata.create_all(bind=engine)
-except Exception as db_init_error:
-    print(f"Warning: Database initialization failed: {db_init_error}")
-    print("API will work without database")
+    try:
+        from . import llm_providers
+        from .interpretation_cache import get_store as get_interpretation_store
+    except ImportError:
+        import llm_providers
+        from interpretation_cache import get_store as get_interpretation_store
+except ImportError:
+    llm_providers = None
+    get_interpretation_store = None
+
+
+def _create_tables():
+    """Create database tables; if this fails the API can still respond."""
+    try:
+        init_db()
+    except Exception as db_init_error:
+        print(f"Warning: Database initialization failed: {db_init_error}")
+        print("API will work without database")
+
+
+def warm_lookup_tables() -> dict:
+    """Build in-memory lookup tables once; returns the time spent per step (ms)."""
+    timings = {}
+    start = time.perf_counter()
+    build_lookup_tables()
+    timings["bazi_tables"] = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    try:
+        daily_fortunes.refresh()
+    except Exception as e:
+        print(f"Warning: Failed to prepare daily fortune table: {e}")
+    timings["daily_fortune"] = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    try:
+        almanac_store.record(date.today())  # builds / maps this year's table
+    except Exception as e:
+        print(f"Warning: Failed to map almanac table: {e}")
+    timings["almanac"] = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    try:
+        reverse_index.load()
+    except Exception as e:
+        print(f"Warning: Failed to map reverse pillar index: {e}")
+    timings["reverse_index"] = (time.perf_counter() - start) * 1000
+    if get_interpretation_store is not None:
+        start = time.perf_counter()
+        try:
+            get_interpretation_store().load_all()
+        except Exception as e:
+            print(f"Warning: Failed to preload interpretation cache: {e}")
+        timings["interpretation_cache"] = (time.perf_counter() - start) * 1000
+    return timings
 
-app = FastAPI(title="Fortune Telling API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema creation is a migration step (python db.py). For local runs it can
+    # still happen at startup, in the background so an unreachable database
+    # never delays /health.
+    if os.getenv("DB_AUTO_CREATE", "1") == "1":
+        threading.Thread(target=_create_tables, name="db-init", daemon=True).start()
+    timings = warm_lookup_tables()
+    print("Startup: " + ", ".join(f"{name} {ms:.1f}ms" for name, ms in timings.items()))
+    heartbeat = start_heartbeat()
+    fortune_refresh = asyncio.create_task(daily_fortune_refresh_loop())
+    spool_replay = asyncio.create_task(spool_replay_loop())
+    readings_archive = asyncio.create_task(readings_archive_loop())
+    analytics_tail = asyncio.create_task(analytics.tail_loop())
+    yield
+    # Graceful shutdown: drain in-memory queues before the worker exits
+    fortune_refresh.cancel()
+    spool_replay.cancel()
+    readings_archive.cancel()
+    analytics_tail.cancel()
+    reading_spool.close()
+    if heartbeat is not None:
+        heartbeat.cancel()
+    if llm_providers is not None:
+        llm_providers.close_providers()
+    almanac_store.close()
+    await reading_cache.close()
+    await idempotency_store.close()
+    await dispose_async_engine()
+
+
+app = FastAPI(title="Fortune Telling API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -50,6 +242,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestStatsMiddleware)
 
 
 @app.get("/health")
@@ -57,8 +250,37 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/health/worker")
+def worker_health():
+    """Health and request counters of the worker process that served this request."""
+    return worker_stats.snapshot()
+
+
 @app.post("/readings", response_model=schemas.ReadingOut)
-def create_reading(reading: schemas.ReadingCreate, db: Session = Depends(get_db)):
+async def create_reading(
+    reading: schemas.ReadingCreate,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: LazyAsyncSession = Depends(get_async_db),
+):
+    if idempotency_key is None:
+        return await _create_reading(reading, db)
+    fingerprint = await request_fingerprint(request)
+    return await idempotency_store.run("readings", idempotency_key, fingerprint, lambda: _create_reading(reading, db))
+
+
+def _database_unavailable() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Database unavailable, retry later",
+        headers={"Retry-After": str(int(db_breaker.reset_seconds))},
+    )
+
+
+async def _create_reading(reading: schemas.ReadingCreate, db: LazyAsyncSession):
+    if not db_breaker.allow():
+        # The client still holds the reading, so fail fast and let it retry
+        raise _database_unavailable()
     db_reading = models.Reading(
         type=reading.type,
         input_data=reading.input_data,
@@ -66,522 +288,213 @@ def create_reading(reading: schemas.ReadingCreate, db: Session = Depends(get_db)
         user_id=reading.user_id,
     )
     db.add(db_reading)
-    db.commit()
-    db.refresh(db_reading)
-    return db_reading
+    probe = db_breaker.is_probe()
+    try:
+        await db.commit()
+    except Exception as e:
+        if not is_connection_error(e):
+            db_breaker.record_success()  # the database answered
+            raise
+        db_breaker.record_failure()
+        raise _database_unavailable()
+    finally:
+        if probe:
+            db_breaker.end_probe()
+    db_breaker.record_success()
+    await db.refresh(db_reading)
+    await reading_cache.invalidate(db_reading.user_id)
+    return FastJSONResponse({name: getattr(db_reading, name) for name in schemas.ReadingOut.__fields__})
 
 
-@app.get("/readings", response_model=List[schemas.ReadingOut])
-def list_readings(db: Session = Depends(get_db)):
-    return db.query(models.Reading).order_by(models.Reading.created_at.desc()).limit(50).all()
-
-
-HEAVENLY_STEMS = ["甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸"]
-EARTHLY_BRANCHES = ["子", "丑", "寅", "卯", "辰", "巳", "午", "未", "申", "酉", "戌", "亥"]
-FIVE_ELEMENTS = {
-    "甲": "Wood",
-    "乙": "Wood",
-    "丙": "Fire",
-    "丁": "Fire",
-    "戊": "Earth",
-    "己": "Earth",
-    "庚": "Metal",
-    "辛": "Metal",
-    "壬": "Water",
-    "癸": "Water",
-}
-CHINESE_ZODIAC = [
-    "Rat",
-    "Ox",
-    "Tiger",
-    "Rabbit",
-    "Dragon",
-    "Snake",
-    "Horse",
-    "Goat",
-    "Monkey",
-    "Rooster",
-    "Dog",
-    "Pig",
-]
-
-# Mapping Earthly Branch -> hidden Heavenly Stems (principal, middle, remaining)
-BRANCH_HIDDEN_STEMS = {
-    "子": ["癸"],  # Zi: Gui (Water)
-    "丑": ["己", "癸", "辛"],  # Chou: Ji (Earth, principal), Gui (Water, middle), Xin (Metal, remaining)
-    "寅": ["甲", "丙", "戊"],  # Yin: Jia (Wood), Bing (Fire), Wu (Earth)
-    "卯": ["乙"],  # Mao: Yi (Wood)
-    "辰": ["戊", "乙", "癸"],  # Chen: Wu (Earth), Yi (Wood), Gui (Water)
-    "巳": ["丙", "戊", "庚"],  # Si: Bing (Fire), Wu (Earth), Geng (Metal)
-    "午": ["丁", "己"],  # Wu: Ding (Fire), Ji (Earth)
-    "未": ["己", "丁", "乙"],  # Wei: Ji (Earth), Ding (Fire), Yi (Wood)
-    "申": ["庚", "壬", "戊"],  # Shen: Geng (Metal), Ren (Water), Wu (Earth)
-    "酉": ["辛"],  # You: Xin (Metal)
-    "戌": ["戊", "辛", "丁"],  # Xu: Wu (Earth), Xin (Metal), Ding (Fire)
-    "亥": ["壬", "甲"],  # Hai: Ren (Water), Jia (Wood)
-}
+ReadingCursor = Tuple[datetime, int]
 
-# Ten-God relationship table (relative to the Day Master)
-TEN_GODS = {
-    "比肩": "same",  # Same element, same polarity (peer / companion)
-    "劫财": "same_yin_yang",  # Same element, opposite polarity
-    "食神": "output_same",  # Day Master produces this, same polarity (output/resourcefulness)
-    "伤官": "output_diff",  # Day Master produces this, opposite polarity
-    "偏财": "controlled_same",  # Day Master controls this, same polarity (indirect wealth)
-    "正财": "controlled_diff",  # Day Master controls this, opposite polarity (direct wealth)
-    "七杀": "control_same",  # This controls Day Master, same polarity (Seven Killings)
-    "正官": "control_diff",  # This controls Day Master, opposite polarity (Direct Officer)
-    "偏印": "generate_same",  # This produces Day Master, same polarity (Indirect Resource)
-    "正印": "generate_diff",  # This produces Day Master, opposite polarity (Direct Resource)
-}
 
-# Five Elements generating cycle
-ELEMENT_GENERATION = {  # Generate: Wood -> Fire -> Earth -> Metal -> Water -> Wood
-    "木": "火",
-    "火": "土",
-    "土": "金",
-    "金": "水",
-    "水": "木",
-}
+def _parse_cursor(cursor: Optional[str]) -> Optional[ReadingCursor]:
+    """'<created_at>,<id>' of the last item of the previous page -> (created_at, id)."""
+    if not cursor:
+        return None
+    try:
+        created_at, reading_id = cursor.rsplit(",", 1)
+        return datetime.fromisoformat(created_at.strip()), int(reading_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="cursor must be '<created_at>,<id>' of the last reading of the previous page")
 
-ELEMENT_CONQUEST = {  # Control: Wood controls Earth, Earth controls Water, Water controls Fire, Fire controls Metal, Metal controls Wood
-    "木": "土",
-    "土": "水",
-    "水": "火",
-    "火": "金",
-    "金": "木",
-}
 
+def _row_cursor(row: dict) -> ReadingCursor:
+    created_at = row["created_at"]
+    if isinstance(created_at, str):  # archived rows
+        created_at = datetime.fromisoformat(created_at)
+    return created_at or datetime.min, row["id"]
 
-def compute_year_pillar(year: int) -> schemas.BaziPillar:
-    """
-    Calculate year pillar using 1984 (甲子年) as base of 60-year cycle.
-    """
-    base_year = 1984  # 甲子年
-    offset = (year - base_year) % 60
-    stem = HEAVENLY_STEMS[offset % 10]
-    branch_index = offset % 12
-    branch = EARTHLY_BRANCHES[branch_index]
-    element = FIVE_ELEMENTS[stem]
-    animal = CHINESE_ZODIAC[branch_index]
-    return schemas.BaziPillar(stem=stem, branch=branch, element=element, animal=animal)
+
+async def _query_readings(db, user_id: Optional[int], reading_type: Optional[str], cursor: Optional[ReadingCursor], limit: int):
+    # Shared results live in chart_results; merge them back
+    query = select(models.Reading, models.ChartResult.result).outerjoin(
+        models.ChartResult, models.Reading.chart_hash == models.ChartResult.hash
+    )
+    if user_id is not None:
+        query = query.where(models.Reading.user_id == user_id)
+    if reading_type:
+        query = query.where(models.Reading.type == reading_type)
+    if cursor is not None:
+        # Keyset on the sort order: replayed readings get a new id but keep their created_at
+        query = query.where(tuple_(models.Reading.created_at, models.Reading.id) < tuple_(*cursor))
+    query = query.order_by(models.Reading.created_at.desc(), models.Reading.id.desc()).limit(limit)
+    result = await db.execute(query)
+    fields = list(schemas.ReadingOut.__fields__)
+    rows = []
+    for reading, chart_result in result.all():
+        row = {name: getattr(reading, name) for name in fields}
+        if row["result"] is None:
+            row["result"] = chart_result
+        rows.append(row)
+    return rows
 
 
-def compute_month_pillar(year_stem: str, month: int) -> schemas.BaziPillar:
+@app.get("/readings", response_model=List[schemas.ReadingOut])
+async def list_readings(
+    user_id: Optional[int] = None,
+    reading_type: Optional[str] = Query(None, alias="type"),
+    cursor: Optional[str] = Query(None, description="'<created_at>,<id>' of the last item of the previous page"),
+    limit: int = Query(50, ge=1, le=100),
+    include_archived: bool = Query(False, description="continue into archived months once the database runs out"),
+    db: LazyAsyncSession = Depends(get_async_db),
+):
     """
-    Calculate month pillar using 年上起月法 (Year-based month calculation).
-    Month 1 = 寅月 (February), Month 2 = 卯月 (March), etc.
+    Reading history, newest first. Served from the read-through cache when possible.
+    Months past the retention window live in the cold archive and are only
+    read with include_archived=true.
     """
-    # 年上起月法：根据年干确定月干
-    # 甲己之年丙作首，乙庚之年戊为头，丙辛之年寻庚起，丁壬壬寅顺水流，若问戊癸何处起，甲寅之上好追求
-    month_stem_map = {
-        "甲": ["丙", "丁", "戊", "己", "庚", "辛", "壬", "癸", "甲", "乙", "丙", "丁"],
-        "乙": ["戊", "己", "庚", "辛", "壬", "癸", "甲", "乙", "丙", "丁", "戊", "己"],
-        "丙": ["庚", "辛", "壬", "癸", "甲", "乙", "丙", "丁", "戊", "己", "庚", "辛"],
-        "丁": ["壬", "癸", "甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸"],
-        "戊": ["甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸", "甲", "乙"],
-        "己": ["丙", "丁", "戊", "己", "庚", "辛", "壬", "癸", "甲", "乙", "丙", "丁"],
-        "庚": ["戊", "己", "庚", "辛", "壬", "癸", "甲", "乙", "丙", "丁", "戊", "己"],
-        "辛": ["庚", "辛", "壬", "癸", "甲", "乙", "丙", "丁", "戊", "己", "庚", "辛"],
-        "壬": ["壬", "癸", "甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸"],
-        "癸": ["甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸", "甲", "乙"],
-    }
-    
-    # 月份对应地支：1月=寅，2月=卯，...，12月=丑
-    month_branches = ["寅", "卯", "辰", "巳", "午", "未", "申", "酉", "戌", "亥", "子", "丑"]
-    
-    # 调整月份：公历1月对应农历12月（丑月），公历2月对应农历1月（寅月）
-    if month == 1:
-        lunar_month = 12  # 丑月
-    else:
-        lunar_month = month - 1  # 公历2月=农历1月（寅月）
-    
-    stem = month_stem_map[year_stem][lunar_month - 1]
-    branch = month_branches[lunar_month - 1]
-    element = FIVE_ELEMENTS[stem]
-    
-    return schemas.BaziPillar(stem=stem, branch=branch, element=element, animal=None)
+    position = _parse_cursor(cursor)
 
+    async def load():
+        return await _query_readings(db, user_id, reading_type, position, limit)
 
-def compute_day_pillar(year: int, month: int, day: int) -> schemas.BaziPillar:
-    """
-    Calculate day pillar using a simplified formula.
-    This is a simplified version; for production, use a proper Chinese calendar library.
-    """
-    # 使用1900年1月1日为基准日（庚子日）
-    base_date = datetime(1900, 1, 1)
-    target_date = datetime(year, month, day)
-    days_diff = (target_date - base_date).days
-    
-    # 1900年1月1日是庚子日，庚是第6个天干（索引6），子是第0个地支（索引0）
-    base_stem_index = 6
-    base_branch_index = 0
-    
-    stem_index = (base_stem_index + days_diff) % 10
-    branch_index = (base_branch_index + days_diff) % 12
-    
-    stem = HEAVENLY_STEMS[stem_index]
-    branch = EARTHLY_BRANCHES[branch_index]
-    element = FIVE_ELEMENTS[stem]
-    
-    return schemas.BaziPillar(stem=stem, branch=branch, element=element, animal=None)
-
-
-def compute_hour_pillar(day_stem: str, hour: int) -> schemas.BaziPillar:
-    """
-    Calculate hour pillar using 日上起时法 (Day-based hour calculation).
-    Hour 23-1 = 子时, 1-3 = 丑时, ..., 21-23 = 亥时
-    """
-    # 日上起时法：根据日干确定时干
-    # 甲己还生甲，乙庚丙作初，丙辛从戊起，丁壬庚子居，戊癸何方发，壬子是真途
-    hour_stem_map = {
-        "甲": ["甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸", "甲", "乙"],
-        "乙": ["丙", "丁", "戊", "己", "庚", "辛", "壬", "癸", "甲", "乙", "丙", "丁"],
-        "丙": ["戊", "己", "庚", "辛", "壬", "癸", "甲", "乙", "丙", "丁", "戊", "己"],
-        "丁": ["庚", "辛", "壬", "癸", "甲", "乙", "丙", "丁", "戊", "己", "庚", "辛"],
-        "戊": ["壬", "癸", "甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸"],
-        "己": ["甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸", "甲", "乙"],
-        "庚": ["丙", "丁", "戊", "己", "庚", "辛", "壬", "癸", "甲", "乙", "丙", "丁"],
-        "辛": ["戊", "己", "庚", "辛", "壬", "癸", "甲", "乙", "丙", "丁", "戊", "己"],
-        "壬": ["庚", "辛", "壬", "癸", "甲", "乙", "丙", "丁", "戊", "己", "庚", "辛"],
-        "癸": ["壬", "癸", "甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸"],
-    }
-    
-    # 时辰对应地支：23-1=子，1-3=丑，3-5=寅，5-7=卯，7-9=辰，9-11=巳，11-13=午，13-15=未，15-17=申，17-19=酉，19-21=戌，21-23=亥
-    hour_branches = ["子", "丑", "寅", "卯", "辰", "巳", "午", "未", "申", "酉", "戌", "亥"]
-    
-    # 确定时辰索引（时辰从23点开始）
-    if hour == 23 or hour == 0:
-        hour_index = 0  # 子时 (23:00-01:00)
-    elif hour >= 1 and hour < 3:
-        hour_index = 1  # 丑时 (01:00-03:00)
-    elif hour >= 3 and hour < 5:
-        hour_index = 2  # 寅时 (03:00-05:00)
-    elif hour >= 5 and hour < 7:
-        hour_index = 3  # 卯时 (05:00-07:00)
-    elif hour >= 7 and hour < 9:
-        hour_index = 4  # 辰时 (07:00-09:00)
-    elif hour >= 9 and hour < 11:
-        hour_index = 5  # 巳时 (09:00-11:00)
-    elif hour >= 11 and hour < 13:
-        hour_index = 6  # 午时 (11:00-13:00)
-    elif hour >= 13 and hour < 15:
-        hour_index = 7  # 未时 (13:00-15:00)
-    elif hour >= 15 and hour < 17:
-        hour_index = 8  # 申时 (15:00-17:00)
-    elif hour >= 17 and hour < 19:
-        hour_index = 9  # 酉时 (17:00-19:00)
-    elif hour >= 19 and hour < 21:
-        hour_index = 10  # 戌时 (19:00-21:00)
-    else:  # hour >= 21 and hour < 23
-        hour_index = 11  # 亥时 (21:00-23:00)
-    
-    stem = hour_stem_map[day_stem][hour_index]
-    branch = hour_branches[hour_index]
-    element = FIVE_ELEMENTS[stem]
-    
-    return schemas.BaziPillar(stem=stem, branch=branch, element=element, animal=None)
-
-
-def get_hidden_stems(branch: str) -> list:
-    """获取地支藏干"""
-    return BRANCH_HIDDEN_STEMS.get(branch, [])
-
-
-def get_ten_god(day_stem: str, target_stem: str) -> str:
-    """
-    计算十神（以日主为基准）
-    日主与目标天干的关系
-    """
-    day_element = FIVE_ELEMENTS[day_stem]
-    target_element = FIVE_ELEMENTS[target_stem]
-    
-    # 判断阴阳：甲丙戊庚壬为阳，乙丁己辛癸为阴
-    day_is_yang = day_stem in ["甲", "丙", "戊", "庚", "壬"]
-    target_is_yang = target_stem in ["甲", "丙", "戊", "庚", "壬"]
-    same_yin_yang = day_is_yang == target_is_yang
-    
-    if day_stem == target_stem:
-        return "比肩"
-    
-    if day_element == target_element:
-        return "劫财"
-    
-    # 我生：日主生目标
-    if ELEMENT_GENERATION.get(day_element) == target_element:
-        return "食神" if same_yin_yang else "伤官"
-    
-    # 我克：日主克目标
-    if ELEMENT_CONQUEST.get(day_element) == target_element:
-        return "偏财" if same_yin_yang else "正财"
-    
-    # 克我：目标克日主
-    if ELEMENT_CONQUEST.get(target_element) == day_element:
-        return "七杀" if same_yin_yang else "正官"
-    
-    # 生我：目标生日主
-    if ELEMENT_GENERATION.get(target_element) == day_element:
-        return "偏印" if same_yin_yang else "正印"
-    
-    return "未知"
-
-
-def analyze_elements(pillars: list) -> schemas.ElementAnalysis:
-    """分析五行分布"""
-    element_count = {"木": 0, "火": 0, "土": 0, "金": 0, "水": 0}
-    
-    # 统计天干和地支藏干的五行
-    for pillar in pillars:
-        if pillar:
-            # 天干五行
-            element_count[pillar.element] = element_count.get(pillar.element, 0) + 1
-            
-            # 地支藏干五行
-            hidden_stems = get_hidden_stems(pillar.branch)
-            for stem in hidden_stems:
-                stem_element = FIVE_ELEMENTS.get(stem)
-                if stem_element:
-                    element_count[stem_element] = element_count.get(stem_element, 0) + 0.3  # 藏干权重较低
-    
-    # 找出主导五行
-    dominant_element = max(element_count.items(), key=lambda x: x[1])[0] if element_count else None
-    
-    # 找出缺失的五行
-    missing_elements = [elem for elem, count in element_count.items() if count == 0]
-    
-    # 判断五行平衡
-    max_count = max(element_count.values()) if element_count.values() else 0
-    min_count = min(element_count.values()) if element_count.values() else 0
-    balance_diff = max_count - min_count
-    
-    if balance_diff <= 1:
-        balance_status = "五行较为平衡"
-    elif balance_diff <= 2:
-        balance_status = "五行略有偏颇"
-    else:
-        balance_status = "五行明显失衡"
-    
-    return schemas.ElementAnalysis(
-        element_count=element_count,
-        dominant_element=dominant_element,
-        missing_elements=missing_elements,
-        element_balance=balance_status
-    )
+    async def revalidate():
+        async with get_async_sessionmaker()() as session:
+            return await _query_readings(session, user_id, reading_type, position, limit)
 
+    key = reading_cache.make_key(user_id, reading_type, position and f"{position[0].isoformat()},{position[1]}", limit)
+    rows = await reading_cache.get_or_load(key, user_id, load, revalidate)
+    if include_archived and len(rows) < limit:
+        # Archived months are older than anything in the database
+        archive_cursor = _row_cursor(rows[-1]) if rows else position
+        rows = rows + await run_in_threadpool(read_archived, user_id, reading_type, archive_cursor, limit - len(rows))
+    return FastJSONResponse(rows)
 
-def analyze_ten_gods(year_pillar, month_pillar, day_pillar, hour_pillar) -> schemas.TenGodAnalysis:
-    """分析十神"""
-    day_stem = day_pillar.stem
-    
-    year_ten_god = get_ten_god(day_stem, year_pillar.stem) if year_pillar else None
-    month_ten_god = get_ten_god(day_stem, month_pillar.stem) if month_pillar else None
-    hour_ten_god = get_ten_god(day_stem, hour_pillar.stem) if hour_pillar else None
-    
-    # 统计十神分布
-    ten_god_count = {}
-    for tg in [year_ten_god, month_ten_god, hour_ten_god]:
-        if tg:
-            ten_god_count[tg] = ten_god_count.get(tg, 0) + 1
-    
-    # 生成十神总结
-    summary_parts = []
-    if ten_god_count.get("正官") or ten_god_count.get("七杀"):
-        summary_parts.append("官杀较旺，有领导力和责任感")
-    if ten_god_count.get("正财") or ten_god_count.get("偏财"):
-        summary_parts.append("财星较旺，财运较好")
-    if ten_god_count.get("食神") or ten_god_count.get("伤官"):
-        summary_parts.append("食伤较旺，才华横溢")
-    if ten_god_count.get("正印") or ten_god_count.get("偏印"):
-        summary_parts.append("印星较旺，学习能力强")
-    
-    ten_god_summary = "；".join(summary_parts) if summary_parts else "十神分布较为均衡"
-    
-    return schemas.TenGodAnalysis(
-        year_ten_god=year_ten_god,
-        month_ten_god=month_ten_god,
-        day_ten_god="日主",
-        hour_ten_god=hour_ten_god,
-        ten_god_summary=ten_god_summary
+
+EXPORT_FIELDS = ["id", "type", "input_data", "result", "user_id", "created_at"]
+EXPORT_YIELD_PER = int(os.getenv("READINGS_EXPORT_YIELD_PER", "500"))
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+async def _export_rows(user_id: int, include_archived: bool):
+    """A user's readings, oldest first: archived months, then the database through a server-side cursor."""
+    if include_archived:
+        async for row in iterate_in_threadpool(iter_archived(user_id)):
+            yield row
+    query = (
+        select(
+            models.Reading.id,
+            models.Reading.type,
+            models.Reading.input_data,
+            func.coalesce(models.Reading.result, models.ChartResult.result).label("result"),
+            models.Reading.user_id,
+            models.Reading.created_at,
+        )
+        .outerjoin(models.ChartResult, models.Reading.chart_hash == models.ChartResult.hash)
+        .where(models.Reading.user_id == user_id)
+        .order_by(models.Reading.id)
+        .execution_options(yield_per=EXPORT_YIELD_PER)
     )
+    # Own session: the response body is streamed after the handler has returned
+    async with get_async_sessionmaker()() as session:
+        result = await session.stream(query)
+        async for row in result:
+            yield row._asdict()
 
 
-def analyze_use_god(day_master_element: str, element_analysis: schemas.ElementAnalysis) -> tuple:
-    """
-    分析用神和忌神
-    简化版本：根据五行平衡情况判断
-    """
-    element_count = element_analysis.element_count
-    day_element = day_master_element
-    
-    # 计算日主的力量
-    day_power = element_count.get(day_element, 0)
-    
-    # 计算生助日主的力量（生我的五行）
-    generate_element = None
-    for elem, gen_elem in ELEMENT_GENERATION.items():
-        if gen_elem == day_element:
-            generate_element = elem
-            break
-    
-    generate_power = element_count.get(generate_element, 0) if generate_element else 0
-    
-    # 计算总力量
-    total_support = day_power + generate_power
-    
-    # 计算克制日主的力量（克我的五行）
-    control_element = None
-    for elem, conq_elem in ELEMENT_CONQUEST.items():
-        if conq_elem == day_element:
-            control_element = elem
-            break
-    
-    control_power = element_count.get(control_element, 0) if control_element else 0
-    
-    # 判断身强身弱
-    if total_support > control_power + 1:
-        # 身强，用神为克泄耗
-        use_god = control_element or ELEMENT_GENERATION.get(day_element) or ELEMENT_CONQUEST.get(day_element)
-        avoid_god = generate_element or day_element
-    else:
-        # 身弱，用神为生扶
-        use_god = generate_element or day_element
-        avoid_god = control_element
-    
-    return use_god, avoid_god
+def _csv_line(row: dict) -> bytes:
+    buffer = io.StringIO()
+    created_at = row["created_at"]
+    values = dict(row, created_at=created_at.isoformat() if isinstance(created_at, datetime) else created_at)
+    csv.writer(buffer).writerow([values[name] for name in EXPORT_FIELDS])
+    return buffer.getvalue().encode("utf-8")
 
 
-@app.post("/bazi", response_model=schemas.BaziResponse)
-def calculate_bazi(payload: schemas.BaziRequest, db: Session = Depends(get_db)):
+async def _export_body(rows, fmt: str, compress: bool):
+    """Encode rows in ~64 KB chunks, optionally as one gzip stream."""
+    encoder = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    chunk = bytearray()
+    if fmt == "csv":
+        chunk += (",".join(EXPORT_FIELDS) + "\r\n").encode("utf-8")
+    async for row in rows:
+        chunk += _csv_line(row) if fmt == "csv" else json_dumps(row) + b"\n"
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield encoder.compress(bytes(chunk)) if encoder else bytes(chunk)
+            chunk.clear()
+    if encoder:
+        yield encoder.compress(bytes(chunk)) + encoder.flush()
+    elif chunk:
+        yield bytes(chunk)
+
+
+@app.get("/users/{user_id}/readings/export")
+async def export_readings(
+    user_id: int,
+    fmt: str = Query("ndjson", alias="format", description="'ndjson' or 'csv'"),
+    gzip: bool = Query(False, description="compress the download (.gz)"),
+    include_archived: bool = Query(True, description="include months moved to the cold archive"),
+):
     """
-    Calculate complete Bazi (Four Pillars): Year, Month, Day, and Hour pillars.
+    Every reading of a user, oldest first, streamed with chunked transfer.
+    Rows come from a server-side cursor (yield_per), so memory stays
+    constant however long the history is.
     """
-    try:
-        # Parse YYYY-MM-DD format
-        birth = datetime.strptime(payload.birth_date, "%Y-%m-%d")
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=f"Invalid birth_date format, expected YYYY-MM-DD: {str(e)}")
+    if fmt not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+    filename = f"readings-user-{user_id}.{fmt}" + (".gz" if gzip else "")
+    media_type = "application/gzip" if gzip else ("text/csv; charset=utf-8" if fmt == "csv" else "application/x-ndjson")
+    return StreamingResponse(
+        _export_body(_export_rows(user_id, include_archived), fmt, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
-    try:
-        # Calculate Year Pillar
-        year_pillar = compute_year_pillar(birth.year)
-        
-        # Calculate Month Pillar
-        month_pillar = compute_month_pillar(year_pillar.stem, birth.month)
-        
-        # Calculate Day Pillar
-        day_pillar = compute_day_pillar(birth.year, birth.month, birth.day)
-        
-        # Calculate Hour Pillar (if time provided)
-        hour_pillar = None
-        if payload.birth_time:
-            try:
-                # Parse HH:MM format
-                time_parts = payload.birth_time.split(":")
-                hour = int(time_parts[0])
-                hour_pillar = compute_hour_pillar(day_pillar.stem, hour)
-            except (ValueError, IndexError) as time_error:
-                # If time parsing fails, just skip hour pillar
-                print(f"Warning: Failed to parse birth_time '{payload.birth_time}': {time_error}")
-
-        # 添加地支藏干和十神信息
-        year_pillar.hidden_stems = get_hidden_stems(year_pillar.branch)
-        year_pillar.ten_god = get_ten_god(day_pillar.stem, year_pillar.stem)
-        
-        month_pillar.hidden_stems = get_hidden_stems(month_pillar.branch)
-        month_pillar.ten_god = get_ten_god(day_pillar.stem, month_pillar.stem)
-        
-        day_pillar.hidden_stems = get_hidden_stems(day_pillar.branch)
-        day_pillar.ten_god = "日主"
-        
-        if hour_pillar:
-            hour_pillar.hidden_stems = get_hidden_stems(hour_pillar.branch)
-            hour_pillar.ten_god = get_ten_god(day_pillar.stem, hour_pillar.stem)
-
-        # Build summary
-        summary_parts = [
-            f"年柱：{year_pillar.stem}{year_pillar.branch}年（{year_pillar.element}，{year_pillar.animal}）",
-            f"月柱：{month_pillar.stem}{month_pillar.branch}月（{month_pillar.element}）",
-            f"日柱：{day_pillar.stem}{day_pillar.branch}日（{day_pillar.element}）",
-        ]
-        
-        if hour_pillar:
-            summary_parts.append(f"时柱：{hour_pillar.stem}{hour_pillar.branch}时（{hour_pillar.element}）")
-        else:
-            summary_parts.append("时柱：未提供出生时间")
-        
-        summary = " | ".join(summary_parts)
-        
-        # 进行详细分析
-        pillars_list = [year_pillar, month_pillar, day_pillar, hour_pillar]
-        element_analysis = analyze_elements(pillars_list)
-        ten_god_analysis = analyze_ten_gods(year_pillar, month_pillar, day_pillar, hour_pillar)
-        
-        # 分析用神忌神
-        use_god, avoid_god = analyze_use_god(day_pillar.element, element_analysis)
-        
-        # 生成分析总结
-        analysis_summary_parts = [
-            f"日主：{day_pillar.stem}（{day_pillar.element}）",
-            f"五行分布：{', '.join([f'{k}{int(v) if v == int(v) else v:.1f}个' for k, v in element_analysis.element_count.items()])}",
-            f"五行平衡：{element_analysis.element_balance}",
-            f"十神：{ten_god_analysis.ten_god_summary}",
-        ]
-        if use_god:
-            analysis_summary_parts.append(f"用神：{use_god}，忌神：{avoid_god if avoid_god else '无'}")
-        
-        analysis_summary = " | ".join(analysis_summary_parts)
-        
-        bazi_analysis = schemas.BaziAnalysis(
-            day_master=day_pillar.stem,
-            day_master_element=day_pillar.element,
-            element_analysis=element_analysis,
-            ten_god_analysis=ten_god_analysis,
-            use_god=use_god,
-            avoid_god=avoid_god,
-            analysis_summary=analysis_summary
-        )
 
-        # 准备分析数据字典，用于解读函数（包含五行、十神、用神/忌神等）
-        analysis_dict = {
-            'element_analysis': element_analysis.dict(),
-            'ten_god_analysis': ten_god_analysis.dict(),
-            'use_god': use_god,
-            'avoid_god': avoid_god
-        }
+def _interpret_chart(chart: schemas.BaziChart, payload: schemas.BaziRequest):
+    """Interpretation for a chart: cached/AI when available, rule-based otherwise."""
+    year_pillar = chart.year_pillar
+    month_pillar = chart.month_pillar
+    day_pillar = chart.day_pillar
+    hour_pillar = chart.hour_pillar
+    summary = chart.summary
+    element_analysis = chart.analysis.element_analysis
+    ten_god_analysis = chart.analysis.ten_god_analysis
+    use_god, avoid_god = chart.analysis.use_god, chart.analysis.avoid_god
 
-        # 生成AI解读（可选，如果AI服务不可用则使用基础解读）
-        interpretation = None
-        if AI_SERVICE_AVAILABLE:
-            try:
-                # 尝试生成AI解读
-                interpretation = generate_bazi_interpretation(
-                    year_pillar.dict(),
-                    month_pillar.dict(),
-                    day_pillar.dict(),
-                    hour_pillar.dict() if hour_pillar else None,
-                    language="zh",  # 可以根据请求参数调整
-                    analysis_focus=payload.analysis_focus,
-                )
-            except Exception as ai_error:
-                print(f"Warning: Failed to generate AI interpretation: {ai_error}")
-                # 如果AI失败，使用基础解读
-                try:
-                    try:
-                        from .ai_service import generate_basic_interpretation
-                    except ImportError:
-                        from ai_service import generate_basic_interpretation
-                    interpretation = generate_basic_interpretation(
-                        year_pillar.dict(),
-                        month_pillar.dict(),
-                        day_pillar.dict(),
-                        hour_pillar.dict() if hour_pillar else None,
-                        language="zh",
-                        analysis=analysis_dict
-                    )
-                except Exception as basic_error:
-                    print(f"Warning: Failed to generate basic interpretation: {basic_error}")
-        else:
-            # AI服务不可用，使用简单的基础解读
+    # 准备分析数据字典，用于解读函数（包含五行、十神、用神/忌神等）
+    analysis_dict = {
+        'element_analysis': element_analysis.dict(),
+        'ten_god_analysis': ten_god_analysis.dict(),
+        'use_god': use_god,
+        'avoid_god': avoid_god
+    }
+
+    # 生成AI解读（可选，如果AI服务不可用则使用基础解读）
+    interpretation = None
+    if AI_SERVICE_AVAILABLE:
+        try:
+            # 尝试生成AI解读（按命盘特征缓存，见 warm_interpretations.py）
+            interpretation = get_cached_interpretation(
+                signature_for_chart(chart, payload.analysis_focus, "zh"),
+                chart,
+                language="zh",  # 可以根据请求参数调整
+                analysis_focus=payload.analysis_focus,
+            )
+        except Exception as ai_error:
+            print(f"Warning: Failed to generate AI interpretation: {ai_error}")
+            # 如果AI失败，使用基础解读
             try:
                 try:
                     from .ai_service import generate_basic_interpretation
@@ -593,23 +506,113 @@ def calculate_bazi(payload: schemas.BaziRequest, db: Session = Depends(get_db)):
                     day_pillar.dict(),
                     hour_pillar.dict() if hour_pillar else None,
                     language="zh",
-                    analysis=analysis_dict,
-                    analysis_focus=payload.analysis_focus,
+                    analysis=analysis_dict
                 )
-                interpretation = generate_basic_interpretation(
-                    year_pillar.dict(),
-                    month_pillar.dict(),
-                    day_pillar.dict(),
-                    hour_pillar.dict() if hour_pillar else None,
-                    language="zh",
-                    analysis=analysis_dict,
-                    analysis_focus=payload.analysis_focus,
-                )
-            except Exception:
-                # 最后的fallback
-                interpretation = f"您的八字为：{summary}。这是一份基础的命理分析，建议咨询专业命理师获取更详细的解读。"
+            except Exception as basic_error:
+                print(f"Warning: Failed to generate basic interpretation: {basic_error}")
+    else:
+        # AI服务不可用，使用简单的基础解读
+        try:
+            try:
+                from .ai_service import generate_basic_interpretation
+            except ImportError:
+                from ai_service import generate_basic_interpretation
+            interpretation = generate_basic_interpretation(
+                year_pillar.dict(),
+                month_pillar.dict(),
+                day_pillar.dict(),
+                hour_pillar.dict() if hour_pillar else None,
+                language="zh",
+                analysis=analysis_dict,
+                analysis_focus=payload.analysis_focus,
+            )
+            interpretation = generate_basic_interpretation(
+                year_pillar.dict(),
+                month_pillar.dict(),
+                day_pillar.dict(),
+                hour_pillar.dict() if hour_pillar else None,
+                language="zh",
+                analysis=analysis_dict,
+                analysis_focus=payload.analysis_focus,
+            )
+        except Exception:
+            # 最后的fallback
+            interpretation = f"您的八字为：{summary}。这是一份基础的命理分析，建议咨询专业命理师获取更详细的解读。"
+    return interpretation
+
+
+# view=compact: drop the echoed input, prose summaries, hidden stems and interpretation
+BAZI_COMPACT_EXCLUDE = {
+    "raw_input": True,
+    "summary": True,
+    "interpretation": True,
+    "year_pillar": {"hidden_stems"},
+    "month_pillar": {"hidden_stems"},
+    "day_pillar": {"hidden_stems"},
+    "hour_pillar": {"hidden_stems"},
+    "analysis": {"analysis_summary": True, "ten_god_analysis": {"ten_god_summary"}},
+}
+
+
+def _bazi_fields(view: str, fields: Optional[str]) -> Optional[set]:
+    """Top-level BaziResponse fields the client asked for (None = all)."""
+    if view not in ("full", "compact"):
+        raise HTTPException(status_code=400, detail="view must be 'full' or 'compact'")
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(schemas.BaziResponse.__fields__)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested
+
+
+@app.post("/bazi", response_model=schemas.BaziResponse)
+async def calculate_bazi(
+    payload: schemas.BaziRequest,
+    request: Request,
+    view: str = Query("full", description="'compact' drops raw_input, summaries, hidden stems and interpretation"),
+    fields: Optional[str] = Query(None, description="comma-separated top-level fields to return, e.g. day_pillar,analysis"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: LazyAsyncSession = Depends(get_async_db),
+):
+    """
+    Calculate complete Bazi (Four Pillars): Year, Month, Day, and Hour pillars.
+    With an Idempotency-Key header, retries get the first response back
+    instead of a new calculation, interpretation and saved reading.
+    """
+    if idempotency_key is None:
+        return await _calculate_bazi(payload, view, fields, db)
+    fingerprint = await request_fingerprint(request)
+    return await idempotency_store.run("bazi", idempotency_key, fingerprint, lambda: _calculate_bazi(payload, view, fields, db))
+
 
-        # Save into readings table for history (optional, don't fail if DB is unavailable)
+async def _calculate_bazi(payload: schemas.BaziRequest, view: str, fields: Optional[str], db: LazyAsyncSession):
+    try:
+        # Parse YYYY-MM-DD format
+        birth = datetime.strptime(payload.birth_date, "%Y-%m-%d")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid birth_date format, expected YYYY-MM-DD: {str(e)}")
+    include = _bazi_fields(view, fields)
+    wants_interpretation = view == "full" and (include is None or "interpretation" in include)
+
+    try:
+        chart = build_chart(birth, payload.birth_time)
+        year_pillar = chart.year_pillar
+        month_pillar = chart.month_pillar
+        day_pillar = chart.day_pillar
+        hour_pillar = chart.hour_pillar
+        summary = chart.summary
+        bazi_analysis = chart.analysis
+
+        # Interpretation may call the LLM, so it runs on the threadpool; skipped when not returned
+        interpretation = None
+        if wants_interpretation:
+            interpretation = await run_in_threadpool(_interpret_chart, chart, payload)
+
+        # Save into readings table for history (optional, don't fail if DB is unavailable;
+        # while it is down the reading goes to the local spool)
+        reading_id = None
         try:
             result_data = {
                 "year_pillar": year_pillar.dict(),
@@ -619,23 +622,24 @@ def calculate_bazi(payload: schemas.BaziRequest, db: Session = Depends(get_db)):
             if hour_pillar:
                 result_data["hour_pillar"] = hour_pillar.dict()
             result_data["summary"] = summary
+            result_data["analysis"] = bazi_analysis.dict()
             if interpretation:
                 result_data["interpretation"] = interpretation
             
-            reading = models.Reading(
-                type="bazi",
-                input_data=json.dumps(payload.dict(), ensure_ascii=False),
-                result=json.dumps(result_data, ensure_ascii=False),
-                user_id=payload.user_id,
-            )
-            db.add(reading)
-            db.commit()
-            db.refresh(reading)
+            saved = await save_readings(db, [{
+                "type": "bazi",
+                "input_data": json.dumps(payload.dict(), ensure_ascii=False),
+                "result": json.dumps(result_data, ensure_ascii=False),
+                "user_id": payload.user_id,
+            }])
+            if saved:
+                reading_id = saved[0]
+                await reading_cache.invalidate(payload.user_id)
         except Exception as db_error:
             # Log but don't fail - calculation is more important than saving
             print(f"Warning: Failed to save reading to database: {db_error}")
 
-        return schemas.BaziResponse(
+        response = schemas.BaziResponse(
             year_pillar=year_pillar,
             month_pillar=month_pillar,
             day_pillar=day_pillar,
@@ -643,25 +647,463 @@ def calculate_bazi(payload: schemas.BaziRequest, db: Session = Depends(get_db)):
             summary=summary,
             interpretation=interpretation,
             analysis=bazi_analysis,
-            raw_input=payload
+            raw_input=payload,
+            reading_id=reading_id,
         )
+        if view == "compact":
+            content = response.dict(include=include, exclude=BAZI_COMPACT_EXCLUDE, exclude_none=True)
+        else:
+            content = response.dict(include=include)
+        return FastJSONResponse(content)
     except Exception as calc_error:
         # Catch any calculation errors and return a proper error message
         error_msg = f"Bazi calculation failed: {str(calc_error)}"
         print(f"Error in calculate_bazi: {error_msg}")
         raise HTTPException(status_code=500, detail=error_msg)
 
+CHART_CACHE_SIZE = int(os.getenv("BAZI_CHART_CACHE_SIZE", "8192"))
+# Charts change when the algorithm is fixed, so caches keep them for a bounded time and then
+# revalidate; the ETag is a hash of the body, so unchanged charts come back as 304
+BAZI_CHART_MAX_AGE = int(os.getenv("BAZI_CHART_MAX_AGE", "86400"))
+CHART_CACHE_CONTROL = f"public, max-age={BAZI_CHART_MAX_AGE}, must-revalidate"
+
+
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def _chart_body(date: str, hour: Optional[int]):
+    """Serialized chart and its strong ETag for one (date, hour)."""
+    birth = datetime.strptime(date, "%Y-%m-%d")
+    chart = build_chart(birth, f"{hour:02d}:00" if hour is not None else None)
+    body = json_dumps(chart.dict())
+    return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison: ignore a W/ prefix
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag[2:] == etag if tag.startswith("W/") else tag == etag for tag in candidates)
+
+
+@app.get("/bazi/chart", response_model=schemas.BaziChart)
+def bazi_chart(
+    request: Request,
+    date: str = Query(..., description="birth date, YYYY-MM-DD"),
+    hour: Optional[int] = Query(None, ge=0, le=23, description="birth hour 0-23; omit when unknown"),
+):
+    """
+    Structural Bazi chart (pillars, hidden stems, ten gods, element analysis)
+    for a birth date and hour. Side-effect free and cacheable: nothing is stored,
+    responses carry a strong ETag and a Cache-Control that revalidates after
+    BAZI_CHART_MAX_AGE seconds, and If-None-Match is answered with 304.
+    """
+    try:
+        body, etag = _chart_body(date, hour)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date format, expected YYYY-MM-DD: {str(e)}")
+    headers = {"ETag": etag, "Cache-Control": CHART_CACHE_CONTROL}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+COMPATIBILITY_MAX_CANDIDATES = int(os.getenv("COMPATIBILITY_MAX_CANDIDATES", "100000"))
+
+
+@app.post("/bazi/compatibility", response_model=schemas.CompatibilityResponse)
+def bazi_compatibility(payload: schemas.CompatibilityRequest):
+    """合婚: compatibility score of two births."""
+    a, b = payload.person_a, payload.person_b
+    try:
+        result = compatibility.pair_compatibility(
+            a.birth_date,
+            compatibility.parse_hour(a.birth_time),
+            b.birth_date,
+            compatibility.parse_hour(b.birth_time),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid birth_date format, expected YYYY-MM-DD: {str(e)}")
+    return FastJSONResponse(result)
+
+
+@app.post("/bazi/compatibility/batch", response_model=schemas.CompatibilityBatchResponse)
+def bazi_compatibility_batch(payload: schemas.CompatibilityBatchRequest):
+    """Score one birth against many candidates and return the top_k best matches."""
+    candidates = payload.candidates
+    if len(candidates) > COMPATIBILITY_MAX_CANDIDATES:
+        raise HTTPException(status_code=400, detail=f"At most {COMPATIBILITY_MAX_CANDIDATES} candidates per request")
+    if payload.top_k < 1:
+        raise HTTPException(status_code=400, detail="top_k must be at least 1")
+    try:
+        ranked = compatibility.rank_candidates(
+            payload.person.birth_date,
+            compatibility.parse_hour(payload.person.birth_time),
+            [c.birth_date for c in candidates],
+            [compatibility.parse_hour(c.birth_time) for c in candidates],
+            payload.top_k,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid birth_date format, expected YYYY-MM-DD: {str(e)}")
+    return FastJSONResponse({
+        "total": len(candidates),
+        "matches": [{"index": i, "id": candidates[i].id, "score": score} for i, score in ranked],
+    })
+
+
+REVERSE_MAX_RESULTS = int(os.getenv("REVERSE_MAX_RESULTS", "1000"))
+
+
+@app.post("/bazi/reverse", response_model=schemas.ReverseSearchResponse)
+def bazi_reverse(payload: schemas.ReverseSearchRequest):
+    """反推: candidate birth dates (1900-2100) for known pillars, from the inverted index."""
+    if not 1 <= payload.limit <= REVERSE_MAX_RESULTS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {REVERSE_MAX_RESULTS}")
+    try:
+        pillars = [
+            parse_pillar(p) if p else None
+            for p in (payload.year_pillar, payload.month_pillar, payload.day_pillar)
+        ]
+        hour_pillar = parse_pillar(payload.hour_pillar) if payload.hour_pillar else None
+        start_date = date.fromisoformat(payload.start_date) if payload.start_date else None
+        end_date = date.fromisoformat(payload.end_date) if payload.end_date else None
+        days = reverse_index.search(pillars, hour_pillar, start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    hours = BRANCH_HOURS[hour_pillar % 12] if hour_pillar is not None else None
+    return FastJSONResponse({
+        "total": len(days),
+        "matches": [{"birth_date": day_to_iso(d), "hours": hours} for d in days[:payload.limit].tolist()],
+    })
+
+
+ZIWEI_MAX_BATCH = int(os.getenv("ZIWEI_MAX_BATCH", "1000"))
+
+
+def _ziwei_chart(birth: schemas.BirthData) -> dict:
+    try:
+        birth_date = datetime.strptime(birth.birth_date, "%Y-%m-%d")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid birth_date format, expected YYYY-MM-DD: {str(e)}")
+    hour = compatibility.parse_hour(birth.birth_time)
+    if hour is None:
+        raise HTTPException(status_code=400, detail="birth_time (HH:MM) is required for a Ziwei chart")
+    try:
+        return build_ziwei_chart(birth_date, hour)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+async def _save_ziwei_readings(db: LazyAsyncSession, births: List[schemas.BirthData], charts: List[dict], user_id: Optional[int]):
+    """Store charts in the readings table (optional, like /bazi)."""
+    rows = [
+        {
+            "type": "ziwei",
+            "input_data": json.dumps(birth.dict(), ensure_ascii=False),
+            "result": json.dumps(chart, ensure_ascii=False),
+            "user_id": user_id,
+        }
+        for birth, chart in zip(births, charts)
+    ]
+    if await save_readings(db, rows):
+        await reading_cache.invalidate(user_id)
+
+
+@app.post("/ziwei", response_model=schemas.ZiweiChart)
+async def calculate_ziwei(payload: schemas.ZiweiRequest, db: LazyAsyncSession = Depends(get_async_db)):
+    """紫微斗数 chart: twelve palaces with main and auxiliary stars and 四化."""
+    chart = _ziwei_chart(payload)
+    await _save_ziwei_readings(db, [payload], [chart], payload.user_id)
+    return FastJSONResponse(chart)
+
+
+@app.post("/ziwei/batch", response_model=schemas.ZiweiBatchResponse)
+async def calculate_ziwei_batch(payload: schemas.ZiweiBatchRequest, db: LazyAsyncSession = Depends(get_async_db)):
+    """Charts for many births in one request, in input order."""
+    if len(payload.births) > ZIWEI_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {ZIWEI_MAX_BATCH} births per request")
+    charts = [_ziwei_chart(birth) for birth in payload.births]
+    await _save_ziwei_readings(db, payload.births, charts, payload.user_id)
+    return FastJSONResponse({"charts": charts})
+
+
+READING_MAX_BATCH = int(os.getenv("READING_MAX_BATCH", "10000"))
+
+
+async def _write_through(db: LazyAsyncSession, reading_type: str, inputs: List[dict], results: List[dict], user_id: Optional[int]):
+    """Store engine readings with one multi-row INSERT (optional, like /bazi)."""
+    rows = [
+        {
+            "type": reading_type,
+            "input_data": json_dumps(input_data).decode(),
+            "result": json_dumps(result).decode(),
+            "user_id": user_id,
+        }
+        for input_data, result in zip(inputs, results)
+    ]
+    if await save_readings(db, rows):
+        await reading_cache.invalidate(user_id)
+
+
+def _run_engine(reading_type: str, count: int, seed: Optional[int], **options):
+    if reading_type not in reading_engines.ENGINES:
+        raise HTTPException(status_code=404, detail=f"Unknown reading type: {reading_type}")
+    try:
+        return reading_engines.run(reading_type, count, seed, **options)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/draw/{reading_type}", response_model=schemas.DrawResponse)
+async def draw_reading(reading_type: str, payload: schemas.DrawRequest, db: LazyAsyncSession = Depends(get_async_db)):
+    """
+    One tarot / numerology / iching reading computed on the server. The
+    returned seed reproduces the same reading; the result is stored in readings.
+    """
+    birth_dates = [payload.birth_date] if payload.birth_date else None
+    seed, results = _run_engine(reading_type, 1, payload.seed, cards=payload.cards, birth_dates=birth_dates)
+    input_data = {"seed": seed, "cards": payload.cards, "birth_date": payload.birth_date}
+    await _write_through(db, reading_type, [input_data], results, payload.user_id)
+    return FastJSONResponse({"type": reading_type, "seed": seed, "result": results[0]})
+
+
+@app.post("/draw/{reading_type}/batch", response_model=schemas.DrawBatchResponse)
+async def draw_reading_batch(reading_type: str, payload: schemas.DrawBatchRequest, db: LazyAsyncSession = Depends(get_async_db)):
+    """Many readings from one seed in a single call (READING_MAX_BATCH), all stored in readings."""
+    count = len(payload.birth_dates) if payload.birth_dates else payload.count
+    if not 1 <= count <= READING_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"count must be between 1 and {READING_MAX_BATCH}")
+    seed, results = _run_engine(reading_type, count, payload.seed, cards=payload.cards, birth_dates=payload.birth_dates)
+    if payload.birth_dates:
+        inputs = [{"seed": seed, "index": i, "birth_date": d} for i, d in enumerate(payload.birth_dates)]
+    else:
+        inputs = [{"seed": seed, "index": i, "cards": payload.cards} for i in range(count)]
+    await _write_through(db, reading_type, inputs, results, payload.user_id)
+    return FastJSONResponse({"type": reading_type, "seed": seed, "count": count, "results": results})
+
+
+NAME_MAX_CANDIDATES = int(os.getenv("NAME_MAX_CANDIDATES", "100000"))
+
+
+def _name_use_god(use_god: Optional[str], birth_date: Optional[str], birth_time: Optional[str]) -> Optional[str]:
+    """Explicit use god, else the one of the birth chart, else None."""
+    if use_god:
+        if normalize_element(use_god) is None:
+            raise HTTPException(status_code=400, detail=f"Unknown element: {use_god}")
+        return ELEMENT_ORDER[normalize_element(use_god)]
+    if not birth_date:
+        return None
+    try:
+        birth = datetime.strptime(birth_date, "%Y-%m-%d")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid birth_date format, expected YYYY-MM-DD: {str(e)}")
+    index = normalize_element(build_chart(birth, birth_time).analysis.use_god)
+    return ELEMENT_ORDER[index] if index is not None else None
+
+
+@app.post("/name/analyze", response_model=schemas.NameAnalyzeResponse)
+def analyze_name(payload: schemas.NameAnalyzeRequest):
+    """姓名测试: Kangxi strokes, 五格 numbers and luck, 三才 and the fit with the chart's use god."""
+    use_god = _name_use_god(payload.use_god, payload.birth_date, payload.birth_time)
+    try:
+        return FastJSONResponse(name_analysis.analyze_name(payload.surname, payload.given_name, use_god))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@app.post("/name/analyze/batch", response_model=schemas.NameRankResponse)
+def rank_names(payload: schemas.NameRankRequest):
+    """Score many given names for one surname (and chart) and return the top_k best."""
+    if len(payload.given_names) > NAME_MAX_CANDIDATES:
+        raise HTTPException(status_code=400, detail=f"At most {NAME_MAX_CANDIDATES} names per request")
+    if payload.top_k < 1:
+        raise HTTPException(status_code=400, detail="top_k must be at least 1")
+    use_god = _name_use_god(payload.use_god, payload.birth_date, payload.birth_time)
+    if not payload.given_names:
+        return FastJSONResponse({"total": 0, "use_god": use_god, "matches": []})
+    try:
+        scored = name_analysis.score_names(payload.surname, payload.given_names, use_god)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    best = compatibility.top_k(scored["score"], payload.top_k)
+    grids = scored["grids"][best].tolist()
+    scores = scored["score"][best].tolist()
+    return FastJSONResponse({
+        "total": len(payload.given_names),
+        "use_god": use_god,
+        "matches": [
+            {"index": int(i), "given_name": payload.given_names[i], "score": round(score, 1), "grids": g}
+            for i, score, g in zip(best.tolist(), scores, grids)
+        ],
+    })
+
+
+TIMELINE_PAGE_YEARS = int(os.getenv("TIMELINE_PAGE_YEARS", "10"))
+TIMELINE_MAX_PAGE_YEARS = int(os.getenv("TIMELINE_MAX_PAGE_YEARS", "30"))
+TIMELINE_MAX_AGE = 120
+
+
+@app.post("/bazi/timeline", response_model=schemas.TimelineResponse)
+def bazi_timeline(payload: schemas.TimelineRequest):
+    """
+    大运 / 流年 timeline, one page of calendar years at a time.
+    Follow next_start_year to walk further; only the requested years are computed.
+    """
+    try:
+        birth = datetime.strptime(payload.birth_date, "%Y-%m-%d")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid birth_date format, expected YYYY-MM-DD: {str(e)}")
+    gender = normalize_gender(payload.gender)
+    if gender is None:
+        raise HTTPException(status_code=400, detail="gender must be 'male' or 'female'")
+
+    last_year = birth.year + TIMELINE_MAX_AGE
+    start_year = max(payload.start_year or birth.year, birth.year)
+    end_year = payload.end_year if payload.end_year is not None else start_year + TIMELINE_PAGE_YEARS - 1
+    end_year = min(end_year, start_year + TIMELINE_MAX_PAGE_YEARS - 1, last_year)
+    if end_year < start_year:
+        raise HTTPException(status_code=400, detail="end_year must not be before start_year or the birth year")
+
+    timeline = Timeline(birth, build_chart(birth, payload.birth_time), gender)
+    return FastJSONResponse({
+        "direction": "forward" if timeline.direction > 0 else "backward",
+        "start_age": timeline.start_age,
+        "luck_pillars": list(timeline.iter_luck_pillars(start_year, end_year)),
+        "years": list(timeline.iter_years(start_year, end_year)),
+        "next_start_year": end_year + 1 if end_year < last_year else None,
+    })
+
+
+@app.get("/fortune/daily")
+def daily_fortune(
+    day_master: Optional[str] = Query(None, description="day master stem (甲-癸)"),
+    birth_date: Optional[str] = Query(None, description="YYYY-MM-DD; used to find the day master when day_master is omitted"),
+    date_: Optional[str] = Query(None, alias="date", description="YYYY-MM-DD, default today"),
+    language: str = "zh",
+):
+    """今日运势 for a day master, served from the precomputed table."""
+    try:
+        day = date.fromisoformat(date_) if date_ else date.today()
+        if day_master is None and birth_date:
+            birth = datetime.strptime(birth_date, "%Y-%m-%d")
+            day_master = compute_day_pillar(birth.year, birth.month, birth.day).stem
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date format, expected YYYY-MM-DD: {str(e)}")
+    if day_master not in HEAVENLY_STEMS:
+        raise HTTPException(status_code=400, detail="day_master must be one of 甲乙丙丁戊己庚辛壬癸 (or pass birth_date)")
+    if language not in FORTUNE_LANGUAGES:
+        language = "en"
+    return Response(
+        content=daily_fortunes.get(day, day_master, language),
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=3600"},
+    )
+
+
+ALMANAC_CACHE_SIZE = int(os.getenv("ALMANAC_CACHE_SIZE", "4096"))
+
+
+@lru_cache(maxsize=ALMANAC_CACHE_SIZE)
+def _almanac_body(day: date, language: str):
+    body = json_dumps(almanac_store.lookup(day, language))
+    return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+@app.get("/almanac")
+def almanac(
+    request: Request,
+    date_: Optional[str] = Query(None, alias="date", description="YYYY-MM-DD, default today"),
+    language: str = "zh",
+):
+    """
+    黄历 for a day: day pillar, solar term, 建除 officer and 宜/忌 activities,
+    read from the memory-mapped year tables (see almanac.py).
+    """
+    try:
+        day = date.fromisoformat(date_) if date_ else date.today()
+        body, etag = _almanac_body(day, "zh" if language == "zh" else "en")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if date_:
+        max_age = 86400
+    else:
+        # "Today" changes at midnight (server time)
+        midnight = datetime.combine(day + timedelta(days=1), datetime.min.time())
+        max_age = max(60, int((midnight - datetime.now()).total_seconds()))
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/analytics/readings", response_model=schemas.AnalyticsResponse)
+def analytics_readings(
+    group_by: str = Query("dominant_element", description=f"comma-separated dimensions: {', '.join(analytics.DIMENSIONS)}"),
+    start: Optional[str] = Query(None, description="YYYY-MM-DD, default 6 days before end"),
+    end: Optional[str] = Query(None, description="YYYY-MM-DD, default today (UTC)"),
+    reading_type: Optional[str] = Query(None, alias="type"),
+    analysis_focus: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """
+    Reading counts from the rollup tables (see analytics.py), e.g.
+    group_by=dominant_element&type=bazi for this week's element distribution,
+    group_by=analysis_focus,day_master for common day masters by focus.
+    Never touches the readings table.
+    """
+    dimensions = list(dict.fromkeys(name.strip() for name in group_by.split(",") if name.strip()))
+    unknown = set(dimensions) - set(analytics.DIMENSIONS)
+    if not dimensions or unknown:
+        raise HTTPException(status_code=400, detail=f"group_by must use: {', '.join(analytics.DIMENSIONS)}")
+    try:
+        end_day = date.fromisoformat(end) if end else datetime.utcnow().date()
+        start_day = date.fromisoformat(start) if start else end_day - timedelta(days=6)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date, expected YYYY-MM-DD: {e}")
+    try:
+        result = analytics.query_rollups(dimensions, start_day, end_day, reading_type, analysis_focus, limit)
+    except Exception as e:
+        print(f"Warning: Analytics query failed: {e}")
+        raise HTTPException(status_code=503, detail="Analytics are unavailable")
+    return FastJSONResponse({"start": start_day.isoformat(), "end": end_day.isoformat(), "group_by": dimensions, **result})
+
+
 @app.post("/chat", response_model=schemas.ChatResponse)
-def chat(payload: schemas.ChatRequest):
+def chat(payload: schemas.ChatRequest, db: Session = Depends(get_db)):
     """
     Chat with the AI fortune master. Send messages and receive a reply.
+    Pass reading_id to discuss a stored Bazi reading without pasting the chart.
     """
     messages = [{"role": m.role, "content": m.content} for m in payload.messages]
     lang = (payload.language or "zh").strip() or "zh"
-    reply = chat_with_master(messages, language=lang)
+    chart_digest = get_reading_digest(db, payload.reading_id, lang) if payload.reading_id is not None else None
+    reply = chat_with_master(messages, language=lang, chart_digest=chart_digest)
     return schemas.ChatResponse(reply=reply)
 
 
+def _load_chart_digest(reading_id: int, language: str) -> str:
+    """Chart digest lookup for WebSocket sessions (a DB session is opened only on cache misses)."""
+    db = SessionLocal()
+    try:
+        return get_reading_digest(db, reading_id, language)
+    finally:
+        db.close()
+
+
+@app.websocket("/ws/chat")
+async def chat_ws(websocket: WebSocket):
+    """
+    Chat with the AI fortune master over one long-lived connection.
+    Streams reply tokens; sending a new message cancels the previous generation.
+    """
+    await ChatSocketSession(websocket, stream_chat_with_master, _load_chart_digest).run()
+
+
 @app.post("/ocr/face")
 async def ocr_face(image: UploadFile = File(...)):
     """
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, Integer, String, Text, ForeignKey
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, ForeignKey
 from sqlalchemy.orm import relationship
 
 try:
@@ -22,15 +22,36 @@ class User(Base):
 
 class Reading(Base):
     __tablename__ = "readings"
+    # A user's history in id order (GET /readings?user_id=..., exports)
+    __table_args__ = (Index("ix_readings_user_id_id", "user_id", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     type = Column(String(64), index=True)  # e.g. 'tarot', 'bazi', 'iching', 'palmistry'
     input_data = Column(Text)  # JSON string of input details
-    result = Column(Text)  # JSON or text of the reading result
-    created_at = Column(DateTime, default=datetime.utcnow)
+    result = Column(Text)  # JSON or text of the reading result; NULL when stored in chart_results
+    chart_hash = Column(String(64), index=True, nullable=True)  # chart_results.hash of the shared result
+    # Partition key on PostgreSQL (monthly partitions, see reading_partitions.py)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     user = relationship("User", back_populates="readings")
+    chart = relationship("ChartResult", primaryjoin="foreign(Reading.chart_hash) == ChartResult.hash", viewonly=True)
+
+    @property
+    def full_result(self):
+        """The reading's result, from chart_results when it is shared."""
+        if self.result is not None or self.chart_hash is None:
+            return self.result
+        return self.chart.result if self.chart is not None else None
+
+
+class ChartResult(Base):
+    """Reading results by content hash, shared by every reading with the same chart (see chart_results.py)."""
+    __tablename__ = "chart_results"
+
+    hash = Column(String(64), primary_key=True)  # sha256 of result
+    result = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 
 
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Name analysis (姓名测试): Kangxi strokes, 五格 and 三才.
+
+Stroke counts live in a code-point-indexed uint8 array file
+(NAME_STROKES_PATH), one byte per character of each covered Unicode block,
+0 = unknown. The file is memory-mapped read-only, so every worker shares
+one page-cache copy and a lookup is an index into the array; whole batches
+of names are looked up with NumPy fancy indexing.
+
+The file is built from the Unicode Unihan database:
+
+    python name_analysis.py --unihan path/to/Unihan.zip
+
+Kangxi strokes are the full-form radical's strokes plus the residual
+strokes (kRSKangXi, else kRSUnicode), so 氵 counts as 水 (4) and 扌 as 手 (4);
+simplified characters use their kTraditionalVariant; radicals themselves
+use kTotalStrokes; 一 .. 十 count as 1 .. 10.
+
+五格: 天格 = surname strokes (+1 for a single surname), 人格 = last surname
+char + first given char, 地格 = given-name strokes (+1 for a single given
+char), 外格 = 天格 + 地格 - 人格, 总格 = all strokes. Each number maps to an
+element by its last digit and to the traditional 81-number luck table.
+"""
+import argparse
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import zipfile
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    from .bazi import ELEMENT_ORDER, element_relation, normalize_element
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from bazi import ELEMENT_ORDER, element_relation, normalize_element
+
+DEFAULT_STROKES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "kangxi_strokes.bin")
+
+# CJK Unified Ideographs, Extension A, Compatibility Ideographs, Extensions B-F
+SEGMENTS = [(0x3400, 0x9FFF), (0xF900, 0xFAFF), (0x20000, 0x2EBEF)]
+MAGIC = b"KXS1"
+HEADER = struct.Struct("<4sI")  # magic, number of segments
+SEGMENT = struct.Struct("<III")  # first code point, length, byte offset of its strokes
+
+# Strokes of the 214 Kangxi radicals: first radical number of each stroke count
+_RADICAL_STROKE_STARTS = [(1, 1), (7, 2), (30, 3), (61, 4), (95, 5), (118, 6), (147, 7), (167, 8),
+                          (176, 9), (187, 10), (195, 11), (201, 12), (205, 13), (209, 14), (211, 15),
+                          (212, 16), (214, 17)]
+RADICAL_STROKES = [0] * 215
+for _start, _strokes in _RADICAL_STROKE_STARTS:
+    for _r in range(_start, 215):
+        RADICAL_STROKES[_r] = _strokes
+
+NUMERAL_STROKES = {"一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9, "十": 10}
+
+# 81 数理: 1 = 吉, 0.5 = 半吉, 0 = 凶 (numbers above 81 wrap around by 80)
+_LUCK_81 = (
+    "吉凶吉凶吉吉吉吉凶凶"  # 1-10
+    "吉凶吉凶吉吉半吉凶凶"  # 11-20
+    "吉凶吉吉吉凶半凶吉半"  # 21-30
+    "吉吉吉凶吉凶吉半吉凶"  # 31-40
+    "吉凶凶凶吉凶吉吉半凶"  # 41-50
+    "半吉凶凶半凶吉半凶凶"  # 51-60
+    "吉凶吉凶吉凶吉吉凶凶"  # 61-70
+    "半凶半凶半凶半凶凶凶"  # 71-80
+    "吉"  # 81
+)
+LUCK_NAMES = {"吉": "吉", "半": "半吉", "凶": "凶"}
+LUCK_SCORES = {"吉": 1.0, "半": 0.5, "凶": 0.0}
+NUMBER_LUCK = np.array([0.0] + [LUCK_SCORES[c] for c in _LUCK_81], dtype=np.float32)
+NUMBER_LUCK.flags.writeable = False
+# Element of a number by its last digit: 1,2 木; 3,4 火; 5,6 土; 7,8 金; 9,0 水
+DIGIT_ELEMENT = np.array([4, 0, 0, 1, 1, 2, 2, 3, 3, 4], dtype=np.int8)
+
+GRID_NAMES = ["天格", "人格", "地格", "外格", "总格"]
+# 天格 only depends on the surname, so it does not weigh in the score
+GRID_WEIGHTS = np.array([0.0, 0.35, 0.25, 0.15, 0.25], dtype=np.float32)
+WEIGHT_GRIDS, WEIGHT_SANCAI, WEIGHT_USE_GOD = 0.5, 0.2, 0.3
+
+
+def _wrap81(number: int) -> int:
+    return (number - 1) % 80 + 1 if number > 81 else number
+
+
+def luck_of(number: int) -> str:
+    return LUCK_NAMES[_LUCK_81[_wrap81(number) - 1]] if number > 0 else "凶"
+
+
+# 三才 pair score by element relation of the next grid to the previous one
+SANCAI_SCORES = {"同我": 1.0, "我生": 1.0, "生我": 1.0, "我克": 0.0, "克我": 0.0}
+_SANCAI_TABLE = np.array(
+    [[SANCAI_SCORES[element_relation(ELEMENT_ORDER[a], ELEMENT_ORDER[b])] for b in range(5)] for a in range(5)],
+    dtype=np.float32,
+)
+# Element of a grid vs the use god: equal 1, generates it 0.5, otherwise 0
+_USE_GOD_TABLE = np.array(
+    [[1.0 if a == g else 0.5 if (a + 1) % 5 == g else 0.0 for g in range(5)] for a in range(5)],
+    dtype=np.float32,
+)
+
+
+class StrokeDictionary:
+    """Memory-mapped Kangxi stroke array."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("NAME_STROKES_PATH", DEFAULT_STROKES_PATH)
+        self._map: Optional[mmap.mmap] = None
+        self._strokes: Optional[np.ndarray] = None
+        self._segments: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        if self._strokes is not None:
+            return
+        with self._lock:
+            if self._strokes is not None:
+                return
+            try:
+                with open(self.path, "rb") as f:
+                    table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except FileNotFoundError:
+                raise RuntimeError(f"Stroke dictionary {self.path} not found; build it with name_analysis.py --unihan")
+            magic, count = HEADER.unpack_from(table, 0)
+            if magic != MAGIC:
+                table.close()
+                raise RuntimeError(f"Corrupt stroke dictionary {self.path}")
+            self._segments = [SEGMENT.unpack_from(table, HEADER.size + i * SEGMENT.size) for i in range(count)]
+            self._strokes = np.frombuffer(table, dtype=np.uint8)
+            self._map = table
+
+    def lookup(self, code_points: np.ndarray) -> np.ndarray:
+        """Strokes for an array of code points (0 = unknown or not a covered character)."""
+        self.load()
+        code_points = np.asarray(code_points, dtype=np.int64)
+        result = np.zeros(code_points.shape, dtype=np.int16)
+        for first, length, offset in self._segments:
+            index = code_points - first
+            inside = (index >= 0) & (index < length)
+            result[inside] = self._strokes[offset + index[inside]]
+        return result
+
+    def strokes(self, text: str) -> List[int]:
+        return self.lookup(np.array([ord(c) for c in text], dtype=np.int64)).tolist()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._map is not None:
+                self._strokes = None
+                self._map.close()
+                self._map = None
+
+
+stroke_dictionary = StrokeDictionary()
+
+
+def _encode(names: Sequence[str], width: int) -> np.ndarray:
+    """(N, width) code points, right-padded with -1."""
+    codes = np.full((len(names), width), -1, dtype=np.int64)
+    for i, name in enumerate(names):
+        codes[i, :len(name)] = [ord(c) for c in name]
+    return codes
+
+
+def _check_length(kind: str, name: str) -> None:
+    if not 1 <= len(name) <= 2:
+        raise ValueError(f"{kind} must be 1 or 2 characters: {name!r}")
+
+
+def _name_strokes(names: Sequence[str], width: int, strokes: StrokeDictionary) -> np.ndarray:
+    """(N, width) strokes (0 for padding); ValueError naming the first unknown character."""
+    codes = _encode(names, width)
+    values = strokes.lookup(codes)
+    for char, value in NUMERAL_STROKES.items():
+        values[codes == ord(char)] = value
+    missing = (values == 0) & (codes >= 0)
+    if missing.any():
+        i, j = np.argwhere(missing)[0]
+        raise ValueError(f"No Kangxi stroke count for {names[i][j]!r}")
+    return values
+
+
+def score_names(
+    surname: str,
+    given_names: Sequence[str],
+    use_god: Optional[str] = None,
+    strokes: StrokeDictionary = stroke_dictionary,
+) -> Dict[str, np.ndarray]:
+    """Five grids, elements and scores for many given names with one surname, as arrays."""
+    _check_length("surname", surname)
+    for name in given_names:
+        _check_length("given name", name)
+    s = _name_strokes([surname], 2, strokes)[0]
+    g = _name_strokes(given_names, 2, strokes)
+    single_surname = len(surname) == 1
+    single_given = g[:, 1] == 0
+
+    heaven = np.full(len(g), s.sum() + (1 if single_surname else 0), dtype=np.int16)
+    person = s[len(surname) - 1] + g[:, 0]
+    earth = g.sum(axis=1) + single_given
+    outer = heaven + earth - person
+    total = s.sum() + g.sum(axis=1)
+    grids = np.stack([heaven, person, earth, outer, total], axis=1)
+
+    wrapped = np.where(grids > 81, (grids - 1) % 80 + 1, grids)
+    luck = NUMBER_LUCK[wrapped]
+    elements = DIGIT_ELEMENT[grids % 10]
+    grid_score = (luck * GRID_WEIGHTS).sum(axis=1)
+    sancai = (_SANCAI_TABLE[elements[:, 0], elements[:, 1]] + _SANCAI_TABLE[elements[:, 1], elements[:, 2]]) / 2
+
+    god = normalize_element(use_god) if use_god else None
+    if god is None:
+        score = 100 * (grid_score * (WEIGHT_GRIDS + WEIGHT_USE_GOD) + sancai * WEIGHT_SANCAI)
+        use_god_score = None
+    else:
+        # 人格 and 地格 carry the name's own elements
+        use_god_score = (_USE_GOD_TABLE[elements[:, 1], god] + _USE_GOD_TABLE[elements[:, 2], god]) / 2
+        score = 100 * (grid_score * WEIGHT_GRIDS + sancai * WEIGHT_SANCAI + use_god_score * WEIGHT_USE_GOD)
+    return {
+        "surname_strokes": s,
+        "given_strokes": g,
+        "grids": grids,
+        "elements": elements,
+        "grid_score": grid_score,
+        "sancai": sancai,
+        "use_god": use_god_score,
+        "score": score,
+    }
+
+
+def analyze_name(surname: str, given_name: str, use_god: Optional[str] = None) -> dict:
+    m = score_names(surname, [given_name], use_god)
+    grids, elements = m["grids"][0].tolist(), m["elements"][0].tolist()
+    chars = [(c, v) for c, v in zip(surname, m["surname_strokes"].tolist())]
+    chars += [(c, v) for c, v in zip(given_name, m["given_strokes"][0].tolist())]
+    return {
+        "surname": surname,
+        "given_name": given_name,
+        "characters": [{"char": c, "strokes": v} for c, v in chars],
+        "grids": [
+            {"name": name, "number": n, "element": ELEMENT_ORDER[e], "luck": luck_of(n)}
+            for name, n, e in zip(GRID_NAMES, grids, elements)
+        ],
+        "sancai": "".join(ELEMENT_ORDER[e] for e in elements[:3]),
+        "use_god": ELEMENT_ORDER[normalize_element(use_god)] if use_god and normalize_element(use_god) is not None else None,
+        "grid_score": round(100 * float(m["grid_score"][0]), 1),
+        "sancai_score": round(100 * float(m["sancai"][0]), 1),
+        "use_god_score": round(100 * float(m["use_god"][0]), 1) if m["use_god"] is not None else None,
+        "score": round(float(m["score"][0]), 1),
+    }
+
+
+# --- building the stroke file from Unihan ---
+
+_UNIHAN_LINE = re.compile(r"^U\+([0-9A-F]+)\t(kRSKangXi|kRSUnicode|kTotalStrokes|kTraditionalVariant)\t(.+)$")
+
+
+def _unihan_lines(source: str):
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for name in archive.namelist():
+                if name.endswith(".txt"):
+                    with archive.open(name) as f:
+                        for raw in f:
+                            yield raw.decode("utf-8")
+    else:
+        for name in sorted(os.listdir(source)):
+            if name.endswith(".txt"):
+                with open(os.path.join(source, name), encoding="utf-8") as f:
+                    yield from f
+
+
+def _radical_strokes(value: str) -> Optional[int]:
+    """Kangxi strokes from a radical-stroke value such as "85.5" or "120'.3" (first value wins)."""
+    radical, _, residual = value.split()[0].partition(".")
+    radical = int(radical.rstrip("'"))
+    residual = int(residual)
+    if residual <= 0 or not 1 <= radical <= 214:
+        return None  # the radical itself: use kTotalStrokes
+    return RADICAL_STROKES[radical] + residual
+
+
+def build_strokes(source: str) -> bytes:
+    fields: Dict[str, Dict[int, str]] = {"kRSKangXi": {}, "kRSUnicode": {}, "kTotalStrokes": {}, "kTraditionalVariant": {}}
+    for line in _unihan_lines(source):
+        match = _UNIHAN_LINE.match(line.rstrip("\n"))
+        if match:
+            fields[match.group(2)][int(match.group(1), 16)] = match.group(3)
+
+    def own_strokes(cp: int) -> int:
+        for field in ("kRSKangXi", "kRSUnicode"):
+            if cp in fields[field]:
+                value = _radical_strokes(fields[field][cp])
+                if value:
+                    return value
+                break
+        total = fields["kTotalStrokes"].get(cp)
+        return int(total.split()[-1]) if total else 0  # last value: the traditional count
+
+    segments, arrays, offset = [], [], HEADER.size + SEGMENT.size * len(SEGMENTS)
+    for first, last in SEGMENTS:
+        values = np.zeros(last - first + 1, dtype=np.uint8)
+        for i in range(len(values)):
+            cp = first + i
+            variant = fields["kTraditionalVariant"].get(cp)
+            if variant:
+                traditional = int(variant.split()[0][2:], 16)
+                if traditional != cp:
+                    values[i] = min(own_strokes(traditional), 255)
+                    if values[i]:
+                        continue
+            values[i] = min(own_strokes(cp), 255)
+        segments.append(SEGMENT.pack(first, len(values), offset))
+        arrays.append(values.tobytes())
+        offset += len(values)
+    return HEADER.pack(MAGIC, len(SEGMENTS)) + b"".join(segments) + b"".join(arrays)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build the Kangxi stroke dictionary from Unihan")
+    parser.add_argument("--unihan", required=True, help="Unihan.zip or a directory of Unihan_*.txt files")
+    parser.add_argument("--path", default=None, help="output file (default NAME_STROKES_PATH)")
+    args = parser.parse_args()
+    path = args.path or StrokeDictionary().path
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    data = build_strokes(args.unihan)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    known = int(np.count_nonzero(np.frombuffer(data, dtype=np.uint8, offset=HEADER.size + SEGMENT.size * len(SEGMENTS))))
+    print(f"Wrote {known} stroke counts to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
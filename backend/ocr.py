@@ -1,7 +1,6 @@
 import os
 from typing import Literal
 
-import boto3
 from fastapi import HTTPException, UploadFile
 
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
@@ -16,6 +15,9 @@ def _get_textract_client():
             status_code=500,
             detail="AWS credentials are not configured. Set AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY.",
         )
+    # boto3 is slow to import, so load it on first OCR request rather than at app startup
+    import boto3
+
     return boto3.client(
         "textract",
         region_name=AWS_REGION,
@@ -0,0 +1,254 @@
+"""
+Read-through cache for reading history (GET /readings).
+
+History is polled often but only changes when a reading is written, so list
+queries are cached per (user_id, type, cursor, limit). Entries are tagged
+with a version counter instead of being deleted: every write bumps the
+global counter and the writer's per-user counter, and an entry whose version
+is behind is treated as a miss. Unfiltered lists follow the global counter,
+per-user lists only their user's counter. Both take their values from one
+sequence; per-user counters live in an LRU, and users whose counter was
+evicted read a floor at least as high as it, so an entry from before their
+last write can never look current again.
+
+Tiers:
+- in-process LRU (READINGS_CACHE_SIZE entries)
+- optional Redis (READINGS_CACHE_REDIS_URL, falls back to REDIS_URL), which
+  holds the version counters and entries shared by all workers
+
+Without Redis each worker keeps its own counters, so a write made through
+another worker shows up once the entry's TTL runs out. An entry past its TTL
+but within READINGS_CACHE_STALE_SECONDS is served as-is while a background
+task reloads it (stale-while-revalidate).
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Awaitable, Callable, List, Optional
+
+try:
+    from .lru import LRUCache
+    from .responses import dumps
+except ImportError:
+    from lru import LRUCache
+    from responses import dumps
+
+READINGS_CACHE_SIZE = int(os.getenv("READINGS_CACHE_SIZE", "1024"))
+READINGS_CACHE_TTL = float(os.getenv("READINGS_CACHE_TTL", "30"))
+READINGS_CACHE_STALE_SECONDS = float(os.getenv("READINGS_CACHE_STALE_SECONDS", "30"))
+REDIS_PREFIX = "readings:"
+
+Loader = Callable[[], Awaitable[List[dict]]]
+
+
+class _Entry:
+    __slots__ = ("version", "stored_at", "data")
+
+    def __init__(self, version: int, stored_at: float, data: List[dict]):
+        self.version = version
+        self.stored_at = stored_at
+        self.data = data
+
+
+class ReadingHistoryCache:
+    def __init__(
+        self,
+        max_size: int = READINGS_CACHE_SIZE,
+        ttl: float = READINGS_CACHE_TTL,
+        stale_seconds: float = READINGS_CACHE_STALE_SECONDS,
+        redis_url: Optional[str] = None,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_seconds = stale_seconds
+        self.redis_url = redis_url if redis_url is not None else (
+            os.getenv("READINGS_CACHE_REDIS_URL") or os.getenv("REDIS_URL")
+        )
+        self._entries = LRUCache(max_size)
+        self._global_version = 0
+        self._versions = LRUCache(max_size)  # per-user counters
+        self._version_floor = 0  # >= every evicted per-user counter
+        self._refreshing = set()
+        self._redis = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    # -- keys and versions -------------------------------------------------
+
+    @staticmethod
+    def make_key(user_id: Optional[int], reading_type: Optional[str], cursor: Optional[str], limit: int) -> str:
+        return f"{'' if user_id is None else user_id}|{reading_type or ''}|{'' if cursor is None else cursor}|{limit}"
+
+    @staticmethod
+    def _scope(user_id: Optional[int]) -> str:
+        return "all" if user_id is None else f"user:{user_id}"
+
+    def _get_redis(self):
+        if not self.redis_url:
+            return None
+        if self._redis is None:
+            try:
+                import redis.asyncio as redis_asyncio
+            except ImportError:
+                print("Warning: redis package not installed, reading cache stays in-process")
+                self.redis_url = None
+                return None
+            self._redis = redis_asyncio.from_url(self.redis_url)
+        return self._redis
+
+    async def _current_version(self, user_id: Optional[int]) -> int:
+        scope = self._scope(user_id)
+        client = self._get_redis()
+        if client is not None:
+            try:
+                value = await client.get(f"{REDIS_PREFIX}v:{scope}")
+                return int(value or 0)
+            except Exception as e:
+                print(f"Warning: Reading cache version lookup failed: {e}")
+        if user_id is None:
+            return self._global_version
+        return self._versions.get(scope, self._version_floor)
+
+    async def invalidate(self, user_id: Optional[int]) -> None:
+        """Called after a reading is written: bump the global and the writer's counters."""
+        scopes = [self._scope(None)]
+        self._global_version += 1
+        if user_id is not None:
+            scope = self._scope(user_id)
+            scopes.append(scope)
+            if scope not in self._versions and len(self._versions) >= self._versions.maxsize:
+                # The counter about to be evicted was assigned before this write
+                self._version_floor = self._global_version - 1
+            self._versions.put(scope, self._global_version)
+        client = self._get_redis()
+        if client is not None:
+            try:
+                async with client.pipeline(transaction=False) as pipe:
+                    for scope in scopes:
+                        pipe.incr(f"{REDIS_PREFIX}v:{scope}")
+                    await pipe.execute()
+            except Exception as e:
+                print(f"Warning: Reading cache invalidation failed: {e}")
+
+    # -- entry storage -----------------------------------------------------
+
+    def _local_get(self, key: str) -> Optional[_Entry]:
+        return self._entries.get(key)
+
+    def _local_put(self, key: str, entry: _Entry) -> None:
+        self._entries.put(key, entry)
+
+    async def _shared_get(self, key: str) -> Optional[_Entry]:
+        client = self._get_redis()
+        if client is None:
+            return None
+        try:
+            raw = await client.get(f"{REDIS_PREFIX}e:{key}")
+        except Exception as e:
+            print(f"Warning: Reading cache read failed: {e}")
+            return None
+        if raw is None:
+            return None
+        payload = json.loads(raw)
+        return _Entry(payload["v"], payload["t"], payload["data"])
+
+    async def _shared_put(self, key: str, entry: _Entry) -> None:
+        client = self._get_redis()
+        if client is None:
+            return
+        # Same encoder as the responses, so both tiers render created_at identically
+        payload = dumps({"v": entry.version, "t": entry.stored_at, "data": entry.data})
+        try:
+            await client.set(f"{REDIS_PREFIX}e:{key}", payload, ex=max(1, int(self.ttl + self.stale_seconds)))
+        except Exception as e:
+            print(f"Warning: Reading cache write failed: {e}")
+
+    async def _store(self, key: str, version: int, data: List[dict]) -> None:
+        entry = _Entry(version, time.time(), data)
+        self._local_put(key, entry)
+        await self._shared_put(key, entry)
+
+    # -- read-through ------------------------------------------------------
+
+    def _classify(self, entry: Optional[_Entry], version: int, now: float) -> str:
+        if entry is None or entry.version != version:
+            return "miss"
+        age = now - entry.stored_at
+        if age <= self.ttl:
+            return "fresh"
+        if age <= self.ttl + self.stale_seconds:
+            return "stale"
+        return "miss"
+
+    async def get_or_load(
+        self,
+        key: str,
+        user_id: Optional[int],
+        load: Loader,
+        revalidate: Optional[Loader] = None,
+    ) -> List[dict]:
+        """
+        Return the cached list for key, loading it with load() on a miss.
+        revalidate is used for background refreshes, which outlive the request
+        (so it must not use the request's DB session); defaults to load.
+        """
+        version = await self._current_version(user_id)
+        now = time.time()
+        entry = self._local_get(key)
+        state = self._classify(entry, version, now)
+        if state == "miss":
+            shared = await self._shared_get(key)
+            shared_state = self._classify(shared, version, now)
+            if shared_state != "miss":
+                entry, state = shared, shared_state
+                self._local_put(key, shared)
+
+        if state == "fresh":
+            self.hits += 1
+            return entry.data
+        if state == "stale":
+            self.stale_hits += 1
+            self._schedule_refresh(key, version, revalidate or load)
+            return entry.data
+
+        self.misses += 1
+        data = await load()
+        await self._store(key, version, data)
+        return data
+
+    def _schedule_refresh(self, key: str, version: int, load: Loader) -> None:
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def refresh():
+            try:
+                await self._store(key, version, await load())
+            except Exception as e:
+                print(f"Warning: Reading cache refresh failed: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        asyncio.get_running_loop().create_task(refresh())
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "shared": bool(self.redis_url),
+        }
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            try:
+                await self._redis.aclose()
+            except Exception:
+                pass
+            self._redis = None
+
+
+reading_cache = ReadingHistoryCache()
@@ -0,0 +1,205 @@
+"""
+Server-side reading engines: tarot, numerology and I Ching.
+
+The decks and tables mirror frontend-react/src/utils/constants.js and
+helpers.js, frozen into tuples at import. Every draw comes from a NumPy
+Generator seeded per request, so a (seed, request) pair always reproduces
+the same readings, and a batch of N draws is a few array operations instead
+of N Python loops. The first draw of a batch equals a single draw with the
+same seed, because the generator fills arrays in order.
+
+ENGINES maps a reading type to its engine; every engine has
+draw(rng, count, **options) -> list of result dicts.
+"""
+import secrets
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# 塔罗牌 (TAROT_DECK)
+TAROT_DECK = (
+    ("0 The Fool", "A new journey is beginning. Stay open-hearted and trust your intuition."),
+    ("I The Magician", "You already have the resources you need. It is time to act and manifest your ideas."),
+    ("II The High Priestess", "Pause outward action and listen within. Hidden information is rising from your subconscious."),
+    ("X Wheel of Fortune", "Circumstances are shifting. Align with the change and be ready to seize opportunity."),
+    ("XIII Death", "An old phase is ending. Let go to make space for a more authentic beginning."),
+    ("XVII The Star", "Hope and gentle healing are present. Trust that your path is quietly realigning."),
+    ("XIX The Sun", "Energy and clarity are high. Show yourself and celebrate your progress."),
+)
+
+# 生命路径数字含义 (LIFE_PATH_MEANINGS)
+LIFE_PATH_MEANINGS = {
+    1: "Leader type: pioneering, independent, and action-oriented.",
+    2: "Diplomat type: cooperative, sensitive, and relationship-focused.",
+    3: "Creative type: expressive, social, and stage-loving.",
+    4: "Builder type: practical, structured, and stability-oriented.",
+    5: "Adventurer type: freedom-seeking, curious, and change-friendly.",
+    6: "Nurturer type: caring, responsible, and home-focused.",
+    7: "Seeker type: introspective, analytical, and spiritual.",
+    8: "Executive type: ambitious, strategic, and resource-focused.",
+    9: "Humanitarian type: idealistic, compassionate, and global-minded.",
+    11: "Master number: inspiration, intuition, and spiritual leadership.",
+    22: "Master number: large-scale building, vision, and manifestation.",
+}
+DEFAULT_LIFE_PATH_MEANING = "A unique combination that needs a more detailed, personal interpretation."
+
+# 易经六十四卦, King Wen order
+HEXAGRAM_NAMES = (
+    "乾", "坤", "屯", "蒙", "需", "讼", "师", "比", "小畜", "履", "泰", "否", "同人", "大有", "谦", "豫",
+    "随", "蛊", "临", "观", "噬嗑", "贲", "剥", "复", "无妄", "大畜", "颐", "大过", "坎", "离", "咸", "恒",
+    "遁", "大壮", "晋", "明夷", "家人", "睽", "蹇", "解", "损", "益", "夬", "姤", "萃", "升", "困", "井",
+    "革", "鼎", "震", "艮", "渐", "归妹", "丰", "旅", "巽", "兑", "涣", "节", "中孚", "小过", "既济", "未济",
+)
+HEXAGRAM_NAMES_EN = (
+    "The Creative", "The Receptive", "Difficulty at the Beginning", "Youthful Folly", "Waiting", "Conflict",
+    "The Army", "Holding Together", "The Taming Power of the Small", "Treading", "Peace", "Standstill",
+    "Fellowship", "Great Possession", "Modesty", "Enthusiasm", "Following", "Work on the Decayed",
+    "Approach", "Contemplation", "Biting Through", "Grace", "Splitting Apart", "Return", "Innocence",
+    "The Taming Power of the Great", "Nourishment", "Preponderance of the Great", "The Abysmal", "The Clinging",
+    "Influence", "Duration", "Retreat", "The Power of the Great", "Progress", "Darkening of the Light",
+    "The Family", "Opposition", "Obstruction", "Deliverance", "Decrease", "Increase", "Breakthrough",
+    "Coming to Meet", "Gathering Together", "Pushing Upward", "Oppression", "The Well", "Revolution",
+    "The Caldron", "The Arousing", "Keeping Still", "Development", "The Marrying Maiden", "Abundance",
+    "The Wanderer", "The Gentle", "The Joyous", "Dispersion", "Limitation", "Inner Truth",
+    "Preponderance of the Small", "After Completion", "Before Completion",
+)
+# Messages of the hexagrams in ICHING_HEXAGRAMS
+HEXAGRAM_MESSAGES = {
+    1: "Strong creative force. Take the initiative and act with steady determination.",
+    2: "Softness is strength here. Support, receive, and cooperate rather than pushing alone.",
+    11: "Heaven and earth are in harmony. Consolidate your gains and share good fortune.",
+    24: "A turning point after a low period. Restart from small, sincere steps and correct your course.",
+    46: "Steady, step-by-step growth. Avoid rushing; consistent effort lifts you higher.",
+}
+
+# Trigrams as 3-bit line patterns (bit 0 = bottom line, 1 = yang)
+TRIGRAMS = {"乾": 7, "兑": 3, "离": 5, "震": 1, "巽": 6, "坎": 2, "艮": 4, "坤": 0}
+# King Wen number by (upper trigram, lower trigram)
+_KING_WEN_ORDER = ["乾", "震", "坎", "艮", "坤", "巽", "离", "兑"]
+_KING_WEN_ROWS = [
+    [1, 25, 6, 33, 12, 44, 13, 10],
+    [34, 51, 40, 62, 16, 32, 55, 54],
+    [5, 3, 29, 39, 8, 48, 63, 60],
+    [26, 27, 4, 52, 23, 18, 22, 41],
+    [11, 24, 7, 15, 2, 46, 36, 19],
+    [9, 42, 59, 53, 20, 57, 37, 61],
+    [14, 21, 64, 56, 35, 50, 30, 38],
+    [43, 17, 47, 31, 45, 28, 49, 58],
+]
+
+
+def _build_hexagram_table() -> np.ndarray:
+    """King Wen number of each 6-bit line pattern (bits 0-2 lower trigram, 3-5 upper)."""
+    table = np.zeros(64, dtype=np.int8)
+    for u, upper in enumerate(_KING_WEN_ORDER):
+        for l, lower in enumerate(_KING_WEN_ORDER):
+            table[TRIGRAMS[lower] | TRIGRAMS[upper] << 3] = _KING_WEN_ROWS[u][l]
+    table.flags.writeable = False
+    return table
+
+
+HEXAGRAM_BY_LINES = _build_hexagram_table()
+LINE_WEIGHTS = 1 << np.arange(6)
+
+
+def _reduce(total: int) -> int:
+    # Same loop as reduceToDigit: keep master numbers 11 and 22
+    while total > 9 and total not in (11, 22):
+        total = sum(int(d) for d in str(total))
+    return total
+
+
+DIGIT_SUMS = np.array([sum(int(d) for d in str(n)) for n in range(10000)], dtype=np.int16)
+REDUCED = np.array([_reduce(n) for n in range(64)], dtype=np.int8)  # digit sums of YYYYMMDD stay below 64
+for _table in (DIGIT_SUMS, REDUCED):
+    _table.flags.writeable = False
+
+
+# Result fragments are built once and shared by every draw (never mutated)
+TAROT_CARDS = tuple({"name": name, "message": message} for name, message in TAROT_DECK)
+LIFE_PATH_RESULTS = tuple(
+    {"life_path": n, "meaning": LIFE_PATH_MEANINGS.get(n, DEFAULT_LIFE_PATH_MEANING)} for n in range(23)
+)
+HEXAGRAMS = tuple(
+    {
+        "number": n,
+        "name": HEXAGRAM_NAMES[n - 1],
+        "name_en": HEXAGRAM_NAMES_EN[n - 1],
+        "message": HEXAGRAM_MESSAGES.get(n),
+    }
+    for n in range(1, 65)
+)
+
+
+def new_seed() -> int:
+    return secrets.randbits(63)
+
+
+def make_rng(seed: int) -> np.random.Generator:
+    return np.random.Generator(np.random.PCG64(seed))
+
+
+class TarotEngine:
+    """`cards` distinct cards per draw, without replacement."""
+
+    def draw(self, rng: np.random.Generator, count: int, cards: int = 1, **options) -> List[dict]:
+        if not 1 <= cards <= len(TAROT_DECK):
+            raise ValueError(f"cards must be between 1 and {len(TAROT_DECK)}")
+        # A random permutation per row: argsort of uniform keys
+        picks = rng.random((count, len(TAROT_DECK))).argsort(axis=1)[:, :cards]
+        return [{"cards": [TAROT_CARDS[i] for i in row]} for row in picks.tolist()]
+
+
+class NumerologyEngine:
+    """Life Path number of each birth date (deterministic, no randomness)."""
+
+    def draw(self, rng: np.random.Generator, count: int, birth_dates: Optional[List[str]] = None, **options) -> List[dict]:
+        if not birth_dates:
+            raise ValueError("birth_date is required for numerology")
+        dates = np.array(birth_dates, dtype="datetime64[D]")
+        years = dates.astype("datetime64[Y]").astype(np.int64) + 1970
+        months = dates.astype("datetime64[M]").astype(np.int64) % 12 + 1
+        days = (dates - dates.astype("datetime64[M]")).astype(np.int64) + 1
+        if ((years < 0) | (years > 9999)).any():
+            raise ValueError("birth_date year must be between 0 and 9999")
+        # Same as reduceToDigit over the digits of YYYYMMDD
+        numbers = REDUCED[DIGIT_SUMS[years] + DIGIT_SUMS[months] + DIGIT_SUMS[days]]
+        return [LIFE_PATH_RESULTS[n] for n in numbers.tolist()]
+
+
+class IChingEngine:
+    """
+    Three-coin casting: each line is the sum of three coins worth 2 or 3
+    (6 old yin, 7 young yang, 8 young yin, 9 old yang). Old lines change,
+    giving the relating hexagram.
+    """
+
+    def draw(self, rng: np.random.Generator, count: int, **options) -> List[dict]:
+        lines = rng.integers(2, 4, size=(count, 6, 3), dtype=np.int8).sum(axis=2)
+        yang = lines % 2 == 1
+        changing = (lines == 6) | (lines == 9)
+        primary = HEXAGRAM_BY_LINES[(yang * LINE_WEIGHTS).sum(axis=1)]
+        relating = HEXAGRAM_BY_LINES[((yang ^ changing) * LINE_WEIGHTS).sum(axis=1)]
+        results = []
+        for row, number, changed, moving in zip(lines.tolist(), primary.tolist(), relating.tolist(), changing.any(axis=1).tolist()):
+            results.append({
+                "lines": row,  # bottom to top
+                "hexagram": HEXAGRAMS[number - 1],
+                "relating_hexagram": HEXAGRAMS[changed - 1] if moving else None,
+            })
+        return results
+
+
+ENGINES: Dict[str, object] = {
+    "tarot": TarotEngine(),
+    "numerology": NumerologyEngine(),
+    "iching": IChingEngine(),
+}
+
+
+def run(reading_type: str, count: int, seed: Optional[int] = None, **options):
+    """(seed, results) for `count` draws; raises KeyError for an unknown type, ValueError for bad input."""
+    engine = ENGINES[reading_type]
+    if seed is None:
+        seed = new_seed()
+    return seed, engine.draw(make_rng(seed), count, **options)
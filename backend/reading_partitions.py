@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+"""
+Monthly partitions of the readings table and the cold archive.
+
+PostgreSQL: readings is created as a table partitioned by RANGE (created_at)
+with one partition per month (readings_YYYY_MM) plus a default partition.
+Partitions READINGS_PARTITIONS_AHEAD months ahead are kept in place, so
+inserts never wait on DDL. Rows that still land in readings_default (a month
+without a partition, e.g. a late spool replay into an archived month) are
+moved into their own month partition by the next ensure_partitions(), which
+detaches the default partition for that moment; otherwise creating the
+month's partition would fail. An existing unpartitioned table is converted with
+
+    python reading_partitions.py migrate
+
+SQLite (local runs) has no partitions, so they are emulated: a month is the
+created_at range of the single readings table (indexed on created_at), and
+dropping a partition deletes that range.
+
+archive_loop (every READINGS_ARCHIVE_INTERVAL seconds) keeps the partitions
+ahead and moves months older than READINGS_RETENTION_MONTHS (0 disables only
+the archiving) into READINGS_ARCHIVE_DIR/readings-YYYY-MM.ndjson.zst (gzip
+when zstandard is not installed): one JSON object per row in (created_at, id)
+order. The file is fsynced before the rows leave the database (shared
+chart_results no reading references any more go too), and only rows
+that were exported are removed: a month partition is locked against inserts
+from export to drop, and emulated months delete exactly the exported ids.
+Archived months are always older than the hot table, so read_archived()
+continues a newest-first listing where the database runs out. Each archive
+file has a <file>.ids sidecar with its lowest and highest id, so
+find_archived() only decompresses files whose range covers the id.
+
+    python reading_partitions.py archive     # run the archiver once
+"""
+import argparse
+import asyncio
+import fcntl
+import glob
+import gzip
+import json
+import os
+import re
+import sys
+from datetime import date, datetime
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, inspect, text
+
+try:
+    from . import models
+    from .chart_results import collect_orphans
+    from .db import upgrade_schema, engine as default_engine
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import models
+    from chart_results import collect_orphans
+    from db import upgrade_schema, engine as default_engine
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "archive")
+READINGS_PARTITIONING = os.getenv("READINGS_PARTITIONING", "1") == "1"
+READINGS_PARTITIONS_AHEAD = int(os.getenv("READINGS_PARTITIONS_AHEAD", "3"))
+READINGS_RETENTION_MONTHS = int(os.getenv("READINGS_RETENTION_MONTHS", "12"))
+READINGS_ARCHIVE_INTERVAL = float(os.getenv("READINGS_ARCHIVE_INTERVAL", "3600"))
+ARCHIVE_BATCH = 5000
+# pg_advisory_lock key, so only one worker/host archives at a time
+ARCHIVE_LOCK_KEY = 0x72656164
+# pg_advisory_xact_lock key serializing partition DDL between workers
+PARTITION_LOCK_KEY = 0x72656165
+
+COLUMNS = ["id", "user_id", "type", "input_data", "result", "created_at"]
+PARTITION_NAME = re.compile(r"^readings_(\d{4})_(\d{2})$")
+ARCHIVE_NAME = re.compile(r"^readings-(\d{4})-(\d{2})(?:\.(\d+))?\.ndjson\.(zst|gz)$")
+
+Month = Tuple[int, int]
+
+
+def archive_dir() -> str:
+    return os.getenv("READINGS_ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR)
+
+
+def add_months(month: Month, n: int) -> Month:
+    index = month[0] * 12 + month[1] - 1 + n
+    return index // 12, index % 12 + 1
+
+
+def month_start(month: Month) -> datetime:
+    return datetime(month[0], month[1], 1)
+
+
+def _is_postgres(bind) -> bool:
+    return bind.dialect.name == "postgresql"
+
+
+# -- schema ----------------------------------------------------------------
+
+PARTITIONED_DDL = """
+CREATE TABLE readings (
+    id SERIAL,
+    user_id INTEGER REFERENCES users (id),
+    type VARCHAR(64),
+    input_data TEXT,
+    result TEXT,
+    chart_hash VARCHAR(64),
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at)
+"""
+PARTITIONED_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_readings_id ON readings (id)",
+    "CREATE INDEX IF NOT EXISTS ix_readings_type ON readings (type)",
+    "CREATE INDEX IF NOT EXISTS ix_readings_created_at ON readings (created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_readings_chart_hash ON readings (chart_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_readings_user_id_id ON readings (user_id, id)",
+    "CREATE TABLE IF NOT EXISTS readings_default PARTITION OF readings DEFAULT",
+]
+
+
+def is_partitioned(bind) -> bool:
+    if not _is_postgres(bind):
+        return False
+    with bind.connect() as conn:
+        return bool(conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = 'readings'"
+        )).scalar())
+
+
+def create_partitioned_table(bind) -> bool:
+    """On PostgreSQL, create readings as a partitioned table when it does not exist yet (before create_all)."""
+    if not (READINGS_PARTITIONING and _is_postgres(bind)) or inspect(bind).has_table("readings"):
+        return False
+    models.User.__table__.create(bind, checkfirst=True)
+    with bind.begin() as conn:
+        conn.execute(text(PARTITIONED_DDL))
+        for statement in PARTITIONED_INDEXES:
+            conn.execute(text(statement))
+    return True
+
+
+def ensure_partitions(bind, today: Optional[date] = None) -> List[str]:
+    """
+    Create the partitions of the current month and READINGS_PARTITIONS_AHEAD
+    months ahead, and give rows stuck in readings_default their own month.
+    """
+    if not _is_postgres(bind):
+        # Emulated months are created_at ranges; the index makes them cheap to scan and delete
+        with bind.begin() as conn:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_readings_created_at ON readings (created_at)"))
+        return []
+    if not is_partitioned(bind):
+        return []
+    today = today or date.today()
+    created = []
+    with bind.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+        stray = _default_months(conn)
+        if stray:
+            # A month's partition cannot be created while readings_default holds rows of it
+            conn.execute(text("ALTER TABLE readings DETACH PARTITION readings_default"))
+            for month in stray:
+                created.append(_create_partition(conn, month))
+        for n in range(READINGS_PARTITIONS_AHEAD + 1):
+            month = add_months((today.year, today.month), n)
+            if month not in stray:
+                created.append(_create_partition(conn, month))
+        if stray:
+            columns = ", ".join(COLUMNS + ["chart_hash"])
+            conn.execute(text(f"INSERT INTO readings ({columns}) SELECT {columns} FROM readings_default"))
+            conn.execute(text("DELETE FROM readings_default"))
+            conn.execute(text("ALTER TABLE readings ATTACH PARTITION readings_default DEFAULT"))
+            print("Moved readings out of readings_default into " + ", ".join(f"{y:04d}-{m:02d}" for y, m in stray))
+    return created
+
+
+def _default_months(conn) -> List[Month]:
+    """Months with rows in readings_default (PostgreSQL), oldest first."""
+    if conn.execute(text("SELECT to_regclass('readings_default')")).scalar() is None:
+        return []
+    starts = conn.execute(text("SELECT DISTINCT date_trunc('month', created_at) FROM readings_default")).scalars()
+    return sorted((d.year, d.month) for d in starts)
+
+
+def _create_partition(conn, month: Month) -> str:
+    name = f"readings_{month[0]:04d}_{month[1]:02d}"
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF readings "
+        f"FOR VALUES FROM ('{month_start(month).isoformat()}') TO ('{month_start(add_months(month, 1)).isoformat()}')"
+    ))
+    return name
+
+
+def migrate(bind) -> str:
+    """Convert an unpartitioned PostgreSQL readings table in place (copy, then swap)."""
+    if not _is_postgres(bind):
+        return "SQLite emulates partitions on the plain table; nothing to migrate"
+    if is_partitioned(bind):
+        return "readings is already partitioned"
+    upgrade_schema(bind)
+    with bind.begin() as conn:
+        first = conn.execute(text("SELECT min(created_at) FROM readings")).scalar()
+        conn.execute(text("UPDATE readings SET created_at = now() AT TIME ZONE 'utc' WHERE created_at IS NULL"))
+        conn.execute(text("ALTER TABLE readings RENAME TO readings_unpartitioned"))
+        for index in ("readings_pkey", "ix_readings_id", "ix_readings_type", "ix_readings_created_at", "ix_readings_chart_hash", "ix_readings_user_id_id"):
+            conn.execute(text(f"ALTER INDEX IF EXISTS {index} RENAME TO {index}_unpartitioned"))
+        conn.execute(text(PARTITIONED_DDL))
+        for statement in PARTITIONED_INDEXES:
+            conn.execute(text(statement))
+        month = (first.year, first.month) if first else (date.today().year, date.today().month)
+        last = add_months((date.today().year, date.today().month), READINGS_PARTITIONS_AHEAD)
+        while month <= last:
+            _create_partition(conn, month)
+            month = add_months(month, 1)
+        columns = ", ".join(COLUMNS + ["chart_hash"])
+        conn.execute(text(f"INSERT INTO readings ({columns}) SELECT {columns} FROM readings_unpartitioned"))
+        conn.execute(text("SELECT setval(pg_get_serial_sequence('readings', 'id'), coalesce((SELECT max(id) FROM readings), 0) + 1, false)"))
+        conn.execute(text("DROP TABLE readings_unpartitioned"))
+    return "readings is now partitioned by month"
+
+
+# -- archiving -------------------------------------------------------------
+
+def hot_months(bind) -> List[Month]:
+    """Months with rows in the database, oldest first."""
+    if _is_postgres(bind) and is_partitioned(bind):
+        with bind.connect() as conn:
+            names = conn.execute(text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'readings'"
+            )).scalars()
+            months = {(int(m.group(1)), int(m.group(2))) for m in map(PARTITION_NAME.match, names) if m}
+            return sorted(months.union(_default_months(conn)))
+    with bind.connect() as conn:
+        first = conn.execute(text("SELECT min(created_at) FROM readings")).scalar()
+    if first is None:
+        return []
+    if isinstance(first, str):
+        first = datetime.fromisoformat(first)
+    months, month = [], (first.year, first.month)
+    current = (date.today().year, date.today().month)
+    while month <= current:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def _open_archive(month: Month, directory: str):
+    """(tmp path, final path, writable file) for a new archive part of month."""
+    os.makedirs(directory, exist_ok=True)
+    suffix = "zst" if zstandard is not None else "gz"
+    base = f"readings-{month[0]:04d}-{month[1]:02d}"
+    part = 1
+    # A month archived before (late rows) gets another part instead of overwriting
+    while glob.glob(os.path.join(directory, f"{base}.ndjson.*" if part == 1 else f"{base}.{part}.ndjson.*")):
+        part += 1
+    name = f"{base}.ndjson.{suffix}" if part == 1 else f"{base}.{part}.ndjson.{suffix}"
+    path = os.path.join(directory, name)
+    tmp = f"{path}.tmp"
+    raw = open(tmp, "wb")
+    if zstandard is not None:
+        return tmp, path, raw, zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=False)
+    return tmp, path, raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6)
+
+
+def _row_json(row) -> bytes:
+    record = dict(zip(COLUMNS, row))  # extra trailing columns (chart_hash) are not archived
+    created_at = record["created_at"]
+    if isinstance(created_at, str):  # SQLite returns the stored text
+        created_at = datetime.fromisoformat(created_at)
+    if created_at is not None:
+        record["created_at"] = created_at.isoformat()
+    return json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def archive_month(bind, month: Month, directory: Optional[str] = None) -> int:
+    """Export one month to a compressed NDJSON file, then drop it from the database; returns rows moved."""
+    directory = directory or archive_dir()
+    start, end = month_start(month), month_start(add_months(month, 1))
+    partition = f"readings_{month[0]:04d}_{month[1]:02d}"
+    with bind.connect() as conn:
+        if _is_postgres(bind) and is_partitioned(bind) and inspect(bind).has_table(partition):
+            with conn.begin():
+                # Inserts into the month wait until it is gone, so nothing lands between export and drop
+                conn.execute(text(f"LOCK TABLE {partition} IN SHARE MODE"))
+                count, _, hashes = _export_month(conn, partition, month, directory)
+                conn.execute(text(f"ALTER TABLE readings DETACH PARTITION {partition}"))
+                conn.execute(text(f"DROP TABLE {partition}"))
+            collect_orphans(bind, hashes)
+            return count
+        # Emulated month (or rows of it in readings_default): delete exactly the exported rows,
+        # so rows inserted meanwhile stay for the next run
+        count, ids, hashes = _export_month(conn, "readings", month, directory)
+        conn.rollback()
+    if not ids:
+        return 0
+    delete = text(
+        "DELETE FROM readings WHERE created_at >= :start AND created_at < :end AND id IN :ids"
+    ).bindparams(bindparam("ids", expanding=True))
+    with bind.begin() as conn:
+        for i in range(0, len(ids), ARCHIVE_BATCH):
+            conn.execute(delete, {"start": start, "end": end, "ids": ids[i:i + ARCHIVE_BATCH]})
+    collect_orphans(bind, hashes)
+    return count
+
+
+def _export_month(conn, table: str, month: Month, directory: str) -> Tuple[int, List[int], set]:
+    """Write the month's rows of table to a new archive part (fsynced); (rows, their ids, their chart hashes)."""
+    # Shared results are copied into the archive, so archive files stand on their own
+    query = text(
+        "SELECT r.id, r.user_id, r.type, r.input_data, coalesce(r.result, c.result), r.created_at, r.chart_hash "
+        f"FROM {table} r LEFT JOIN chart_results c ON c.hash = r.chart_hash "
+        "WHERE r.created_at >= :start AND r.created_at < :end ORDER BY r.created_at, r.id"
+    )
+    ids, hashes = [], set()
+    tmp, path, raw, writer = _open_archive(month, directory)
+    try:
+        result = conn.execution_options(stream_results=True, yield_per=ARCHIVE_BATCH).execute(
+            query, {"start": month_start(month), "end": month_start(add_months(month, 1))}
+        )
+        for row in result:
+            writer.write(_row_json(row))
+            ids.append(row[0])
+            if row[-1] is not None:
+                hashes.add(row[-1])
+        writer.close()
+        raw.flush()
+        os.fsync(raw.fileno())
+    finally:
+        raw.close()
+    if ids:
+        _write_id_range(path, min(ids), max(ids))
+        os.replace(tmp, path)
+    else:
+        os.remove(tmp)
+    return len(ids), ids, hashes
+
+
+def _try_lock(bind, conn, directory: str):
+    """Cross-worker archiver lock: pg advisory lock, or a lock file for SQLite."""
+    if _is_postgres(bind):
+        return conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": ARCHIVE_LOCK_KEY}).scalar()
+    os.makedirs(directory, exist_ok=True)
+    handle = open(os.path.join(directory, ".lock"), "w")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def archive_expired(bind=None, retention_months: int = READINGS_RETENTION_MONTHS, today: Optional[date] = None) -> dict:
+    """Archive every month older than the retention window; {"YYYY-MM": rows}."""
+    bind = bind if bind is not None else default_engine
+    if retention_months <= 0:
+        return {}
+    today = today or date.today()
+    cutoff = add_months((today.year, today.month), -retention_months)
+    directory = archive_dir()
+    moved = {}
+    with bind.connect() as lock_conn:
+        lock = _try_lock(bind, lock_conn, directory)
+        if not lock:
+            return moved
+        try:
+            for month in hot_months(bind):
+                if month < cutoff:
+                    moved[f"{month[0]:04d}-{month[1]:02d}"] = archive_month(bind, month, directory)
+        finally:
+            if _is_postgres(bind):
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ARCHIVE_LOCK_KEY})
+            else:
+                lock.close()
+    return moved
+
+
+async def archive_loop(interval: float = READINGS_ARCHIVE_INTERVAL) -> None:
+    """Keep partitions ahead and archive expired months until cancelled (partitions also when retention is 0)."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(ensure_partitions, default_engine)
+            moved = await asyncio.to_thread(archive_expired)
+            if moved:
+                print("Archived readings: " + ", ".join(f"{month} ({rows} rows)" for month, rows in moved.items()))
+        except Exception as e:
+            print(f"Warning: Readings archiver failed: {e}")
+
+
+# -- reading archives --------------------------------------------------------
+
+def archive_files(directory: Optional[str] = None) -> List[Tuple[Month, int, str]]:
+    """((year, month), part, path) of every archive file, newest first."""
+    files = []
+    for path in glob.glob(os.path.join(directory or archive_dir(), "readings-*.ndjson.*")):
+        m = ARCHIVE_NAME.match(os.path.basename(path))
+        if m:
+            files.append(((int(m.group(1)), int(m.group(2))), int(m.group(3) or 1), path))
+    files.sort(reverse=True)
+    return files
+
+
+def _read_archive(path: str) -> Iterator[dict]:
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is not installed, cannot read {path}")
+        with open(path, "rb") as raw:
+            reader = zstandard.ZstdDecompressor().stream_reader(raw)
+            buffer = b""
+            while True:
+                chunk = reader.read(1 << 20)
+                if not chunk:
+                    break
+                lines = (buffer + chunk).split(b"\n")
+                buffer = lines.pop()
+                for line in lines:
+                    yield json.loads(line)
+            if buffer:
+                yield json.loads(buffer)
+    else:
+        with gzip.open(path, "rb") as f:
+            for line in f:
+                yield json.loads(line)
+
+
+def _sort_key(row: dict) -> Tuple[datetime, int]:
+    return (datetime.fromisoformat(row["created_at"]) if row["created_at"] else datetime.min), row["id"]
+
+
+def read_archived(
+    user_id: Optional[int] = None,
+    reading_type: Optional[str] = None,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    limit: int = 50,
+    directory: Optional[str] = None,
+) -> List[dict]:
+    """Archived readings newest first, with the same filters as GET /readings (cursor: (created_at, id))."""
+    rows: List[dict] = []
+    for _, _, path in archive_files(directory):
+        matches = [
+            row for row in _read_archive(path)
+            if (user_id is None or row["user_id"] == user_id)
+            and (not reading_type or row["type"] == reading_type)
+            and (cursor is None or _sort_key(row) < cursor)
+        ]
+        matches.sort(key=_sort_key, reverse=True)
+        rows.extend(matches[:limit - len(rows)])
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+def _write_id_range(path: str, low: int, high: int) -> None:
+    tmp = f"{path}.ids.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(f"{low} {high}\n")
+    os.replace(tmp, f"{path}.ids")
+
+
+def archive_id_range(path: str) -> Tuple[int, int]:
+    """(lowest, highest) id in an archive file, from its .ids sidecar (written on first use for older files)."""
+    try:
+        with open(f"{path}.ids") as f:
+            low, high = map(int, f.read().split())
+        return low, high
+    except (FileNotFoundError, ValueError):
+        pass
+    ids = [row["id"] for row in _read_archive(path)]
+    low, high = (min(ids), max(ids)) if ids else (0, -1)
+    _write_id_range(path, low, high)
+    return low, high
+
+
+def find_archived(reading_id: int, directory: Optional[str] = None) -> Optional[dict]:
+    """One archived reading by id, or None; only files whose id range covers it are read."""
+    for _, _, path in archive_files(directory):
+        low, high = archive_id_range(path)
+        if not low <= reading_id <= high:
+            continue
+        for row in _read_archive(path):
+            if row["id"] == reading_id:
+                return row
+    return None
+
+
+def iter_archived(user_id: int, directory: Optional[str] = None) -> Iterator[dict]:
+    """Every archived reading of a user, oldest first, streamed from the files."""
+    for _, _, path in reversed(archive_files(directory)):
+        for row in _read_archive(path):
+            if row["user_id"] == user_id:
+                yield row
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Readings partitions and cold archive")
+    parser.add_argument("command", choices=["migrate", "partitions", "archive"])
+    parser.add_argument("--retention-months", type=int, default=READINGS_RETENTION_MONTHS)
+    args = parser.parse_args()
+    if args.command == "migrate":
+        print(migrate(default_engine))
+        print("Partitions: " + ", ".join(ensure_partitions(default_engine)))
+    elif args.command == "partitions":
+        print("Partitions: " + ", ".join(ensure_partitions(default_engine)))
+    else:
+        ensure_partitions(default_engine)
+        moved = archive_expired(default_engine, args.retention_months)
+        print(f"Archived {sum(moved.values())} readings from {len(moved)} month(s) to {archive_dir()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
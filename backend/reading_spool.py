@@ -0,0 +1,410 @@
+"""
+Durable local spool for reading writes while the database is down.
+
+Readings computed by the server (/bazi, /ziwei, /draw) go through
+save_readings(). A circuit breaker tracks database health: after
+DB_BREAKER_FAILURES connection failures in a row it opens, and for
+DB_BREAKER_RESET_SECONDS requests skip the database entirely instead of each
+waiting on the connect timeout. Then a single probe write is let through;
+success closes the breaker again.
+
+Rows that could not be written are appended to a per-worker spool file
+(READING_SPOOL_DIR/<pid>.spool) as length-prefixed records:
+
+    length uint32 | crc32 uint32 | JSON rows (UTF-8)
+
+Appends are plain write() calls; fsync is batched (group commit): a writer
+waits until one fsync, started at most READING_SPOOL_FSYNC_MS later, covers
+its record, so a burst of writes shares one fsync. A torn record at the end
+of a file (crash mid-write) fails its length or CRC check and is skipped.
+
+A background task (replay_loop) claims spool files every
+READING_SPOOL_REPLAY_SECONDS while the breaker allows it: the worker's own
+file is renamed to <pid>.<time>.replay and a fresh spool is started; files
+left by dead workers are claimed the same way. A worker replays a claimed
+file only while it holds an exclusive flock on it, so two workers never load
+the same file. Claimed files are bulk-loaded in batches of READING_SPOOL_BATCH
+rows, with the replayed offset kept in a .pos file, so a crash mid-replay
+repeats at most one batch. Other errors (schema problems, a full disk) are not
+taken for an outage: they surface instead of opening the breaker.
+"""
+import asyncio
+import fcntl
+import glob
+import json
+import os
+import socket
+import struct
+import time
+import zlib
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy.exc import DBAPIError, DataError, IntegrityError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+try:
+    from .chart_results import insert_readings
+    from .db import get_async_sessionmaker
+except ImportError:
+    from chart_results import insert_readings
+    from db import get_async_sessionmaker
+
+DEFAULT_SPOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "spool")
+DB_BREAKER_FAILURES = int(os.getenv("DB_BREAKER_FAILURES", "3"))
+DB_BREAKER_RESET_SECONDS = float(os.getenv("DB_BREAKER_RESET_SECONDS", "15"))
+READING_SPOOL_FSYNC_MS = float(os.getenv("READING_SPOOL_FSYNC_MS", "5"))
+READING_SPOOL_REPLAY_SECONDS = float(os.getenv("READING_SPOOL_REPLAY_SECONDS", "5"))
+READING_SPOOL_BATCH = int(os.getenv("READING_SPOOL_BATCH", "1000"))
+
+RECORD_HEADER = struct.Struct("<II")  # payload length, crc32 of the payload
+MAX_RECORD_SIZE = 64 * 1024 * 1024
+
+# Errors that mean "the database is unreachable", as opposed to a bad row, a
+# schema problem or a full disk (those surface instead of opening the breaker)
+CONNECTION_ERRORS = (InterfaceError, ConnectionError, socket.gaierror, TimeoutError, asyncio.TimeoutError, PoolTimeoutError)
+# SQLSTATE classes of connection failures: 08 connection exception, 57P0x server shutting down / starting
+CONNECTION_SQLSTATES = ("08", "57P01", "57P02", "57P03")
+# Rows the database rejects; they would fail every replay
+BAD_ROW_ERRORS = (IntegrityError, DataError, ValueError)
+
+
+def is_connection_error(error: BaseException) -> bool:
+    if isinstance(error, DBAPIError) and error.connection_invalidated:
+        return True
+    if isinstance(error, OperationalError):
+        if getattr(error.orig, "sqlite_errorname", None) == "SQLITE_CANTOPEN":
+            return True  # SQLite's "cannot connect"
+        # libpq reports a failed connect without a SQLSTATE; server-side errors carry one
+        code = getattr(error.orig, "pgcode", "")
+        return code is None or (code or "").startswith(CONNECTION_SQLSTATES)
+    return isinstance(error, CONNECTION_ERRORS)
+
+
+class CircuitBreaker:
+    """closed -> open after `failures` errors in a row -> one probe after `reset_seconds`."""
+
+    def __init__(self, failures: int = DB_BREAKER_FAILURES, reset_seconds: float = DB_BREAKER_RESET_SECONDS):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.probing or time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """
+        Whether to try the database now; in half-open state only one caller gets
+        True, and it is the probe (is_probe() right after) until end_probe().
+        """
+        if self.opened_at is None:
+            return True
+        if self.probing or time.monotonic() - self.opened_at < self.reset_seconds:
+            return False
+        self.probing = True
+        return True
+
+    def is_probe(self) -> bool:
+        """Call right after allow() returned True: whether this caller is the half-open probe."""
+        return self.opened_at is not None
+
+    def end_probe(self) -> None:
+        """Let the next caller probe; call in a finally of every probe, also when it had no verdict."""
+        self.probing = False
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            print("Database reachable again, closing the write circuit breaker")
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self.probing = False
+        if self.opened_at is not None or self.consecutive_failures >= self.failures:
+            if self.opened_at is None:
+                print(f"Warning: Database unreachable, writes go to the local spool for {self.reset_seconds:g}s")
+            self.opened_at = time.monotonic()
+
+
+def encode_record(rows: List[dict]) -> bytes:
+    payload = json.dumps(rows, ensure_ascii=False, default=str).encode("utf-8")
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_records(path: str, offset: int = 0):
+    """Yield (end offset, rows) for each intact record from offset on; stops at a torn tail."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            length, crc = RECORD_HEADER.unpack(header)
+            payload = f.read(length) if length <= MAX_RECORD_SIZE else b""
+            if len(payload) != length or zlib.crc32(payload) != crc:
+                print(f"Warning: Skipping torn record at the end of {path}")
+                return
+            offset += RECORD_HEADER.size + length
+            yield offset, json.loads(payload)
+
+
+def _lock_claimed(path: str):
+    """
+    Exclusive flock on a claimed spool file, or None when another worker is
+    replaying it (or already removed it). Released when the handle is closed,
+    also by a worker that dies.
+    """
+    try:
+        handle = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # The previous holder may have removed the file between our open and flock
+        if os.path.samestat(os.fstat(handle.fileno()), os.stat(path)):
+            return handle
+    except OSError:
+        pass
+    handle.close()
+    return None
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ReadingSpool:
+    def __init__(self, directory: Optional[str] = None, fsync_ms: float = READING_SPOOL_FSYNC_MS, batch: int = READING_SPOOL_BATCH):
+        self.directory = directory or os.getenv("READING_SPOOL_DIR", DEFAULT_SPOOL_DIR)
+        self.fsync_delay = fsync_ms / 1000
+        self.batch = batch
+        self._fd: Optional[int] = None
+        self._fd_pid: Optional[int] = None
+        self._file_bytes = 0  # bytes in the current file
+        self._written = 0  # bytes appended by this process, across files
+        self._synced = 0  # of those, bytes covered by an fsync
+        self._sync_task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self.spooled_rows = 0
+        self.replayed_rows = 0
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"{os.getpid()}.spool")
+
+    def _file_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _open(self) -> int:
+        if self._fd is None or self._fd_pid != os.getpid():
+            # Not inherited across fork: every worker appends to its own file
+            os.makedirs(self.directory, exist_ok=True)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            self._fd_pid = os.getpid()
+            self._file_bytes = os.fstat(self._fd).st_size
+        return self._fd
+
+    async def append(self, rows: List[dict]) -> None:
+        """Append one record and return once an fsync covers it."""
+        data = encode_record(rows)
+        os.write(self._open(), data)
+        self._file_bytes += len(data)
+        self._written += len(data)
+        self.spooled_rows += len(rows)
+        target = self._written
+        while self._synced < target:
+            if self._sync_task is None:
+                self._sync_task = asyncio.get_running_loop().create_task(self._group_fsync())
+            await asyncio.shield(self._sync_task)
+
+    async def _group_fsync(self) -> None:
+        try:
+            # Let the rest of the burst arrive, then one fsync covers all of it
+            await asyncio.sleep(self.fsync_delay)
+            async with self._file_lock():
+                if self._fd is not None:
+                    upto = self._written
+                    await asyncio.to_thread(os.fsync, self._fd)
+                    self._synced = max(self._synced, upto)
+        finally:
+            self._sync_task = None
+
+    def pending_files(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "*.replay")))
+
+    def has_pending(self) -> bool:
+        if self._file_bytes or self.pending_files():
+            return True
+        return any(os.path.getsize(path) for path in glob.glob(os.path.join(self.directory, "*.spool")))
+
+    async def _claim(self) -> None:
+        """Turn this worker's spool and spools of dead workers into .replay files."""
+        async with self._file_lock():
+            if self._fd is not None and self._fd_pid == os.getpid() and self._file_bytes:
+                os.fsync(self._fd)
+                os.close(self._fd)
+                self._fd = None
+                self._file_bytes = 0
+                self._synced = self._written
+                os.replace(self.path, os.path.join(self.directory, f"{os.getpid()}.{time.time_ns()}.replay"))
+        for path in glob.glob(os.path.join(self.directory, "*.spool")):
+            pid = int(os.path.basename(path).split(".")[0])
+            if pid == os.getpid() or _pid_alive(pid):
+                continue
+            try:
+                os.replace(path, os.path.join(self.directory, f"{pid}.{time.time_ns()}.replay"))
+            except FileNotFoundError:
+                pass  # another worker claimed it first
+
+    async def replay(self) -> int:
+        """Bulk-load claimed spool files; returns the number of rows written."""
+        if not os.path.isdir(self.directory):
+            return 0
+        await self._claim()
+        written = 0
+        for path in self.pending_files():
+            lock = _lock_claimed(path)
+            if lock is None:
+                continue  # another worker is replaying it
+            try:
+                written += await self._replay_file(path)
+            finally:
+                lock.close()
+        self.replayed_rows += written
+        return written
+
+    async def _replay_file(self, path: str) -> int:
+        """Replay one claimed file (its lock held) and remove it; returns the rows written."""
+        written = 0
+        pos_path = f"{path}.pos"
+        try:
+            with open(pos_path) as f:
+                offset = int(f.read() or 0)
+        except FileNotFoundError:
+            offset = 0
+        batch, end = [], offset
+        try:
+            for end, rows in read_records(path, offset):
+                batch.extend(rows)
+                if len(batch) >= self.batch:
+                    await self._load(batch, pos_path, end)
+                    written += len(batch)
+                    batch = []
+            if batch:
+                await self._load(batch, pos_path, end)
+                written += len(batch)
+        except BAD_ROW_ERRORS as e:
+            # Rows the database rejects would block the spool forever: set them aside
+            print(f"Warning: Moving unreplayable spool file {path} aside: {e}")
+            os.replace(path, f"{path}.failed")
+            return written
+        os.remove(path)
+        if os.path.exists(pos_path):
+            os.remove(pos_path)
+        return written
+
+    async def _load(self, rows: List[dict], pos_path: str, offset: int) -> None:
+        for row in rows:
+            if row.get("created_at"):
+                row["created_at"] = datetime.fromisoformat(row["created_at"])
+        async with get_async_sessionmaker()() as session:
+            await insert_readings(session, rows)
+        tmp = f"{pos_path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(str(offset))
+        os.replace(tmp, pos_path)
+
+    def stats(self) -> dict:
+        return {
+            "spooled_rows": self.spooled_rows,
+            "replayed_rows": self.replayed_rows,
+            "unsynced_bytes": self._written - self._synced,
+            "breaker": db_breaker.state,
+        }
+
+    def close(self) -> None:
+        if self._fd is not None and self._fd_pid == os.getpid():
+            os.fsync(self._fd)
+            os.close(self._fd)
+            self._synced = self._written
+        self._fd = None
+
+
+db_breaker = CircuitBreaker()
+reading_spool = ReadingSpool()
+
+
+async def save_readings(db, rows: List[dict]) -> List[int]:
+    """
+    Insert reading rows (dicts of models.Reading columns) with one multi-row
+    INSERT, results deduplicated into chart_results; when the database is
+    down, spool them instead. Returns the ids of the stored rows (empty when
+    they did not reach the database).
+    """
+    for row in rows:
+        row.setdefault("created_at", datetime.utcnow())
+    if db_breaker.allow():
+        probe = db_breaker.is_probe()
+        try:
+            ids = await insert_readings(db, rows)
+            db_breaker.record_success()
+            return ids
+        except Exception as e:
+            try:
+                await db.rollback()
+            except Exception:
+                pass
+            if not is_connection_error(e):
+                # The database answered, so it is up; a bad row would fail the replay as well, so it is not spooled
+                db_breaker.record_success()
+                print(f"Warning: Failed to save reading to database: {e}")
+                return []
+            db_breaker.record_failure()
+            print(f"Warning: Database unavailable, spooling {len(rows)} reading(s): {e}")
+        finally:
+            if probe:
+                db_breaker.end_probe()
+    try:
+        await reading_spool.append(rows)
+    except OSError as e:
+        print(f"Warning: Failed to spool reading: {e}")
+    return []
+
+
+async def replay_loop(interval: float = READING_SPOOL_REPLAY_SECONDS) -> None:
+    """Replay spooled readings whenever the breaker lets writes through, until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        if not os.path.isdir(reading_spool.directory) or not reading_spool.has_pending() or not db_breaker.allow():
+            continue
+        probe = db_breaker.is_probe()
+        try:
+            count = await reading_spool.replay()
+        except Exception as e:
+            if is_connection_error(e):
+                db_breaker.record_failure()
+            print(f"Warning: Reading spool replay failed: {e}")
+            continue
+        finally:
+            if probe:
+                db_breaker.end_probe()  # also when nothing reached the database (no verdict)
+        if count:
+            db_breaker.record_success()
+            print(f"Replayed {count} spooled reading(s) into the database")
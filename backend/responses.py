@@ -0,0 +1,42 @@
+"""
+Fast JSON responses for the hot endpoints.
+
+FastJSONResponse renders with orjson when it is installed and falls back to
+Starlette's JSONResponse otherwise. Handlers that return it directly (with an
+already-built dict) also skip FastAPI's response_model re-validation, which
+is most of the serialization cost for large payloads like /bazi.
+"""
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    class FastJSONResponse(JSONResponse):
+        media_type = "application/json"
+
+        def render(self, content: Any) -> bytes:
+            return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+else:
+    print("Warning: orjson not installed, using the standard JSON encoder")
+
+    class FastJSONResponse(JSONResponse):
+        def render(self, content: Any) -> bytes:
+            # Handlers pass plain dicts that may still hold datetimes
+            return super().render(jsonable_encoder(content))
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to JSON bytes the same way FastJSONResponse does."""
+    if orjson is not None:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+    return FastJSONResponse(content).body
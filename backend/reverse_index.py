@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Reverse pillar search: from known pillars back to candidate birth dates.
+
+Every day from 1900-01-01 to 2100-12-31 is encoded once with the same rules
+as build_chart (see compatibility.encode_dates). For each field (year, month,
+day pillar) the day numbers (days since 1900-01-01) are grouped by pillar
+(0-59 in the sexagenary cycle) into sorted uint32 posting lists:
+
+    header | offsets[3][61] uint32 | days[3][N] uint32
+
+The file (REVERSE_INDEX_PATH) is memory-mapped, so a query only slices the
+posting lists of the requested pillars, narrows each one to the date range
+with searchsorted and intersects them. The hour pillar does not depend on
+the date beyond the day stem, so it is a filter on the intersection.
+
+    python reverse_index.py     # rebuild the file
+"""
+import argparse
+import os
+import struct
+import sys
+import threading
+from datetime import date
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    from .bazi import EARTHLY_BRANCHES, HEAVENLY_STEMS
+    from .compatibility import encode_dates
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from bazi import EARTHLY_BRANCHES, HEAVENLY_STEMS
+    from compatibility import encode_dates
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "reverse_index.bin")
+EPOCH = np.datetime64("1900-01-01", "D")
+FIRST_DAY = EPOCH
+LAST_DAY = np.datetime64("2100-12-31", "D")
+
+FIELDS = ["year", "month", "day"]
+HEADER = struct.Struct("<4sII")  # magic, number of fields, days per field
+MAGIC = b"REV1"
+
+# Clock hours of each 时辰 branch; 子时 is 00:00-00:59 and 23:00-23:59 of the same
+# date, since compute_hour_pillar uses that date's day stem for both
+BRANCH_HOURS = [[0, 23]] + [[2 * i - 1, 2 * i] for i in range(1, 12)]
+
+
+def parse_pillar(pillar: str) -> int:
+    """Cycle index (0-59, 甲子 = 0) of a pillar such as "甲子"; ValueError when invalid."""
+    if not pillar or len(pillar) != 2 or pillar[0] not in HEAVENLY_STEMS or pillar[1] not in EARTHLY_BRANCHES:
+        raise ValueError(f"Invalid pillar {pillar!r}, expected a stem and a branch such as 甲子")
+    s, b = HEAVENLY_STEMS.index(pillar[0]), EARTHLY_BRANCHES.index(pillar[1])
+    if s % 2 != b % 2:
+        raise ValueError(f"{pillar} is not in the sexagenary cycle (stem and branch must both be yang or yin)")
+    return (6 * s - 5 * b) % 60
+
+
+def _day_number(day: np.datetime64) -> int:
+    return int((day - EPOCH).astype(np.int64))
+
+
+def build_index() -> bytes:
+    days = np.arange(_day_number(LAST_DAY) + 1, dtype=np.uint32)
+    charts = encode_dates(FIRST_DAY + days.astype("timedelta64[D]"), [None] * len(days))
+    codes = (6 * charts.stems[:, :3].astype(np.int64) - 5 * charts.branches[:, :3].astype(np.int64)) % 60
+    offsets, postings = [], []
+    for field in range(len(FIELDS)):
+        order = np.argsort(codes[:, field], kind="stable")  # stable: days stay sorted within a pillar
+        counts = np.bincount(codes[:, field], minlength=60)
+        offsets.append(np.concatenate([[0], np.cumsum(counts)]).astype(np.uint32))
+        postings.append(days[order])
+    return HEADER.pack(MAGIC, len(FIELDS), len(days)) + np.concatenate(offsets).tobytes() + np.concatenate(postings).tobytes()
+
+
+class ReverseIndex:
+    """Memory-mapped posting lists, built on first use when the file is missing."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("REVERSE_INDEX_PATH", DEFAULT_INDEX_PATH)
+        self._offsets: Optional[np.ndarray] = None
+        self._days: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def write(self) -> str:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(build_index())
+        os.replace(tmp, self.path)
+        return self.path
+
+    def load(self) -> None:
+        if self._days is not None:
+            return
+        with self._lock:
+            if self._days is not None:
+                return
+            if not os.path.exists(self.path):
+                self.write()
+            raw = np.memmap(self.path, dtype=np.uint8, mode="r")
+            magic, fields, days = HEADER.unpack_from(raw, 0)
+            if magic != MAGIC or fields != len(FIELDS):
+                raise ValueError(f"Corrupt reverse index {self.path}")
+            offsets_size = fields * 61
+            body = np.frombuffer(raw, dtype=np.uint32, offset=HEADER.size)
+            self._offsets = body[:offsets_size].reshape(fields, 61)
+            self._days = body[offsets_size:offsets_size + fields * days].reshape(fields, days)
+
+    def postings(self, field: int, pillar: int, start: int, end: int) -> np.ndarray:
+        """Sorted day numbers in [start, end] whose `field` pillar is `pillar` (a view, no copy)."""
+        self.load()
+        lo, hi = self._offsets[field, pillar], self._offsets[field, pillar + 1]
+        days = self._days[field, lo:hi]
+        return days[np.searchsorted(days, start):np.searchsorted(days, end, side="right")]
+
+    def search(
+        self,
+        pillars: List[Optional[int]],
+        hour_pillar: Optional[int] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> np.ndarray:
+        """
+        Day numbers matching every given pillar (year, month, day; None = any)
+        within the date range, ascending. At least one pillar is required.
+        """
+        start = _day_number(np.datetime64(start_date, "D") if start_date else FIRST_DAY)
+        end = _day_number(np.datetime64(end_date, "D") if end_date else LAST_DAY)
+        lists = [self.postings(f, p, start, end) for f, p in enumerate(pillars) if p is not None]
+        if not lists:
+            raise ValueError("At least one of the year, month or day pillars is required")
+        lists.sort(key=len)  # intersect from the shortest list
+        result = lists[0]
+        for other in lists[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, other, assume_unique=True)
+        if hour_pillar is not None:
+            # 日上起时: hour stem = (day stem % 5 * 2 + hour branch) % 10
+            hour_stem, hour_branch = hour_pillar % 10, hour_pillar % 12
+            day_stem = (6 + result.astype(np.int64)) % 10
+            result = result[(day_stem % 5 * 2 + hour_branch) % 10 == hour_stem]
+        return np.asarray(result)
+
+
+reverse_index = ReverseIndex()
+
+
+def day_to_iso(day: int) -> str:
+    return str(EPOCH + np.timedelta64(int(day), "D"))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build the reverse pillar search index")
+    parser.add_argument("--path", default=None, help="output file (default REVERSE_INDEX_PATH)")
+    args = parser.parse_args()
+    path = ReverseIndex(args.path).write()
+    print(f"Wrote reverse pillar index ({FIRST_DAY} .. {LAST_DAY}) to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Any, Optional, List, Dict
 
 from pydantic import BaseModel
 
@@ -78,6 +78,17 @@ class BaziAnalysis(BaseModel):
     analysis_summary: str = ""  # Text summary of the analysis
 
 
+class BaziChart(BaseModel):
+    """Structural chart: a pure function of birth date and hour."""
+
+    year_pillar: BaziPillar
+    month_pillar: BaziPillar
+    day_pillar: BaziPillar
+    hour_pillar: Optional[BaziPillar] = None
+    summary: str
+    analysis: BaziAnalysis
+
+
 class BaziResponse(BaseModel):
     year_pillar: BaziPillar
     month_pillar: Optional[BaziPillar] = None
@@ -87,6 +98,260 @@ class BaziResponse(BaseModel):
     interpretation: Optional[str] = None  # AI-generated interpretation text
     analysis: Optional[BaziAnalysis] = None  # Detailed structural analysis
     raw_input: BaziRequest
+    reading_id: Optional[int] = None  # id of the stored reading (for chat), None when it was not saved
+
+
+class BirthData(BaseModel):
+    birth_date: str  # YYYY-MM-DD
+    birth_time: Optional[str] = None  # HH:MM, optional
+
+
+class CompatibilityRequest(BaseModel):
+    person_a: BirthData
+    person_b: BirthData
+
+
+class CompatibilityResponse(BaseModel):
+    """合婚 score (0-100) and the relationships behind it."""
+
+    score: float
+    day_master_score: float
+    element_score: float
+    branch_score: float
+    day_master_a: str
+    day_master_b: str
+    ten_god_a_to_b: str  # Ten God of B's day stem seen from A's day master
+    ten_god_b_to_a: str
+    stem_combination: bool  # 天干五合 between the day stems
+    day_branch_relation: str  # 合 / 冲 / 无
+    year_branch_relation: str
+    elements_a: Dict[str, float]  # Element distribution in percent
+    elements_b: Dict[str, float]
+
+
+class CompatibilityCandidate(BirthData):
+    id: Optional[str] = None  # Caller's identifier, echoed back in matches
+
+
+class CompatibilityBatchRequest(BaseModel):
+    person: BirthData
+    candidates: List[CompatibilityCandidate]
+    top_k: int = 10
+
+
+class CompatibilityMatch(BaseModel):
+    index: int  # Position in the candidates list
+    id: Optional[str] = None
+    score: float
+
+
+class CompatibilityBatchResponse(BaseModel):
+    total: int
+    matches: List[CompatibilityMatch]
+
+
+class TimelineRequest(BirthData):
+    gender: str  # "male" / "female"
+    start_year: Optional[int] = None  # First calendar year of the page (default: birth year)
+    end_year: Optional[int] = None  # Last calendar year of the page
+
+
+class TimelinePeriod(BaseModel):
+    """A period pillar compared with the natal day pillar."""
+
+    stem: str
+    branch: str
+    element: str
+    branch_element: str
+    ten_god: str  # Ten God of the period stem
+    branch_ten_god: str  # Ten God of the branch's principal hidden stem
+    stem_relation: Optional[str] = None  # 同我 / 我生 / 我克 / 克我 / 生我 vs the Day Master
+    branch_relation: Optional[str] = None
+    day_branch_interaction: str  # 合 / 冲 / 无 with the natal day branch
+
+
+class LuckPillar(TimelinePeriod):
+    """大运"""
+
+    number: int
+    start_age: int
+    start_year: int
+    end_year: int
+
+
+class AnnualPillar(TimelinePeriod):
+    """流年"""
+
+    year: int
+    age: int
+    animal: str
+    luck_pillar: Optional[int] = None  # Number of the active 大运, None before the first
+
+
+class TimelineResponse(BaseModel):
+    direction: str  # "forward" (顺排) / "backward" (逆排)
+    start_age: int
+    luck_pillars: List[LuckPillar]
+    years: List[AnnualPillar]
+    next_start_year: Optional[int] = None  # Pass as start_year for the next page
+
+
+class ReverseSearchRequest(BaseModel):
+    """Known pillars (e.g. "甲子"); at least one of year / month / day is required."""
+
+    year_pillar: Optional[str] = None
+    month_pillar: Optional[str] = None
+    day_pillar: Optional[str] = None
+    hour_pillar: Optional[str] = None
+    start_date: Optional[str] = None  # YYYY-MM-DD, inclusive
+    end_date: Optional[str] = None
+    limit: int = 100
+
+
+class ReverseSearchMatch(BaseModel):
+    birth_date: str
+    hours: Optional[List[int]] = None  # Clock hours of the hour pillar, when one was given
+
+
+class ReverseSearchResponse(BaseModel):
+    total: int  # All matching dates; matches holds the first `limit`
+    matches: List[ReverseSearchMatch]
+
+
+class ZiweiRequest(BirthData):
+    user_id: Optional[int] = None
+
+
+class ZiweiStar(BaseModel):
+    name: str
+    transformation: Optional[str] = None  # 化禄 / 化权 / 化科 / 化忌
+
+
+class ZiweiPalace(BaseModel):
+    name: str  # 命宫, 兄弟, ...
+    branch: str
+    stem: str
+    major_stars: List[ZiweiStar]
+    minor_stars: List[ZiweiStar]
+    is_body_palace: bool
+
+
+class ZiweiChart(BaseModel):
+    """紫微斗数 chart; palaces start at 命宫."""
+
+    lunar_year: int
+    lunar_month: int
+    lunar_day: int
+    year_pillar: str
+    hour_branch: str
+    life_palace: str  # Branch of 命宫
+    body_palace: str  # Branch of 身宫
+    bureau: str  # 五行局, e.g. 水二局
+    nayin: str
+    palaces: List[ZiweiPalace]
+    transformations: Dict[str, str]  # 四化 -> star
+
+
+class ZiweiBatchRequest(BaseModel):
+    births: List[BirthData]
+    user_id: Optional[int] = None
+
+
+class ZiweiBatchResponse(BaseModel):
+    charts: List[ZiweiChart]
+
+
+class DrawRequest(BaseModel):
+    """Input of one server-side tarot / numerology / iching reading."""
+
+    seed: Optional[int] = None  # Reuse a returned seed to reproduce the reading
+    cards: int = 1  # tarot: cards per draw
+    birth_date: Optional[str] = None  # numerology: YYYY-MM-DD
+    user_id: Optional[int] = None
+
+
+class DrawResponse(BaseModel):
+    type: str
+    seed: int
+    result: Dict[str, Any]
+
+
+class DrawBatchRequest(BaseModel):
+    seed: Optional[int] = None
+    count: int = 1  # Number of draws (numerology: one per birth date instead)
+    cards: int = 1
+    birth_dates: Optional[List[str]] = None
+    user_id: Optional[int] = None
+
+
+class DrawBatchResponse(BaseModel):
+    type: str
+    seed: int
+    count: int
+    results: List[Dict[str, Any]]
+
+
+class NameAnalyzeRequest(BaseModel):
+    surname: str  # 1-2 characters
+    given_name: str  # 1-2 characters
+    birth_date: Optional[str] = None  # YYYY-MM-DD; the chart's use god weighs in the score
+    birth_time: Optional[str] = None
+    use_god: Optional[str] = None  # Element, overrides the one from birth_date
+
+
+class NameCharacter(BaseModel):
+    char: str
+    strokes: int  # Kangxi strokes
+
+
+class NameGrid(BaseModel):
+    name: str  # 天格 / 人格 / 地格 / 外格 / 总格
+    number: int
+    element: str
+    luck: str  # 吉 / 半吉 / 凶
+
+
+class NameAnalyzeResponse(BaseModel):
+    surname: str
+    given_name: str
+    characters: List[NameCharacter]
+    grids: List[NameGrid]
+    sancai: str  # Elements of 天格, 人格, 地格
+    use_god: Optional[str] = None
+    grid_score: float
+    sancai_score: float
+    use_god_score: Optional[float] = None
+    score: float  # 0-100
+
+
+class NameRankRequest(BaseModel):
+    surname: str
+    given_names: List[str]
+    birth_date: Optional[str] = None
+    birth_time: Optional[str] = None
+    use_god: Optional[str] = None
+    top_k: int = 20
+
+
+class NameMatch(BaseModel):
+    index: int  # Position in given_names
+    given_name: str
+    score: float
+    grids: List[int]  # 天格, 人格, 地格, 外格, 总格
+
+
+class NameRankResponse(BaseModel):
+    total: int
+    use_god: Optional[str] = None
+    matches: List[NameMatch]
+
+
+class AnalyticsResponse(BaseModel):
+    start: str
+    end: str
+    group_by: List[str]
+    rows: List[Dict[str, Any]]  # one dict per group: the group_by values plus "count"
+    watermark: int  # id of the last reading counted
 
 
 class ChatMessage(BaseModel):
@@ -97,6 +362,7 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     messages: List[ChatMessage]
     language: Optional[str] = "zh"
+    reading_id: Optional[int] = None  # Stored Bazi reading to discuss; its chart digest is added server-side
 
 
 class ChatResponse(BaseModel):
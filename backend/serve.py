@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Production launcher: gunicorn master with uvicorn worker processes.
+
+    python serve.py                 # start (settings below come from the environment)
+    python serve.py --status        # per-worker health of a running server
+
+Settings:
+    HOST / PORT                     bind address (default 0.0.0.0:8000)
+    WEB_CONCURRENCY                 worker processes (default: one per available CPU)
+    GUNICORN_BACKLOG                listen backlog (default 2048)
+    GUNICORN_KEEPALIVE              keep-alive seconds; keep above the load balancer idle timeout (default 75)
+    GUNICORN_TIMEOUT                seconds before a silent worker is restarted (default 60)
+    GUNICORN_GRACEFUL_TIMEOUT       seconds a worker gets to drain on SIGTERM (default 30)
+    GUNICORN_MAX_REQUESTS           recycle workers after N requests (default 0 = never)
+    WORKER_STATUS_DIR               where workers write heartbeat files (default: a temp dir)
+
+The app and its lookup tables are loaded once in the master before forking,
+so workers share that memory copy-on-write. On SIGTERM gunicorn stops
+accepting connections and each worker finishes in-flight requests, then runs
+the app lifespan shutdown, which drains in-memory queues.
+
+For local development keep using start_simple.py (single process with reload).
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_STATUS_DIR = os.path.join(tempfile.gettempdir(), "fortune-telling-workers")
+
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def default_workers() -> int:
+    value = os.getenv("WEB_CONCURRENCY")
+    if value:
+        return max(1, int(value))
+    # Async workers: one per core is enough; the event loop handles concurrency
+    return available_cpus()
+
+
+def gunicorn_options() -> dict:
+    status_dir = os.environ.setdefault("WORKER_STATUS_DIR", DEFAULT_STATUS_DIR)
+    # Schema creation is an explicit migration step (python db.py) in production
+    os.environ.setdefault("DB_AUTO_CREATE", "0")
+    return {
+        "bind": f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}",
+        "workers": default_workers(),
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "backlog": int(os.getenv("GUNICORN_BACKLOG", "2048")),
+        "keepalive": int(os.getenv("GUNICORN_KEEPALIVE", "75")),
+        "timeout": int(os.getenv("GUNICORN_TIMEOUT", "60")),
+        "graceful_timeout": int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30")),
+        "max_requests": int(os.getenv("GUNICORN_MAX_REQUESTS", "0")),
+        "max_requests_jitter": int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0")),
+        "accesslog": os.getenv("GUNICORN_ACCESSLOG", "-"),
+        "worker_tmp_dir": "/dev/shm" if os.path.isdir("/dev/shm") else None,
+        "post_fork": post_fork,
+        "on_starting": lambda server: _clear_status_dir(status_dir),
+    }
+
+
+def _clear_status_dir(directory: str) -> None:
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.remove(path)
+
+
+def post_fork(server, worker):
+    """Per-worker setup: fresh counters and no DB connections inherited from the master."""
+    import main
+    from db import engine
+
+    main.worker_stats.reset()
+    engine.dispose(close=False)
+
+
+def preload():
+    """Import the app and build lookup tables in the master, before fork."""
+    import main
+
+    timings = main.warm_lookup_tables()
+    # Forked workers must not share the master's SQLite handle
+    if main.get_interpretation_store is not None:
+        main.get_interpretation_store().close()
+    print("Preloaded app: " + ", ".join(f"{name} {ms:.1f}ms" for name, ms in timings.items()))
+    return main.app
+
+
+def run() -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class FortuneApplication(BaseApplication):
+        def __init__(self, options: dict):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                if value is not None and key in self.cfg.settings:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return preload()
+
+    options = gunicorn_options()
+    print(f"Starting {options['workers']} workers on {options['bind']}")
+    FortuneApplication(options).run()
+
+
+def status() -> int:
+    """Print the heartbeat of every worker of the running server."""
+    directory = os.getenv("WORKER_STATUS_DIR", DEFAULT_STATUS_DIR)
+    files = sorted(glob.glob(os.path.join(directory, "*.json")))
+    if not files:
+        print(f"No worker heartbeats in {directory}")
+        return 1
+    now = time.time()
+    stale_after = float(os.getenv("WORKER_HEARTBEAT_SECONDS", "5")) * 3
+    healthy = True
+    print(f"{'pid':>8} {'state':<6} {'uptime_s':>9} {'requests':>9} {'in_flight':>9} {'errors':>7}")
+    for path in files:
+        try:
+            with open(path) as f:
+                snap = json.load(f)
+        except (OSError, ValueError):
+            continue
+        state = "ok" if now - snap["updated_at"] <= stale_after else "stale"
+        healthy = healthy and state == "ok"
+        print(
+            f"{snap['pid']:>8} {state:<6} {snap['uptime_s']:>9} {snap['requests_total']:>9} "
+            f"{snap['requests_in_flight']:>9} {snap['errors_total']:>7}"
+        )
+    return 0 if healthy else 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Production server launcher")
+    parser.add_argument("--status", action="store_true", help="show per-worker health of a running server")
+    args = parser.parse_args()
+    if args.status:
+        sys.exit(status())
+    run()
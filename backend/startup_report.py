@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Report where backend startup time goes.
+
+    python startup_report.py [--top 15]
+
+Imports main.py in a fresh interpreter with -X importtime, then prints the
+total import time, the slowest top-level packages (summed self time) and the
+slowest individual modules (cumulative time), followed by the lifespan
+lookup-table steps.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_importtime(stderr: str):
+    """Yield (module, self_us, cumulative_us, depth) from -X importtime output."""
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue
+        raw_name = parts[2]
+        depth = (len(raw_name) - len(raw_name.lstrip(" ")) - 1) // 2
+        yield raw_name.strip(), self_us, cumulative_us, depth
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Backend startup time report")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--module", default="main", help="module to import (default: main)")
+    args = parser.parse_args()
+
+    env = dict(os.environ, DB_AUTO_CREATE="0")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {args.module}"],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        return proc.returncode
+
+    rows = list(parse_importtime(proc.stderr))
+    total_us = sum(r[1] for r in rows)
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"Import of '{args.module}': {total_us / 1000:.1f} ms total, {len(rows)} modules\n")
+    print(f"Slowest packages (self time, top {args.top}):")
+    for name, us in sorted(by_package.items(), key=lambda x: -x[1])[: args.top]:
+        print(f"  {us / 1000:9.1f} ms  {us * 100 / total_us:5.1f}%  {name}")
+
+    print(f"\nSlowest modules (cumulative, top {args.top}):")
+    for name, _, cumulative_us, depth in sorted(rows, key=lambda r: -r[2])[: args.top]:
+        print(f"  {cumulative_us / 1000:9.1f} ms  depth {depth:<2} {name}")
+
+    if args.module == "main":
+        sys.path.insert(0, BACKEND_DIR)
+        os.environ["DB_AUTO_CREATE"] = "0"
+        import main as app_main
+
+        print("\nLifespan lookup tables:")
+        for step, ms in app_main.warm_lookup_tables().items():
+            print(f"  {ms:9.1f} ms  {step}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+"""
+Backend tests run against a throwaway SQLite database:
+
+    cd backend && python -m pytest -q tests
+"""
+import os
+import sys
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="fortune-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("IDEMPOTENCY_REDIS_URL", None)
+os.environ.pop("REDIS_URL", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+import db  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    db.init_db()
+    yield db
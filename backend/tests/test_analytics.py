@@ -0,0 +1,18 @@
+import analytics
+
+
+def test_only_one_worker_tails_at_a_time(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANALYTICS_LOCK_FILE", str(tmp_path / "analytics.lock"))
+    analytics.init_tables()
+    rounds = []
+
+    def catch_up(max_batches=100):
+        # A second worker trying while this one tails is turned away
+        rounds.append(analytics.catch_up_elected())
+        return 0
+
+    monkeypatch.setattr(analytics, "catch_up", catch_up)
+    assert analytics.catch_up_elected() == 0
+    assert rounds == [None]
+    # The lock is released after the round
+    assert analytics.catch_up_elected() == 0
@@ -0,0 +1,21 @@
+from fastapi.testclient import TestClient
+
+import main
+
+client = TestClient(main.app)
+
+
+def test_chart_is_revalidated_not_immutable():
+    response = client.get("/bazi/chart", params={"date": "1990-05-17", "hour": 8})
+    assert response.status_code == 200
+    cache_control = response.headers["cache-control"]
+    assert "immutable" not in cache_control
+    assert cache_control == f"public, max-age={main.BAZI_CHART_MAX_AGE}, must-revalidate"
+
+    etag = response.headers["etag"]
+    again = client.get("/bazi/chart", params={"date": "1990-05-17", "hour": 8}, headers={"If-None-Match": f"W/{etag}"})
+    assert again.status_code == 304 and again.headers["etag"] == etag
+
+
+def test_chart_rejects_bad_dates():
+    assert client.get("/bazi/chart", params={"date": "1990-13-40"}).status_code == 400
@@ -0,0 +1,55 @@
+import asyncio
+from datetime import date, datetime
+
+from sqlalchemy import select
+
+import db
+import models
+from chart_results import insert_readings, result_hash, split_results
+from reading_partitions import archive_expired
+
+
+def test_only_bazi_results_are_shared():
+    rows = [
+        {"type": "bazi", "result": '{"day_pillar": "甲子"}'},
+        {"type": "ziwei", "result": '{"palaces": []}'},
+        {"type": "tarot", "result": '{"card": 1}'},
+        {"type": "bazi", "result": None},
+    ]
+    readings, charts = split_results(rows)
+    assert list(charts) == [result_hash(rows[0]["result"])]
+    assert [r["result"] is None for r in readings] == [True, False, False, True]
+    assert [r["chart_hash"] for r in readings] == [result_hash(rows[0]["result"]), None, None, None]
+
+
+def _charts():
+    with db.SessionLocal() as session:
+        return set(session.scalars(select(models.ChartResult.hash)))
+
+
+def test_archiving_collects_orphaned_charts(tmp_path, monkeypatch):
+    monkeypatch.setenv("READINGS_ARCHIVE_DIR", str(tmp_path))
+    shared, old_only = '{"day_pillar": "丙寅"}', '{"day_pillar": "丁卯"}'
+
+    def row(result, created_at):
+        return {"type": "bazi", "user_id": 7100, "input_data": "{}", "result": result, "created_at": created_at}
+
+    async def scenario():
+        async with db.get_async_sessionmaker()() as session:
+            await insert_readings(session, [
+                row(shared, datetime(2017, 1, 1)),
+                row(old_only, datetime(2017, 1, 2)),
+                row(shared, datetime(2026, 10, 1)),
+            ])
+        await db.dispose_async_engine()
+
+    asyncio.run(scenario())
+    assert {result_hash(shared), result_hash(old_only)} <= _charts()
+
+    assert archive_expired(db.engine, retention_months=12, today=date(2026, 10, 19))["2017-01"] == 2
+    charts = _charts()
+    assert result_hash(shared) in charts  # still used by the 2026 reading
+    assert result_hash(old_only) not in charts
+    with db.SessionLocal() as session:
+        live = session.scalars(select(models.Reading).where(models.Reading.user_id == 7100)).one()
+        assert live.full_result == shared
@@ -0,0 +1,58 @@
+import pytest
+
+from chat_context import (
+    MIN_MESSAGE_TOKENS,
+    ChatContextManager,
+    RollingSummaryCache,
+    count_message_tokens,
+    count_tokens,
+)
+
+
+def _manager(budget, keep_turns=2):
+    return ChatContextManager(keep_turns=keep_turns, budgets={"en": budget}, cache=RollingSummaryCache())
+
+
+def _history(turns, words=20):
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"question {i}" + " word" * words})
+        messages.append({"role": "assistant", "content": f"answer {i}" + " word" * words})
+    return messages
+
+
+def test_short_history_is_sent_verbatim():
+    messages = _history(2)
+    built = _manager(2000).build("You are a fortune master.", messages, "en")
+    assert built == [{"role": "system", "content": "You are a fortune master."}] + messages
+
+
+def test_older_turns_are_summarized_within_budget():
+    built = _manager(200).build("You are a fortune master.", _history(10), "en")
+    assert count_message_tokens(built) <= 200
+    assert built[1]["role"] == "system" and built[1]["content"].startswith("Summary of the earlier part")
+    assert built[-1]["content"].startswith("answer 9")
+    assert all(m["content"] for m in built)
+
+
+def test_single_long_message_keeps_its_tail():
+    messages = [{"role": "user", "content": "start " + "filler " * 400 + "the actual question"}]
+    built = _manager(120).build("You are a fortune master.", messages, "en")
+    assert count_message_tokens(built) <= 120
+    assert built[-1]["content"].endswith("the actual question")
+    assert built[0]["content"] == "You are a fortune master."
+
+
+def test_oversized_system_prompt_is_cut_instead_of_emptying_messages():
+    system = "You are a fortune master. " + "chart detail " * 200  # the digest is appended last
+    messages = _history(3)
+    built = _manager(80).build(system, messages, "en")
+    assert count_message_tokens(built) <= 80
+    assert built[0]["content"].startswith("You are a fortune master.")
+    assert all(count_tokens(m["content"]) >= MIN_MESSAGE_TOKENS for m in built[1:])
+    assert [m["role"] for m in built] == ["system", "user", "assistant"]
+
+
+def test_budget_too_small_fails_loudly():
+    with pytest.raises(ValueError, match="too small"):
+        _manager(30).build("You are a fortune master. " * 20, _history(1), "en")
@@ -0,0 +1,63 @@
+from fastapi import FastAPI, HTTPException, WebSocket
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+
+from chat_ws import ChatSocketSession
+
+CHAT = {"type": "chat", "messages": [{"role": "user", "content": "hi"}]}
+
+
+def _client(stream_reply, load_chart_digest=lambda reading_id, language: "digest"):
+    app = FastAPI()
+
+    @app.websocket("/ws/chat")
+    async def chat_ws(websocket: WebSocket):
+        await ChatSocketSession(websocket, stream_reply, load_chart_digest).run()
+
+    return TestClient(app)
+
+
+def _reply(messages, language="zh", chart_digest=None):
+    yield "你"
+    yield "好"
+
+
+def test_reply_is_streamed_and_ended():
+    with _client(_reply).websocket_connect("/ws/chat") as ws:
+        ws.send_json(CHAT)
+        assert [ws.receive_json()["type"] for _ in range(4)] == ["start", "token", "token", "end"]
+
+
+def test_chart_lookup_errors_end_the_generation():
+    def load_chart_digest(reading_id, language):
+        if reading_id == 1:
+            raise HTTPException(status_code=404, detail="Reading not found")
+        raise OperationalError("SELECT", {}, Exception("database is down"))
+
+    with _client(_reply, load_chart_digest).websocket_connect("/ws/chat") as ws:
+        ws.send_json({**CHAT, "reading_id": 1})
+        assert ws.receive_json() == {"type": "error", "id": 1, "detail": "Reading not found"}
+        ws.send_json({**CHAT, "reading_id": 2})
+        assert ws.receive_json() == {"type": "error", "id": 2, "detail": "Chart is unavailable right now"}
+
+
+def test_stream_errors_end_the_generation():
+    def failing_reply(messages, language="zh", chart_digest=None):
+        yield "你"
+        raise RuntimeError("model stream broke")
+
+    with _client(failing_reply).websocket_connect("/ws/chat") as ws:
+        ws.send_json(CHAT)
+        frames = [ws.receive_json() for _ in range(3)]
+        assert [f["type"] for f in frames] == ["start", "token", "error"]
+        assert frames[-1]["id"] == 1
+
+
+def test_binary_and_bad_frames_are_rejected_without_closing():
+    with _client(_reply).websocket_connect("/ws/chat") as ws:
+        ws.send_bytes(b"\x00\x01")
+        assert ws.receive_json() == {"type": "error", "id": None, "detail": "Only JSON text frames are supported"}
+        ws.send_text("{not json")
+        assert ws.receive_json()["detail"] == "Invalid JSON"
+        ws.send_json(CHAT)
+        assert ws.receive_json()["type"] == "start"
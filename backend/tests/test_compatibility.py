@@ -0,0 +1,95 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from bazi import EARTHLY_BRANCHES, HEAVENLY_STEMS, build_chart
+from compatibility import (
+    DAY_BRANCH_RELATIONS,
+    ELEMENT_INTERACTION,
+    STEM_COMBINATION,
+    YEAR_BRANCH_RELATIONS,
+    encode_births,
+    pair_compatibility,
+    rank_candidates,
+    top_k,
+)
+
+
+@pytest.mark.parametrize("birth_date, hour", [
+    ("1990-05-15", 10),
+    ("1984-02-04", 0),
+    ("2000-01-31", 23),
+    ("1975-12-08", None),
+])
+def test_encoding_matches_build_chart(birth_date, hour):
+    chart = build_chart(datetime.strptime(birth_date, "%Y-%m-%d"), None if hour is None else f"{hour:02d}:30")
+    codes = encode_births([birth_date], [hour])
+    pillars = [chart.year_pillar, chart.month_pillar, chart.day_pillar, chart.hour_pillar]
+    expected = [(p.stem, p.branch) if p else None for p in pillars]
+    encoded = [
+        (HEAVENLY_STEMS[s], EARTHLY_BRANCHES[b]) if s >= 0 else None
+        for s, b in zip(codes.stems[0].tolist(), codes.branches[0].tolist())
+    ]
+    assert encoded == expected
+    assert codes.elements[0].sum() == pytest.approx(1.0)
+
+
+def test_element_interaction_follows_generation_and_conquest():
+    # 木 火 土 金 水: each element generates the next and conquers the one after
+    for i in range(5):
+        assert ELEMENT_INTERACTION[i, (i + 1) % 5] == 1
+        assert ELEMENT_INTERACTION[i, (i + 2) % 5] == -1
+        assert np.count_nonzero(ELEMENT_INTERACTION[i]) == 2
+
+
+def test_stem_and_branch_relations():
+    stem = HEAVENLY_STEMS.index
+    branch = EARTHLY_BRANCHES.index
+    assert STEM_COMBINATION[stem("甲"), stem("己")] and STEM_COMBINATION[stem("癸"), stem("戊")]
+    assert not STEM_COMBINATION[stem("甲"), stem("庚")]
+    assert DAY_BRANCH_RELATIONS[branch("子"), branch("丑")] == 1  # 六合
+    assert DAY_BRANCH_RELATIONS[branch("午"), branch("未")] == 1
+    assert DAY_BRANCH_RELATIONS[branch("子"), branch("午")] == -1  # 六冲
+    assert DAY_BRANCH_RELATIONS[branch("申"), branch("子")] == 0
+    assert YEAR_BRANCH_RELATIONS[branch("申"), branch("子")] == 1  # 三合 counts for the zodiac
+    assert YEAR_BRANCH_RELATIONS[branch("寅"), branch("申")] == -1
+    assert (DAY_BRANCH_RELATIONS == DAY_BRANCH_RELATIONS.T).all()
+
+
+def test_pair_compatibility():
+    result = pair_compatibility("1990-05-15", 10, "1992-08-20", None)
+    assert result["score"] == 58.1
+    assert (result["day_master_score"], result["element_score"], result["branch_score"]) == (60.0, 63.1, 50.0)
+    assert (result["day_master_a"], result["day_master_b"]) == ("丙", "甲")
+    assert (result["ten_god_a_to_b"], result["ten_god_b_to_a"]) == ("偏印", "食神")
+    assert result["elements_a"] == {"木": 0.0, "火": 31.4, "土": 17.1, "金": 37.1, "水": 14.3}
+    # The score does not depend on who is asking
+    assert pair_compatibility("1992-08-20", None, "1990-05-15", 10)["score"] == result["score"]
+
+
+def test_rank_candidates_matches_pair_scores():
+    dates = ["1992-08-20", "1988-01-01", "1991-03-03", "1990-05-15"]
+    hours = [None, 3, None, 10]
+    ranked = rank_candidates("1990-05-15", 10, dates, hours, 3)
+    assert ranked == [(1, 72.1), (2, 65.7), (0, 58.1)]
+    for index, score in ranked:
+        assert pair_compatibility("1990-05-15", 10, dates[index], hours[index])["score"] == score
+
+
+def test_top_k_keeps_candidate_order_on_ties():
+    scores = np.array([5.0, 9.0, 5.0, 9.0, 1.0])
+    assert top_k(scores, 3).tolist() == [1, 3, 0]
+    assert top_k(scores, 10).tolist() == [1, 3, 0, 2, 4]
+    assert top_k(scores, 0).tolist() == []
+
+
+@pytest.mark.parametrize("birth_date", ["", "NaT", "1990", "1990-05", "1990-02-30", "90-05-01", None])
+def test_malformed_dates_are_rejected(birth_date):
+    with pytest.raises(ValueError):
+        encode_births([birth_date], [None])
+
+
+def test_non_padded_dates_are_accepted():
+    codes = encode_births(["1990-5-15"], [None])
+    assert codes.stems.tolist() == encode_births(["1990-05-15"], [None]).stems.tolist()
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, Response
+
+from idempotency import REPLAYED_HEADER, IdempotencyStore
+
+
+def _store(**kwargs):
+    return IdempotencyStore(redis_url="", **kwargs)
+
+
+def _producer(calls, status_code=200, delay=0.0):
+    async def produce():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return Response(content=f'{{"n": {len(calls)}}}', status_code=status_code, media_type="application/json")
+    return produce
+
+
+def test_repeat_replays_the_stored_response():
+    store, calls = _store(), []
+
+    async def scenario():
+        first = await store.run("bazi", "k1", "fp", _producer(calls))
+        second = await store.run("bazi", "k1", "fp", _producer(calls))
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert second.body == first.body and second.status_code == 200
+    assert second.headers[REPLAYED_HEADER] == "true"
+    assert REPLAYED_HEADER not in first.headers
+
+
+def test_key_reused_with_another_body_is_rejected():
+    store, calls = _store(), []
+
+    async def scenario():
+        await store.run("bazi", "k1", "fp", _producer(calls))
+        await store.run("bazi", "k1", "other", _producer(calls))
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(scenario())
+    assert error.value.status_code == 422
+    assert len(calls) == 1
+
+
+def test_server_errors_are_not_stored():
+    store, calls = _store(), []
+
+    async def scenario():
+        await store.run("bazi", "k1", "fp", _producer(calls, status_code=503))
+        return await store.run("bazi", "k1", "fp", _producer(calls))
+
+    assert asyncio.run(scenario()).status_code == 200
+    assert len(calls) == 2
+
+
+def test_concurrent_duplicates_are_computed_once():
+    store, calls = _store(), []
+
+    async def scenario():
+        return await asyncio.gather(*(store.run("bazi", "k1", "fp", _producer(calls, delay=0.05)) for _ in range(5)))
+
+    responses = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert {r.body for r in responses} == {b'{"n": 1}'}
+    assert store.waits == 4
+
+
+def test_scopes_and_ttl_keep_keys_apart():
+    store, calls = _store(ttl=0), []
+
+    async def scenario():
+        await store.run("bazi", "k1", "fp", _producer(calls))
+        await store.run("readings", "k1", "fp", _producer(calls))
+        await asyncio.sleep(0.01)
+        await store.run("bazi", "k1", "fp", _producer(calls))  # expired
+
+    asyncio.run(scenario())
+    assert len(calls) == 3
+
+
+def test_bad_keys_are_rejected():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_store().run("bazi", "x" * 256, "fp", _producer([])))
+    assert error.value.status_code == 400
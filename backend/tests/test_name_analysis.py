@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+import name_analysis
+from name_analysis import StrokeDictionary, analyze_name, build_strokes
+
+UNIHAN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "unihan")
+
+
+@pytest.fixture
+def strokes(tmp_path, monkeypatch):
+    """The shared stroke dictionary, built from the Unihan excerpt in tests/data."""
+    path = tmp_path / "kangxi_strokes.bin"
+    path.write_bytes(build_strokes(UNIHAN))
+    dictionary = name_analysis.stroke_dictionary
+    dictionary.close()
+    monkeypatch.setattr(dictionary, "path", str(path))
+    yield dictionary
+    dictionary.close()
+
+
+@pytest.mark.parametrize("char, count", [
+    ("娜", 10),  # 女 3 + 7
+    ("麗", 19),  # 鹿 11 + 8
+    ("丽", 19),  # simplified: counted as 麗
+    ("諸", 16),  # 言 7 + 9
+    ("诸", 16),
+    ("张", 11),
+    ("江", 7),  # 氵 counts as 水 (4)
+    ("王", 4),  # a radical itself: kTotalStrokes
+    ("三", 3),  # numerals count as their value
+])
+def test_kangxi_counts(strokes, char, count):
+    assert analyze_name(char, "娜")["characters"][0]["strokes"] == count
+
+
+def test_unknown_character_is_an_error(strokes):
+    with pytest.raises(ValueError, match="No Kangxi stroke count"):
+        analyze_name("张", "鑫")
+
+
+def test_missing_dictionary_is_unavailable(tmp_path):
+    with pytest.raises(RuntimeError, match="not found"):
+        StrokeDictionary(str(tmp_path / "missing.bin")).strokes("张")
+
+
+def test_analyze_name(strokes):
+    assert analyze_name("张", "丽娜") == {
+        "surname": "张",
+        "given_name": "丽娜",
+        "characters": [{"char": "张", "strokes": 11}, {"char": "丽", "strokes": 19}, {"char": "娜", "strokes": 10}],
+        "grids": [
+            {"name": "天格", "number": 12, "element": "木", "luck": "凶"},
+            {"name": "人格", "number": 30, "element": "水", "luck": "半吉"},
+            {"name": "地格", "number": 29, "element": "水", "luck": "吉"},
+            {"name": "外格", "number": 11, "element": "木", "luck": "吉"},
+            {"name": "总格", "number": 40, "element": "水", "luck": "凶"},
+        ],
+        "sancai": "木水水",
+        "use_god": None,
+        "grid_score": 57.5,
+        "sancai_score": 100.0,
+        "use_god_score": None,
+        "score": 66.0,
+    }
+    with_use_god = analyze_name("张", "丽娜", "water")
+    assert (with_use_god["use_god"], with_use_god["use_god_score"], with_use_god["score"]) == ("水", 100.0, 78.8)
@@ -0,0 +1,101 @@
+import asyncio
+from datetime import datetime
+
+from lru import LRUCache
+from reading_cache import ReadingHistoryCache
+from responses import dumps
+
+
+class FakeRedis:
+    """The few redis.asyncio calls the cache makes, on a dict."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class Pipeline:
+            def __init__(self):
+                self.keys = []
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def incr(self, key):
+                self.keys.append(key)
+
+            async def execute(self):
+                for key in self.keys:
+                    redis.data[key] = int(redis.data.get(key) or 0) + 1
+
+        return Pipeline()
+
+
+def _cache(redis=None, **kwargs):
+    cache = ReadingHistoryCache(redis_url="redis://test" if redis else "", **kwargs)
+    cache._redis = redis
+    return cache
+
+
+def test_both_tiers_render_the_same_timestamps():
+    redis = FakeRedis()
+    rows = [{"id": 1, "created_at": datetime(2026, 10, 19, 12, 45, 8, 211507)}]
+
+    async def load():
+        return rows
+
+    async def scenario():
+        local = await _cache(redis).get_or_load("k", 1, load)
+        shared = await _cache(redis).get_or_load("k", 1, load)  # another worker: served from Redis
+        return local, shared
+
+    local, shared = asyncio.run(scenario())
+    assert dumps(local) == dumps(shared) == b'[{"id":1,"created_at":"2026-10-19T12:45:08.211507"}]'
+
+
+def test_writes_invalidate_only_their_user():
+    cache, loads = _cache(), []
+
+    async def load():
+        loads.append(1)
+        return [len(loads)]
+
+    async def scenario():
+        await cache.get_or_load("u1", 1, load)
+        await cache.get_or_load("u2", 2, load)
+        await cache.get_or_load("all", None, load)
+        await cache.invalidate(1)
+        return [await cache.get_or_load(key, user, load) for key, user in (("u1", 1), ("u2", 2), ("all", None))]
+
+    assert asyncio.run(scenario()) == [[4], [2], [5]]
+
+
+def test_version_counters_are_bounded_and_stay_correct():
+    cache, loads = _cache(max_size=2), []
+    cache._entries = LRUCache(100)  # keep the outdated entry around
+
+    async def load():
+        loads.append(1)
+        return [len(loads)]
+
+    async def scenario():
+        first = await cache.get_or_load("u1", 1, load)
+        await cache.invalidate(1)
+        # Other writers push user 1's counter out of the LRU
+        for user_id in range(2, 10):
+            await cache.invalidate(user_id)
+        return first, await cache.get_or_load("u1", 1, load)
+
+    first, after = asyncio.run(scenario())
+    assert len(cache._versions) == 2
+    assert after != first  # the entry from before user 1's write is not served
@@ -0,0 +1,81 @@
+import pytest
+
+import reading_engines
+from reading_engines import ENGINES, HEXAGRAM_BY_LINES, TRIGRAMS, make_rng
+
+
+def _lines(upper: str, lower: str) -> int:
+    return TRIGRAMS[lower] | TRIGRAMS[upper] << 3
+
+
+def test_hexagram_table_is_king_wen():
+    assert sorted(HEXAGRAM_BY_LINES.tolist()) == list(range(1, 65))
+    assert HEXAGRAM_BY_LINES[0b111111] == 1  # 乾为天
+    assert HEXAGRAM_BY_LINES[0] == 2  # 坤为地
+    assert HEXAGRAM_BY_LINES[_lines("坎", "震")] == 3  # 水雷屯
+    assert HEXAGRAM_BY_LINES[_lines("坤", "乾")] == 11  # 地天泰
+    assert HEXAGRAM_BY_LINES[_lines("乾", "坤")] == 12  # 天地否
+    assert HEXAGRAM_BY_LINES[_lines("坤", "震")] == 24  # 地雷复
+    assert HEXAGRAM_BY_LINES[_lines("离", "离")] == 30
+    assert HEXAGRAM_BY_LINES[_lines("坎", "离")] == 63  # 水火既济
+    assert HEXAGRAM_BY_LINES[_lines("离", "坎")] == 64  # 火水未济
+    hexagram = reading_engines.HEXAGRAMS[10]
+    assert (hexagram["number"], hexagram["name"], hexagram["name_en"]) == (11, "泰", "Peace")
+
+
+@pytest.mark.parametrize("reading_type, options", [
+    ("tarot", {"cards": 3}),
+    ("iching", {}),
+])
+def test_seed_reproduces_draws(reading_type, options):
+    seed, first = reading_engines.run(reading_type, 5, **options)
+    assert reading_engines.run(reading_type, 5, seed, **options) == (seed, first)
+    assert reading_engines.run(reading_type, 5, seed + 1, **options)[1] != first
+
+
+@pytest.mark.parametrize("reading_type, options", [
+    ("tarot", {"cards": 3}),
+    ("iching", {}),
+])
+def test_first_batch_draw_equals_single_draw(reading_type, options):
+    engine = ENGINES[reading_type]
+    batch = engine.draw(make_rng(1234), 8, **options)
+    assert engine.draw(make_rng(1234), 1, **options) == batch[:1]
+
+
+def test_tarot_cards_are_distinct():
+    for draw in ENGINES["tarot"].draw(make_rng(7), 50, cards=7):
+        assert len({card["name"] for card in draw["cards"]}) == 7
+    with pytest.raises(ValueError):
+        ENGINES["tarot"].draw(make_rng(7), 1, cards=8)
+
+
+def test_iching_relating_hexagram_flips_old_lines():
+    for draw in ENGINES["iching"].draw(make_rng(99), 200):
+        yang = [line % 2 == 1 for line in draw["lines"]]
+        changing = [line in (6, 9) for line in draw["lines"]]
+        primary = sum(1 << i for i, y in enumerate(yang) if y)
+        relating = sum(1 << i for i, (y, c) in enumerate(zip(yang, changing)) if y != c)
+        assert draw["hexagram"]["number"] == HEXAGRAM_BY_LINES[primary]
+        if any(changing):
+            assert draw["relating_hexagram"]["number"] == HEXAGRAM_BY_LINES[relating]
+        else:
+            assert draw["relating_hexagram"] is None
+
+
+@pytest.mark.parametrize("birth_date, life_path", [
+    ("1992-11-29", 7),  # 34 -> 7
+    ("2000-01-08", 11),  # 11 stays
+    ("1989-01-01", 11),  # 29 -> 11 stays
+    ("1991-01-01", 22),  # 22 stays
+    ("1979-01-01", 1),  # 28 -> 10 -> 1
+])
+def test_life_path_keeps_master_numbers(birth_date, life_path):
+    (result,) = ENGINES["numerology"].draw(make_rng(0), 1, birth_dates=[birth_date])
+    assert result["life_path"] == life_path
+    assert result["meaning"] == reading_engines.LIFE_PATH_MEANINGS[life_path]
+
+
+def test_numerology_requires_a_birth_date():
+    with pytest.raises(ValueError):
+        ENGINES["numerology"].draw(make_rng(0), 1, birth_dates=[])
@@ -0,0 +1,111 @@
+import asyncio
+import os
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import select
+
+import db
+import models
+import reading_partitions
+from reading_partitions import archive_expired, archive_files, find_archived, read_archived
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.setenv("READINGS_ARCHIVE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _add(user_id, *created):
+    with db.SessionLocal() as session:
+        readings = [
+            models.Reading(user_id=user_id, type="tarot", input_data="{}", result=f'{{"i": {i}}}', created_at=at)
+            for i, at in enumerate(created)
+        ]
+        session.add_all(readings)
+        session.commit()
+        return [r.id for r in readings]
+
+
+def _hot_ids(user_id):
+    with db.SessionLocal() as session:
+        return session.scalars(select(models.Reading.id).where(models.Reading.user_id == user_id)).all()
+
+
+def test_archive_moves_expired_months_to_files(archive):
+    user_id = 7001
+    old = _add(user_id, datetime(2020, 1, 5), datetime(2020, 1, 20), datetime(2020, 2, 1))
+    recent = _add(user_id, datetime(2026, 10, 1))
+
+    moved = archive_expired(db.engine, retention_months=12, today=date(2026, 10, 19))
+    assert moved["2020-01"] == 2 and moved["2020-02"] == 1
+    assert _hot_ids(user_id) == recent
+    assert [month for month, _, _ in archive_files(str(archive))][:2] == [(2020, 2), (2020, 1)]
+
+    rows = read_archived(user_id=user_id, directory=str(archive))
+    assert [r["id"] for r in rows] == old[::-1]
+    assert rows[0]["result"] == '{"i": 2}' and rows[0]["created_at"] == "2020-02-01T00:00:00"
+    assert [r["id"] for r in read_archived(user_id=user_id, cursor=(datetime(2020, 1, 20), old[1]), directory=str(archive))] == [old[0]]
+    assert find_archived(old[1], directory=str(archive))["user_id"] == user_id
+    assert find_archived(recent[0], directory=str(archive)) is None
+
+
+def test_rows_inserted_during_export_are_kept(archive, monkeypatch):
+    user_id = 7002
+    exported = _add(user_id, datetime(2019, 3, 1))
+    export_month = reading_partitions._export_month
+    late = []
+
+    def export_then_insert(conn, table, month, directory):
+        result = export_month(conn, table, month, directory)
+        if month == (2019, 3):
+            late.extend(_add(user_id, datetime(2019, 3, 2)))  # committed after the export read the month
+        return result
+
+    monkeypatch.setattr(reading_partitions, "_export_month", export_then_insert)
+    assert archive_expired(db.engine, retention_months=12, today=date(2026, 10, 19))["2019-03"] == 1
+    assert _hot_ids(user_id) == late
+
+    monkeypatch.setattr(reading_partitions, "_export_month", export_month)
+    archive_expired(db.engine, retention_months=12, today=date(2026, 10, 19))
+    assert _hot_ids(user_id) == []
+    # The late row went to a second part of the month instead of being lost
+    assert sorted(r["id"] for r in read_archived(user_id=user_id, directory=str(archive))) == exported + late
+    assert sorted(part for month, part, _ in archive_files(str(archive)) if month == (2019, 3)) == [1, 2]
+
+
+def test_archive_loop_keeps_partitions_without_retention(monkeypatch):
+    calls = []
+    monkeypatch.setattr(reading_partitions, "READINGS_RETENTION_MONTHS", 0)
+    monkeypatch.setattr(reading_partitions, "ensure_partitions", lambda bind: calls.append(bind))
+    monkeypatch.setattr(reading_partitions, "archive_expired", lambda: {})
+
+    async def scenario():
+        task = asyncio.create_task(reading_partitions.archive_loop(0.01))
+        await asyncio.sleep(0.1)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert calls
+
+
+def test_find_archived_only_opens_files_covering_the_id(archive, monkeypatch):
+    user_id = 7003
+    ids = _add(user_id, datetime(2018, 5, 1), datetime(2018, 6, 1))
+    archive_expired(db.engine, retention_months=12, today=date(2026, 10, 19))
+    paths = {month: path for month, _, path in archive_files(str(archive))}
+    assert reading_partitions.archive_id_range(paths[(2018, 5)]) == (ids[0], ids[0])
+
+    opened = []
+    read_archive = reading_partitions._read_archive
+    monkeypatch.setattr(reading_partitions, "_read_archive", lambda path: opened.append(path) or read_archive(path))
+    assert find_archived(ids[1] + 10 ** 6, directory=str(archive)) is None
+    assert opened == []
+    assert find_archived(ids[1], directory=str(archive))["id"] == ids[1]
+    assert opened == [paths[(2018, 6)]]
+
+    # Files archived before the sidecars existed get one on first use
+    os.remove(f"{paths[(2018, 5)]}.ids")
+    assert find_archived(ids[0], directory=str(archive))["id"] == ids[0]
+    assert os.path.exists(f"{paths[(2018, 5)]}.ids")
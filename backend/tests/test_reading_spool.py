@@ -0,0 +1,185 @@
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+import db
+import models
+import reading_spool
+from reading_spool import CircuitBreaker, ReadingSpool, encode_record, read_records
+
+
+def _rows(n, user_id=None):
+    return [{"user_id": user_id, "type": "draw", "input_data": "{}", "result": f'{{"n": {i}}}'} for i in range(n)]
+
+
+def _run(coroutine):
+    async def wrapper():
+        try:
+            return await coroutine
+        finally:
+            await db.dispose_async_engine()  # the async engine is bound to this event loop
+
+    return asyncio.run(wrapper())
+
+
+def _count(user_id):
+    with db.SessionLocal() as session:
+        return len(session.scalars(select(models.Reading.id).where(models.Reading.user_id == user_id)).all())
+
+
+def test_torn_record_is_skipped(tmp_path):
+    path = tmp_path / "1.spool"
+    first, second = encode_record(_rows(1)), encode_record(_rows(2))
+    path.write_bytes(first + second[:-3])
+    records = list(read_records(str(path)))
+    assert records == [(len(first), json.loads(first[reading_spool.RECORD_HEADER.size:]))]
+
+    # A flipped byte fails the CRC the same way
+    corrupted = bytearray(first + second)
+    corrupted[-1] ^= 0xFF
+    path.write_bytes(bytes(corrupted))
+    assert len(list(read_records(str(path)))) == 1
+
+
+def test_claim_takes_own_and_dead_worker_spools(tmp_path):
+    spool = ReadingSpool(str(tmp_path), fsync_ms=0)
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    (tmp_path / f"{dead.pid}.spool").write_bytes(encode_record(_rows(1)))
+    (tmp_path / f"{os.getppid()}.spool").write_bytes(encode_record(_rows(1)))  # a live worker
+
+    async def scenario():
+        await spool.append(_rows(2))
+        await spool._claim()
+
+    asyncio.run(scenario())
+    claimed = sorted(os.path.basename(p).split(".")[0] for p in spool.pending_files())
+    assert claimed == sorted([str(os.getpid()), str(dead.pid)])
+    assert os.path.exists(tmp_path / f"{os.getppid()}.spool")
+
+
+def test_replay_loads_rows_and_removes_files(tmp_path):
+    spool = ReadingSpool(str(tmp_path), fsync_ms=0, batch=2)
+    user_id = 9001
+
+    async def scenario():
+        await spool.append(_rows(3, user_id))
+        await spool.append(_rows(2, user_id))
+        return await spool.replay()
+
+    assert _run(scenario()) == 5
+    assert _count(user_id) == 5
+    assert spool.pending_files() == []
+    assert not spool.has_pending()
+
+
+def test_two_workers_never_replay_the_same_file(tmp_path):
+    first, second = ReadingSpool(str(tmp_path), fsync_ms=0, batch=1), ReadingSpool(str(tmp_path), fsync_ms=0, batch=1)
+    user_id = 9002
+
+    async def scenario():
+        for i in range(20):
+            await first.append(_rows(1, user_id))
+        await first._claim()
+        return await asyncio.gather(first.replay(), second.replay())
+
+    assert sum(_run(scenario())) == 20
+    assert _count(user_id) == 20
+    assert first.pending_files() == []
+
+
+class _PgError(Exception):
+    def __init__(self, pgcode):
+        self.pgcode = pgcode
+
+
+def _sqlite_error(message, name):
+    error = sqlite3.OperationalError(message)
+    error.sqlite_errorname = name
+    return error
+
+
+@pytest.mark.parametrize("error, expected", [
+    (OperationalError("SELECT 1", {}, _PgError(None)), True),  # libpq could not connect
+    (OperationalError("SELECT 1", {}, _PgError("08006")), True),
+    (OperationalError("SELECT 1", {}, _PgError("57P01")), True),
+    (ConnectionRefusedError(), True),
+    (asyncio.TimeoutError(), True),
+    (OperationalError("INSERT", {}, sqlite3.OperationalError("no such table: readings")), False),
+    (OperationalError("INSERT", {}, _sqlite_error("unable to open database file", "SQLITE_CANTOPEN")), True),
+    (OperationalError("INSERT", {}, _PgError("53100")), False),  # disk full
+    (OSError(28, "No space left on device"), False),
+    (IntegrityError("INSERT", {}, Exception("bad row")), False),
+])
+def test_only_connection_failures_count_as_outage(error, expected):
+    assert reading_spool.is_connection_error(error) is expected
+
+
+def test_breaker_opens_and_lets_one_probe_through():
+    breaker = CircuitBreaker(failures=2, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.allow() and breaker.is_probe()
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() and not breaker.is_probe()
+
+
+@pytest.fixture
+def open_breaker(monkeypatch, tmp_path):
+    breaker = CircuitBreaker(failures=1, reset_seconds=0)
+    breaker.record_failure()
+    monkeypatch.setattr(reading_spool, "db_breaker", breaker)
+    monkeypatch.setattr(reading_spool, "reading_spool", ReadingSpool(str(tmp_path), fsync_ms=0))
+    return breaker
+
+
+class _Session:
+    async def rollback(self):
+        pass
+
+
+def _failing_insert(error):
+    async def insert_readings(session, rows):
+        raise error
+    return insert_readings
+
+
+def test_probe_with_a_bad_row_closes_the_breaker(open_breaker, monkeypatch):
+    monkeypatch.setattr(reading_spool, "insert_readings", _failing_insert(IntegrityError("INSERT", {}, Exception("bad row"))))
+    assert asyncio.run(reading_spool.save_readings(_Session(), _rows(1))) == []
+    assert open_breaker.state == "closed"
+    assert not reading_spool.reading_spool.has_pending()  # bad rows are not spooled
+
+
+def test_cancelled_probe_does_not_leave_the_breaker_stuck(open_breaker, monkeypatch):
+    async def hang(session, rows):
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(reading_spool, "insert_readings", hang)
+
+    async def scenario():
+        task = asyncio.create_task(reading_spool.save_readings(_Session(), _rows(1)))
+        await asyncio.sleep(0.01)
+        assert not open_breaker.allow()  # the probe is running
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert open_breaker.allow()  # the next caller may probe
+
+
+def test_failed_probe_spools_and_reopens(open_breaker, monkeypatch):
+    monkeypatch.setattr(reading_spool, "insert_readings", _failing_insert(ConnectionRefusedError("down")))
+    assert asyncio.run(reading_spool.save_readings(_Session(), _rows(2))) == []
+    assert reading_spool.reading_spool.spooled_rows == 2
+    assert open_breaker.opened_at is not None and not open_breaker.probing
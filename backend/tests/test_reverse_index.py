@@ -0,0 +1,65 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from bazi import build_chart
+from reverse_index import BRANCH_HOURS, ReverseIndex, day_to_iso, parse_pillar
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    index = ReverseIndex(str(tmp_path_factory.mktemp("reverse") / "reverse_index.bin"))
+    index.write()
+    return index
+
+
+def _pillar(p) -> int:
+    return parse_pillar(p.stem + p.branch)
+
+
+def test_parse_pillar():
+    assert [parse_pillar(p) for p in ("甲子", "乙丑", "丙寅", "庚午", "癸亥")] == [0, 1, 2, 6, 59]
+    for bad in ("", "甲", "甲丑", "子甲", "甲子丑", None):
+        with pytest.raises(ValueError):
+            parse_pillar(bad)
+
+
+def test_search_matches_a_brute_force_scan(index):
+    start, end = date(1990, 1, 1), date(1991, 12, 31)
+    charts = {}
+    day = start
+    while day <= end:
+        charts[day] = build_chart(datetime(day.year, day.month, day.day))
+        day += timedelta(days=1)
+    target = charts[date(1990, 5, 15)]
+    query = [_pillar(target.year_pillar), _pillar(target.month_pillar), _pillar(target.day_pillar)]
+
+    for pillars in (query, [query[0], None, query[2]], [None, query[1], None]):
+        found = [day_to_iso(d) for d in index.search(pillars, start_date=start, end_date=end)]
+        expected = [
+            d.isoformat() for d, chart in charts.items()
+            if all(p is None or _pillar(pillar) == p for p, pillar in zip(pillars, (chart.year_pillar, chart.month_pillar, chart.day_pillar)))
+        ]
+        assert found == expected
+        assert "1990-05-15" in found
+
+
+def test_hour_pillar_filters_by_day_stem(index):
+    day = [None, None, parse_pillar("丙午")]
+    # 日上起时: a 丙 day starts at 戊子, so its 巳 hour is 癸巳 and never 乙巳
+    assert index.search(day, hour_pillar=parse_pillar("癸巳")).tolist() == index.search(day).tolist()
+    assert not len(index.search(day, hour_pillar=parse_pillar("乙巳")))
+    chart = build_chart(datetime(1990, 5, 15), "10:30")
+    assert chart.hour_pillar.stem + chart.hour_pillar.branch == "癸巳"
+
+
+def test_branch_hours_match_build_chart():
+    for branch, hours in enumerate(BRANCH_HOURS):
+        for hour in hours:
+            chart = build_chart(datetime(1990, 5, 15), f"{hour:02d}:30")
+            assert parse_pillar(chart.hour_pillar.stem + chart.hour_pillar.branch) % 12 == branch
+
+
+def test_search_needs_a_pillar(index):
+    with pytest.raises(ValueError):
+        index.search([None, None, None])
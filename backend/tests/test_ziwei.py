@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import pytest
+
+import ziwei
+from ziwei import (
+    LIFE_PALACE,
+    NAYIN_NAMES,
+    PALACE_STEMS,
+    TIANFU_TABLE,
+    ZIWEI_TABLE,
+    hour_branch,
+    nayin_index,
+)
+
+
+def test_ziwei_table():
+    # 紫微 branch (子=0) for lunar days 1-6 in each 局
+    assert ZIWEI_TABLE[2][1:7] == [1, 2, 2, 3, 3, 4]
+    assert ZIWEI_TABLE[3][1:7] == [4, 1, 2, 5, 2, 3]
+    assert ZIWEI_TABLE[4][1:7] == [11, 4, 1, 2, 0, 5]
+    assert ZIWEI_TABLE[5][1:7] == [6, 11, 4, 1, 2, 7]
+    assert ZIWEI_TABLE[6][1:7] == [9, 6, 11, 4, 1, 2]
+    assert ZIWEI_TABLE[2][30] == 4
+    assert ZIWEI_TABLE[6][21] == 2
+
+
+def test_tianfu_mirrors_ziwei_on_the_yin_shen_axis():
+    assert TIANFU_TABLE[2] == 2 and TIANFU_TABLE[8] == 8  # 寅 / 申: same palace
+    assert TIANFU_TABLE[0] == 4  # 紫微 子 -> 天府 辰
+    assert all(TIANFU_TABLE[TIANFU_TABLE[z]] == z for z in range(12))
+
+
+def test_palace_rules():
+    assert LIFE_PALACE[1][0] == 2  # 正月子时: 命宫 寅
+    assert LIFE_PALACE[4][5] == 0  # 四月巳时: 命宫 子
+    assert PALACE_STEMS[0][2] == 2  # 甲年 寅宫 丙寅 (五虎遁)
+    assert PALACE_STEMS[6][2] == 4  # 庚年 寅宫 戊寅
+    assert [NAYIN_NAMES[nayin_index(s, b)] for s, b in ((0, 0), (2, 2), (4, 0), (8, 10))] == [
+        "海中金", "炉中火", "霹雳火", "大海水",
+    ]
+    assert [hour_branch(h) for h in (0, 1, 2, 11, 12, 22, 23)] == [0, 1, 1, 6, 6, 11, 0]
+
+
+def test_layout_places_every_star_once():
+    life, body, bureau, nayin, stars, sihua = ziwei.chart_layout(4, 21, 5, 6, 6)
+    codes = [code for branch in stars for code in branch]
+    assert sorted(codes) == list(range(len(ziwei.STARS)))
+    assert [ziwei.STARS[code] for code in sihua] == ["太阳", "武曲", "太阴", "天同"]
+
+
+def test_leap_month_rule():
+    pytest.importorskip("lunar_python")
+    # 2020 has a leap 4th month starting on 2020-05-23
+    assert ziwei.lunar_date(2020, 5, 23) == (2020, 4, 1)
+    assert ziwei.lunar_date(2020, 6, 10) == (2020, 5, 19)  # leap month day 19 counts as the 5th month
+    assert ziwei.lunar_date(2020, 6, 21) == (2020, 5, 1)
+
+
+def test_build_ziwei_chart():
+    pytest.importorskip("lunar_python")
+    chart = ziwei.build_ziwei_chart(datetime(1990, 5, 15), 10)
+    assert (chart["lunar_year"], chart["lunar_month"], chart["lunar_day"]) == (1990, 4, 21)
+    assert (chart["year_pillar"], chart["hour_branch"]) == ("庚午", "巳")
+    assert (chart["life_palace"], chart["body_palace"]) == ("子", "戌")
+    assert (chart["bureau"], chart["nayin"]) == ("火六局", "霹雳火")
+    assert chart["transformations"] == {"化禄": "太阳", "化权": "武曲", "化科": "太阴", "化忌": "天同"}
+    palaces = {p["name"]: p for p in chart["palaces"]}
+    assert palaces["命宫"]["stem"] + palaces["命宫"]["branch"] == "戊子"
+    assert [s["name"] for s in palaces["命宫"]["major_stars"]] == ["破军"]
+    assert [s["name"] for s in palaces["福德"]["major_stars"]] == ["紫微", "天府"]
+    assert [s["name"] for s in palaces["迁移"]["major_stars"]] == ["廉贞", "天相"]
+    assert [s["name"] for s in palaces["财帛"]["minor_stars"]] == ["禄存", "铃星", "天马"]
+    assert palaces["兄弟"]["major_stars"] == [{"name": "太阳", "transformation": "化禄"}]
+    assert [p["name"] for p in chart["palaces"] if p["is_body_palace"]] == ["夫妻"]
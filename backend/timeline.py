@@ -0,0 +1,170 @@
+"""
+大运 (luck pillars) and 流年 (annual pillars) timeline.
+
+大运 step through the sexagenary cycle from the month pillar: forward for a
+yang-year male or yin-year female, backward otherwise, ten years each. The
+start age is the simplified 三天一岁 rule: days from birth to the next
+month boundary (forward) or back to the previous one (backward), divided
+by three. Month boundaries follow compute_month_pillar (the 1st of the month).
+
+流年 use compute_year_pillar. Each period is compared with the natal day
+pillar (Ten God of its stem and branch, element relation, 六冲/六合 with the
+day branch); that comparison only depends on (day pillar, period pillar), so
+it is memoized and shared by every chart with the same day pillar.
+
+Everything is produced lazily: callers ask for a year range and only those
+years (and the luck pillars overlapping them) are computed.
+"""
+import os
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Iterator, Optional
+
+try:
+    from .bazi import (
+        BRANCH_HIDDEN_STEMS,
+        CHINESE_ZODIAC,
+        EARTHLY_BRANCHES,
+        FIVE_ELEMENTS,
+        HEAVENLY_STEMS,
+        compute_year_pillar,
+        element_relation,
+        get_ten_god,
+    )
+except ImportError:
+    from bazi import (
+        BRANCH_HIDDEN_STEMS,
+        CHINESE_ZODIAC,
+        EARTHLY_BRANCHES,
+        FIVE_ELEMENTS,
+        HEAVENLY_STEMS,
+        compute_year_pillar,
+        element_relation,
+        get_ten_god,
+    )
+
+TIMELINE_CACHE_SIZE = int(os.getenv("TIMELINE_CACHE_SIZE", "4096"))
+LUCK_PILLAR_YEARS = 10
+
+GENDER_ALIASES = {"male": "male", "m": "male", "男": "male", "female": "female", "f": "female", "女": "female"}
+
+
+def normalize_gender(gender: str) -> Optional[str]:
+    return GENDER_ALIASES.get((gender or "").strip().lower())
+
+
+def pillar_index(stem: str, branch: str) -> int:
+    """Position (0-59) of a stem/branch pair in the sexagenary cycle (甲子 = 0)."""
+    s, b = HEAVENLY_STEMS.index(stem), EARTHLY_BRANCHES.index(branch)
+    return (6 * s - 5 * b) % 60
+
+
+def pillar_from_index(index: int):
+    return HEAVENLY_STEMS[index % 10], EARTHLY_BRANCHES[index % 12]
+
+
+def branch_element(branch: str) -> str:
+    """Element of a branch, from its principal hidden stem."""
+    return FIVE_ELEMENTS[BRANCH_HIDDEN_STEMS[branch][0]]
+
+
+def _branch_relation(a: str, b: str) -> str:
+    i, j = EARTHLY_BRANCHES.index(a), EARTHLY_BRANCHES.index(b)
+    if (i - j) % 12 == 6:
+        return "冲"
+    if (i + j) % 12 == 1:
+        return "合"
+    return "无"
+
+
+@lru_cache(maxsize=TIMELINE_CACHE_SIZE)
+def period_analysis(day_stem: str, day_branch: str, period_index: int) -> tuple:
+    """
+    Interaction of one period pillar with the natal day pillar, as a tuple of
+    (key, value) pairs so the cached value cannot be mutated by callers.
+    """
+    stem, branch = pillar_from_index(period_index)
+    day_element = FIVE_ELEMENTS[day_stem]
+    return (
+        ("stem", stem),
+        ("branch", branch),
+        ("element", FIVE_ELEMENTS[stem]),
+        ("branch_element", branch_element(branch)),
+        ("ten_god", get_ten_god(day_stem, stem)),
+        ("branch_ten_god", get_ten_god(day_stem, BRANCH_HIDDEN_STEMS[branch][0])),
+        ("stem_relation", element_relation(day_element, FIVE_ELEMENTS[stem])),
+        ("branch_relation", element_relation(day_element, branch_element(branch))),
+        ("day_branch_interaction", _branch_relation(day_branch, branch)),
+    )
+
+
+def luck_direction(year_stem: str, gender: str) -> int:
+    """+1 (顺排) for a yang-year male or yin-year female, -1 (逆排) otherwise."""
+    is_yang = HEAVENLY_STEMS.index(year_stem) % 2 == 0
+    return 1 if is_yang == (gender == "male") else -1
+
+
+def luck_start_age(birth: datetime, direction: int) -> int:
+    """三天一岁: days to the next (forward) or previous (backward) month boundary / 3."""
+    if direction > 0:
+        next_month = date(birth.year + birth.month // 12, birth.month % 12 + 1, 1)
+        days = (next_month - birth.date()).days
+    else:
+        days = birth.day - 1
+    return max(1, round(days / 3))
+
+
+class Timeline:
+    """Lazy 大运 / 流年 timeline for one natal chart."""
+
+    def __init__(self, birth: datetime, chart, gender: str):
+        self.birth = birth
+        self.day_stem = chart.day_pillar.stem
+        self.day_branch = chart.day_pillar.branch
+        self.direction = luck_direction(chart.year_pillar.stem, gender)
+        self.start_age = luck_start_age(birth, self.direction)
+        self.month_index = pillar_index(chart.month_pillar.stem, chart.month_pillar.branch)
+
+    def _period(self, index: int) -> dict:
+        return dict(period_analysis(self.day_stem, self.day_branch, index))
+
+    def luck_pillar_number(self, year: int) -> Optional[int]:
+        """Which 大运 (1-based) is active in a calendar year; None before the first one."""
+        age = year - self.birth.year
+        if age < self.start_age:
+            return None
+        return (age - self.start_age) // LUCK_PILLAR_YEARS + 1
+
+    def luck_pillar(self, number: int) -> dict:
+        start_age = self.start_age + (number - 1) * LUCK_PILLAR_YEARS
+        period = self._period(self.month_index + self.direction * number)
+        period.update(
+            number=number,
+            start_age=start_age,
+            start_year=self.birth.year + start_age,
+            end_year=self.birth.year + start_age + LUCK_PILLAR_YEARS - 1,
+        )
+        return period
+
+    def iter_luck_pillars(self, start_year: int, end_year: int) -> Iterator[dict]:
+        """大运 overlapping [start_year, end_year]."""
+        number = self.luck_pillar_number(start_year) or 1
+        while True:
+            pillar = self.luck_pillar(number)
+            if pillar["start_year"] > end_year:
+                return
+            yield pillar
+            number += 1
+
+    def iter_years(self, start_year: int, end_year: int) -> Iterator[dict]:
+        """流年 for each calendar year in [start_year, end_year]."""
+        for year in range(start_year, end_year + 1):
+            year_pillar = compute_year_pillar(year)
+            period = self._period(pillar_index(year_pillar.stem, year_pillar.branch))
+            period.update(
+                year=year,
+                age=year - self.birth.year,
+                animal=CHINESE_ZODIAC[EARTHLY_BRANCHES.index(year_pillar.branch)],
+                luck_pillar=self.luck_pillar_number(year),
+            )
+            yield period
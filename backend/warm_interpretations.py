@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Offline job: pre-generate interpretations for every chart signature reachable
+in a date range and bulk-load them into the interpretation store.
+
+    python warm_interpretations.py --start 1940-01-01 --end 2025-12-31 --languages zh,en
+
+Signatures are enumerated with the same analyze_elements / analyze_use_god
+path as /bazi (every date x every two-hour block, plus "no birth time"). The
+prompt is built from the signature fields only (day pillar, balance, use and
+avoid god), so the stored text is valid for every chart with that signature.
+Generation runs on a rate-limited worker pool; finished interpretations are
+flushed to the store in batches, and signatures already in the store are
+skipped, so an interrupted run resumes where it stopped.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bazi import build_chart  # noqa: E402
+from interpretation_cache import FOCUS_OPTIONS, InterpretationStore, signature_for_chart  # noqa: E402
+import ai_service  # noqa: E402
+import llm_providers  # noqa: E402
+
+# One representative hour per two-hour block (子 丑 寅 ... 亥), plus no birth time
+BLOCK_HOURS = [None, "00:00", "01:00", "03:00", "05:00", "07:00", "09:00", "11:00", "13:00", "15:00", "17:00", "19:00", "21:00"]
+
+
+class RateLimiter:
+    """Token bucket shared by the worker threads."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+def enumerate_signatures(start: datetime, end: datetime, focuses, languages) -> Dict[str, Tuple[datetime, Optional[str]]]:
+    """Map each reachable signature to the first (date, time) that produces it."""
+    signatures: Dict[str, Tuple[datetime, Optional[str]]] = {}
+    day = start
+    while day <= end:
+        for birth_time in BLOCK_HOURS:
+            chart = build_chart(day, birth_time)
+            for language in languages:
+                for focus in focuses:
+                    signatures.setdefault(signature_for_chart(chart, focus, language), (day, birth_time))
+        day += timedelta(days=1)
+    return signatures
+
+
+def generate_one(signature: str, birth: datetime, birth_time: Optional[str], limiter: RateLimiter, retries: int) -> Optional[str]:
+    focus, language = signature.split("|")[-2:]
+    chart = build_chart(birth, birth_time)
+    analysis = chart.analysis
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        try:
+            text = ai_service.generate_signature_interpretation(
+                chart.day_pillar.dict(),
+                analysis.element_analysis.element_balance,
+                analysis.use_god,
+                analysis.avoid_god,
+                language=language,
+                analysis_focus=focus,
+            )
+            if text:
+                return text
+            print(f"Warning: {signature} attempt {attempt + 1} returned no text")
+        except Exception as e:
+            print(f"Warning: {signature} attempt {attempt + 1} failed: {e}")
+        if attempt < retries:
+            time.sleep(min(30, 2 ** attempt))
+    return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", default="1930-01-01", help="first birth date (YYYY-MM-DD)")
+    parser.add_argument("--end", default=datetime.utcnow().strftime("%Y-%m-%d"), help="last birth date (YYYY-MM-DD)")
+    parser.add_argument("--languages", default="zh", help="comma-separated language codes")
+    parser.add_argument("--focus", default=",".join(FOCUS_OPTIONS), help="comma-separated analysis focuses")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent generation workers")
+    parser.add_argument("--rate", type=float, default=2.0, help="max generation requests per second (0 = unlimited)")
+    parser.add_argument("--flush-every", type=int, default=50, help="bulk-load results every N interpretations")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--store", default=None, help="interpretation store path (default INTERPRETATION_CACHE_PATH)")
+    parser.add_argument("--dry-run", action="store_true", help="only count signatures")
+    args = parser.parse_args()
+
+    start = datetime.strptime(args.start, "%Y-%m-%d")
+    end = datetime.strptime(args.end, "%Y-%m-%d")
+    languages = [x.strip() for x in args.languages.split(",") if x.strip()]
+    focuses = [x.strip() for x in args.focus.split(",") if x.strip()]
+
+    t0 = time.time()
+    signatures = enumerate_signatures(start, end, focuses, languages)
+    store = InterpretationStore(args.store)
+    done = store.existing_signatures()
+    pending = [(sig, src) for sig, src in sorted(signatures.items()) if sig not in done]
+    print(f"{len(signatures)} signatures ({len(signatures) - len(pending)} already stored, "
+          f"{len(pending)} to generate) enumerated in {time.time() - t0:.1f}s")
+    if args.dry_run or not pending:
+        return 0
+    if llm_providers.get_provider("interpretation") is None:
+        print("Error: no LLM provider configured for interpretations (set OPENAI_API_KEY or LLM_* variables)")
+        return 1
+
+    limiter = RateLimiter(args.rate, burst=args.workers)
+    buffer = []
+    generated = failed = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        queue = iter(pending)
+        in_flight = {}
+        # Keep only a bounded number of tasks queued so an interrupt loses little work
+        for sig, (birth, birth_time) in queue:
+            in_flight[pool.submit(generate_one, sig, birth, birth_time, limiter, args.retries)] = sig
+            if len(in_flight) >= args.workers * 2:
+                break
+        try:
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    sig = in_flight.pop(future)
+                    text = future.result()
+                    if text:
+                        buffer.append((sig, text))
+                        generated += 1
+                    else:
+                        failed += 1
+                    nxt = next(queue, None)
+                    if nxt is not None:
+                        in_flight[pool.submit(generate_one, nxt[0], nxt[1][0], nxt[1][1], limiter, args.retries)] = nxt[0]
+                if len(buffer) >= args.flush_every:
+                    store.bulk_put(buffer)
+                    buffer.clear()
+                    print(f"  {generated}/{len(pending)} stored ({failed} failed)")
+        finally:
+            store.bulk_put(buffer)
+            llm_providers.close_providers()
+
+    print(f"Done: {generated} generated, {failed} failed in {time.time() - t0:.1f}s")
+    return 0 if failed == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
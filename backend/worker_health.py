@@ -0,0 +1,105 @@
+"""
+Per-worker health reporting.
+
+Each worker process counts its requests with a small ASGI middleware and
+exposes the numbers at /health/worker. When WORKER_STATUS_DIR is set (the
+production launcher sets it), every worker also writes a heartbeat file
+<pid>.json there, so `python serve.py --status` can show all workers at once,
+not just whichever one the load balancer picked.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Optional
+
+HEARTBEAT_INTERVAL = float(os.getenv("WORKER_HEARTBEAT_SECONDS", "5"))
+
+
+class WorkerStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """Called after fork so each worker reports its own numbers."""
+        self.pid = os.getpid()
+        self.started_at = time.time()
+        self.requests_total = 0
+        self.requests_in_flight = 0
+        self.errors_total = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "requests_total": self.requests_total,
+            "requests_in_flight": self.requests_in_flight,
+            "errors_total": self.errors_total,
+            "updated_at": time.time(),
+        }
+
+
+worker_stats = WorkerStats()
+
+
+class RequestStatsMiddleware:
+    """Pure ASGI middleware: counts HTTP requests and 5xx responses for this worker."""
+
+    def __init__(self, app, stats: WorkerStats = worker_stats):
+        self.app = app
+        self.stats = stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = self.stats
+        stats.requests_total += 1
+        stats.requests_in_flight += 1
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] >= 500:
+                stats.errors_total += 1
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            stats.errors_total += 1
+            raise
+        finally:
+            stats.requests_in_flight -= 1
+
+
+def _write_heartbeat(directory: str, snapshot: dict) -> None:
+    path = os.path.join(directory, f"{snapshot['pid']}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+async def heartbeat_loop(directory: str, interval: float = HEARTBEAT_INTERVAL) -> None:
+    """Write this worker's snapshot to <directory>/<pid>.json until cancelled."""
+    os.makedirs(directory, exist_ok=True)
+    try:
+        while True:
+            try:
+                _write_heartbeat(directory, worker_stats.snapshot())
+            except OSError as e:
+                print(f"Warning: Failed to write worker heartbeat: {e}")
+            await asyncio.sleep(interval)
+    finally:
+        try:
+            os.remove(os.path.join(directory, f"{os.getpid()}.json"))
+        except OSError:
+            pass
+
+
+def start_heartbeat() -> Optional[asyncio.Task]:
+    directory = os.getenv("WORKER_STATUS_DIR")
+    if not directory:
+        return None
+    return asyncio.create_task(heartbeat_loop(directory))
@@ -0,0 +1,224 @@
+"""
+Zi Wei Dou Shu (紫微斗数) charts.
+
+All placement rules are turned into small integer tables when the module is
+imported (indexes: branches 子=0 .. 亥=11, stems 甲=0 .. 癸=9), so building
+a chart is a handful of table lookups. A layout only depends on the lunar
+month, lunar day, hour branch and the year pillar, so layouts are memoized
+(ZIWEI_CACHE_SIZE) and shared by everyone born in the same 时辰 of the same
+lunar day.
+
+Rules used:
+- 命宫: from 寅 count forward to the birth month, then back by the hour;
+  身宫: forward by the hour. The twelve palaces run backward from 命宫.
+- Palace stems by 五虎遁 from the year stem; 五行局 from the 纳音 of the
+  命宫 stem and branch.
+- 紫微 from the 局 number and lunar day; the 紫微 series backward, 天府
+  mirrored on the 寅申 axis and the 天府 series forward.
+- 禄存 / 擎羊 / 陀罗, 天魁 / 天钺 and 四化 by year stem; 文昌 / 文曲 and
+  地空 / 地劫 by hour; 左辅 / 右弼 by month; 火星 / 铃星 and 天马 by year branch.
+- A leap month counts as its own month, or as the next month from day 16.
+
+The solar -> lunar conversion uses lunar_python when it is installed.
+"""
+import os
+from datetime import datetime
+from functools import lru_cache
+
+try:
+    from .bazi import EARTHLY_BRANCHES, HEAVENLY_STEMS, compute_year_pillar
+except ImportError:
+    from bazi import EARTHLY_BRANCHES, HEAVENLY_STEMS, compute_year_pillar
+
+try:
+    from lunar_python import Solar
+except ImportError:
+    Solar = None
+    print("Warning: lunar_python not installed, Ziwei charts are unavailable")
+
+ZIWEI_CACHE_SIZE = int(os.getenv("ZIWEI_CACHE_SIZE", "65536"))
+
+PALACE_NAMES = ["命宫", "兄弟", "夫妻", "子女", "财帛", "疾厄", "迁移", "交友", "官禄", "田宅", "福德", "父母"]
+
+MAJOR_STARS = ["紫微", "天机", "太阳", "武曲", "天同", "廉贞",
+               "天府", "太阴", "贪狼", "巨门", "天相", "天梁", "七杀", "破军"]
+MINOR_STARS = ["禄存", "擎羊", "陀罗", "天魁", "天钺", "文昌", "文曲", "左辅", "右弼",
+               "地空", "地劫", "火星", "铃星", "天马"]
+STARS = MAJOR_STARS + MINOR_STARS
+STAR_INDEX = {name: i for i, name in enumerate(STARS)}
+TRANSFORMATIONS = ["化禄", "化权", "化科", "化忌"]
+
+# 紫微 series: offsets (backward) from 紫微; 天府 series: offsets (forward) from 天府
+ZIWEI_SERIES = [("紫微", 0), ("天机", 1), ("太阳", 3), ("武曲", 4), ("天同", 5), ("廉贞", 8)]
+TIANFU_SERIES = [("天府", 0), ("太阴", 1), ("贪狼", 2), ("巨门", 3), ("天相", 4), ("天梁", 5), ("七杀", 6), ("破军", 10)]
+
+# 纳音五行 of each stem/branch pair in cycle order (甲子乙丑 海中金, 丙寅丁卯 炉中火, ...);
+# the 30 pairs repeat the same 15-element pattern twice
+NAYIN_PATTERN = ["金", "火", "木", "土", "金", "火", "水", "土", "金", "木", "水", "土", "火", "木", "水"]
+NAYIN_NAMES = [
+    "海中金", "炉中火", "大林木", "路旁土", "剑锋金", "山头火", "涧下水", "城头土", "白蜡金", "杨柳木",
+    "泉中水", "屋上土", "霹雳火", "松柏木", "长流水", "沙中金", "山下火", "平地木", "壁上土", "金箔金",
+    "覆灯火", "天河水", "大驿土", "钗钏金", "桑柘木", "大溪水", "沙中土", "天上火", "石榴木", "大海水",
+]
+BUREAU_NUMBERS = {"水": 2, "木": 3, "金": 4, "土": 5, "火": 6}
+BUREAU_NAMES = {2: "水二局", 3: "木三局", 4: "金四局", 5: "土五局", 6: "火六局"}
+
+# By year stem: 禄存, 天魁, 天钺 branches and the 四化 stars (禄, 权, 科, 忌)
+LUCUN_BRANCH = [2, 3, 5, 6, 5, 6, 8, 9, 11, 0]
+KUI_BRANCH = [1, 0, 11, 11, 1, 0, 1, 6, 3, 3]
+YUE_BRANCH = [7, 8, 9, 9, 7, 8, 7, 2, 5, 5]
+SIHUA = [
+    ("廉贞", "破军", "武曲", "太阳"),
+    ("天机", "天梁", "紫微", "太阴"),
+    ("天同", "天机", "文昌", "廉贞"),
+    ("太阴", "天同", "天机", "巨门"),
+    ("贪狼", "太阴", "右弼", "天机"),
+    ("武曲", "贪狼", "天梁", "文曲"),
+    ("太阳", "武曲", "太阴", "天同"),
+    ("巨门", "太阳", "文曲", "文昌"),
+    ("天梁", "紫微", "左辅", "武曲"),
+    ("破军", "巨门", "太阴", "贪狼"),
+]
+# By the year branch's 三合 group (branch % 4: 申子辰=0, 巳酉丑=1, 寅午戌=2, 亥卯未=3):
+# start branch of 火星 / 铃星 at 子时, and 天马
+HUO_START = [2, 3, 1, 9]
+LING_START = [10, 10, 3, 10]
+TIANMA_BRANCH = [2, 11, 8, 5]
+
+
+def _build_ziwei_table():
+    """ZIWEI_TABLE[局][day] -> branch of 紫微 (day 1-30)."""
+    table = {}
+    for bureau in BUREAU_NUMBERS.values():
+        row = [0] * 31
+        for day in range(1, 31):
+            quotient = -(-day // bureau)  # smallest q with q * bureau >= day
+            borrowed = quotient * bureau - day
+            position = 2 + quotient - 1  # count from 寅
+            position += borrowed if borrowed % 2 == 0 else -borrowed
+            row[day] = position % 12
+        table[bureau] = row
+    return table
+
+
+ZIWEI_TABLE = _build_ziwei_table()
+TIANFU_TABLE = [(4 - z) % 12 for z in range(12)]
+# 命宫 / 身宫 by (month 1-12, hour branch)
+LIFE_PALACE = [[(2 + m - 1 - h) % 12 for h in range(12)] for m in range(13)]
+BODY_PALACE = [[(2 + m - 1 + h) % 12 for h in range(12)] for m in range(13)]
+# 五虎遁: stem of each branch's palace by year stem
+PALACE_STEMS = [[((y % 5) * 2 + 2 + (b - 2) % 12) % 10 for b in range(12)] for y in range(10)]
+SIHUA_CODES = [tuple(STAR_INDEX[name] for name in row) for row in SIHUA]
+
+
+def nayin_index(stem: int, branch: int) -> int:
+    """Position (0-29) of a stem/branch pair among the 30 纳音 pairs."""
+    return ((6 * stem - 5 * branch) % 60) // 2
+
+
+def hour_branch(hour: int) -> int:
+    """时辰 branch of a clock hour, as in compute_hour_pillar (23:00 is 子时)."""
+    return ((hour + 1) // 2) % 12
+
+
+@lru_cache(maxsize=ZIWEI_CACHE_SIZE)
+def chart_layout(month: int, day: int, hour: int, year_stem: int, year_branch: int) -> tuple:
+    """
+    Integer layout: (命宫 branch, 身宫 branch, 局 number, 纳音 index,
+    stars per branch as 12 tuples of star codes, 四化 star codes).
+    Arguments are indexes (month 1-12, day 1-30, hour branch 0-11).
+    """
+    life = LIFE_PALACE[month][hour]
+    body = BODY_PALACE[month][hour]
+    nayin = nayin_index(PALACE_STEMS[year_stem][life], life)
+    bureau = BUREAU_NUMBERS[NAYIN_PATTERN[nayin % 15]]
+
+    positions = {}
+    ziwei = ZIWEI_TABLE[bureau][day]
+    for name, offset in ZIWEI_SERIES:
+        positions[name] = (ziwei - offset) % 12
+    tianfu = TIANFU_TABLE[ziwei]
+    for name, offset in TIANFU_SERIES:
+        positions[name] = (tianfu + offset) % 12
+
+    lucun = LUCUN_BRANCH[year_stem]
+    group = year_branch % 4
+    positions.update({
+        "禄存": lucun,
+        "擎羊": (lucun + 1) % 12,
+        "陀罗": (lucun - 1) % 12,
+        "天魁": KUI_BRANCH[year_stem],
+        "天钺": YUE_BRANCH[year_stem],
+        "文昌": (10 - hour) % 12,
+        "文曲": (4 + hour) % 12,
+        "左辅": (4 + month - 1) % 12,
+        "右弼": (10 - (month - 1)) % 12,
+        "地空": (11 - hour) % 12,
+        "地劫": (11 + hour) % 12,
+        "火星": (HUO_START[group] + hour) % 12,
+        "铃星": (LING_START[group] + hour) % 12,
+        "天马": TIANMA_BRANCH[group],
+    })
+
+    by_branch = [[] for _ in range(12)]
+    for name in STARS:
+        by_branch[positions[name]].append(STAR_INDEX[name])
+    return life, body, bureau, nayin, tuple(tuple(stars) for stars in by_branch), SIHUA_CODES[year_stem]
+
+
+@lru_cache(maxsize=ZIWEI_CACHE_SIZE)
+def lunar_date(year: int, month: int, day: int):
+    """Solar date -> (lunar year, month 1-12, day) with the leap-month rule above; needs lunar_python."""
+    if Solar is None:
+        raise RuntimeError("lunar_python is not installed")
+    lunar = Solar.fromYmd(year, month, day).getLunar()
+    year, month, day = lunar.getYear(), lunar.getMonth(), lunar.getDay()
+    if month < 0:
+        month = -month
+        if day > 15:
+            month = month % 12 + 1
+            if month == 1:
+                year += 1
+    return year, month, day
+
+
+def build_ziwei_chart(birth: datetime, hour: int) -> dict:
+    """Full chart for a solar birth date and clock hour (0-23)."""
+    lunar_year, month, day = lunar_date(birth.year, birth.month, birth.day)
+    year_pillar = compute_year_pillar(lunar_year)
+    year_stem = HEAVENLY_STEMS.index(year_pillar.stem)
+    year_branch = EARTHLY_BRANCHES.index(year_pillar.branch)
+    hour_index = hour_branch(hour)
+    life, body, bureau, nayin, stars, sihua = chart_layout(month, day, hour_index, year_stem, year_branch)
+
+    transformations = {code: TRANSFORMATIONS[i] for i, code in enumerate(sihua)}
+    palaces = []
+    for i, name in enumerate(PALACE_NAMES):
+        branch = (life - i) % 12
+        palaces.append({
+            "name": name,
+            "branch": EARTHLY_BRANCHES[branch],
+            "stem": HEAVENLY_STEMS[PALACE_STEMS[year_stem][branch]],
+            "major_stars": [
+                {"name": STARS[code], "transformation": transformations.get(code)}
+                for code in stars[branch] if code < len(MAJOR_STARS)
+            ],
+            "minor_stars": [
+                {"name": STARS[code], "transformation": transformations.get(code)}
+                for code in stars[branch] if code >= len(MAJOR_STARS)
+            ],
+            "is_body_palace": branch == body,
+        })
+    return {
+        "lunar_year": lunar_year,
+        "lunar_month": month,
+        "lunar_day": day,
+        "year_pillar": f"{year_pillar.stem}{year_pillar.branch}",
+        "hour_branch": EARTHLY_BRANCHES[hour_index],
+        "life_palace": EARTHLY_BRANCHES[life],
+        "body_palace": EARTHLY_BRANCHES[body],
+        "bureau": BUREAU_NAMES[bureau],
+        "nayin": NAYIN_NAMES[nayin],
+        "palaces": palaces,
+        "transformations": {TRANSFORMATIONS[i]: STARS[code] for i, code in enumerate(sihua)},
+    }
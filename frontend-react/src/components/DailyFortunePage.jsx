@@ -1,8 +1,41 @@
+import { useState } from 'react';
 import { translations } from '../utils/translations';
+import { API_BASE } from '../utils/constants';
 
 function DailyFortunePage({ onBack, language }) {
   const t = translations[language] || translations.en;
-  const pageT = t.dailyFortunePage || { title: 'Daily Fortune', description: "Today's fortune and auspicious tips. This feature is coming soon." };
+  const pageT = t.dailyFortunePage || { title: 'Daily Fortune', description: "Today's fortune and auspicious tips." };
+  const [birthDate, setBirthDate] = useState("");
+  const [loading, setLoading] = useState(false);
+  const [fortune, setFortune] = useState(null);
+  const [error, setError] = useState("");
+
+  const handleSubmit = async (e) => {
+    e.preventDefault();
+    if (!birthDate) return;
+    setLoading(true);
+    setError("");
+    try {
+      const params = new URLSearchParams({ birth_date: birthDate, language });
+      const res = await fetch(`${API_BASE}/fortune/daily?${params}`);
+      if (!res.ok) {
+        let errorMessage = `HTTP ${res.status}`;
+        try {
+          const err = await res.json();
+          errorMessage = err.detail || errorMessage;
+        } catch (e) {
+          // keep the status text
+        }
+        throw new Error(errorMessage);
+      }
+      setFortune(await res.json());
+    } catch (err) {
+      setFortune(null);
+      setError((pageT.error || "") + (err.message || String(err)));
+    } finally {
+      setLoading(false);
+    }
+  };
 
   return (
     <main className="main">
@@ -12,7 +45,34 @@ function DailyFortunePage({ onBack, language }) {
       <div className="page-section">
         <h2>{pageT.title}</h2>
         <p>{pageT.description}</p>
-        <p className="result-placeholder">{pageT.comingSoon || 'Coming soon.'}</p>
+        <form onSubmit={handleSubmit}>
+          <div className="form-group">
+            <label>{pageT.birthDate}</label>
+            <input
+              type="date"
+              value={birthDate}
+              onChange={(e) => setBirthDate(e.target.value)}
+            />
+          </div>
+          <button type="submit" className="btn btn-primary" disabled={loading || !birthDate}>
+            {loading ? pageT.loading : pageT.checkButton}
+          </button>
+        </form>
+        <div className="result-box">
+          {error ? (
+            <p>{error}</p>
+          ) : fortune ? (
+            <div>
+              <p>{fortune.date} · {pageT.dayPillar}：{fortune.day_pillar}</p>
+              <p>{pageT.dayMaster}：{fortune.day_master} · {pageT.tenGod}：{fortune.ten_god}</p>
+              <p>{pageT.rating}：{"★".repeat(fortune.rating)}{"☆".repeat(5 - fortune.rating)}</p>
+              <p>{fortune.text}</p>
+              <p>{pageT.luckyColor}：{fortune.lucky_color} · {pageT.luckyDirection}：{fortune.lucky_direction}</p>
+            </div>
+          ) : (
+            <p className="result-placeholder">{pageT.placeholder}</p>
+          )}
+        </div>
       </div>
     </main>
   );
@@ -1,8 +1,60 @@
+import { useState } from 'react';
 import { translations } from '../utils/translations';
+import { API_BASE } from '../utils/constants';
 
 function NameTestPage({ onBack, language }) {
   const t = translations[language] || translations.en;
-  const pageT = t.nameTestPage || { title: 'Name Test', description: 'Name strokes and five-elements analysis. This feature is coming soon.' };
+  const pageT = t.nameTestPage || { title: 'Name Test', description: 'Name strokes and five-elements analysis.' };
+  const [surname, setSurname] = useState("");
+  const [givenName, setGivenName] = useState("");
+  const [birthDate, setBirthDate] = useState("");
+  const [loading, setLoading] = useState(false);
+  const [analysis, setAnalysis] = useState(null);
+  const [error, setError] = useState("");
+
+  const handleSubmit = async (e) => {
+    e.preventDefault();
+    if (!surname || !givenName) return;
+    setLoading(true);
+    setError("");
+    try {
+      const res = await fetch(`${API_BASE}/name/analyze`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          surname: surname.trim(),
+          given_name: givenName.trim(),
+          birth_date: birthDate || null,
+        }),
+      });
+      if (res.status === 503) {
+        // Stroke dictionary missing on the server: nothing the user can fix by retyping
+        setAnalysis(null);
+        setError(pageT.unavailable || pageT.error);
+        return;
+      }
+      if (!res.ok) {
+        let errorMessage = `HTTP ${res.status}`;
+        try {
+          const err = await res.json();
+          if (Array.isArray(err.detail)) {
+            errorMessage = err.detail.map((d) => d.msg).join("; ");
+          } else {
+            errorMessage = err.detail || errorMessage;
+          }
+        } catch (e) {
+          // keep the status text
+        }
+        throw new Error(errorMessage);
+      }
+      setAnalysis(await res.json());
+    } catch (err) {
+      setAnalysis(null);
+      setError((pageT.error || "") + (err.message || String(err)));
+    } finally {
+      setLoading(false);
+    }
+  };
 
   return (
     <main className="main">
@@ -12,7 +64,45 @@ function NameTestPage({ onBack, language }) {
       <div className="page-section">
         <h2>{pageT.title}</h2>
         <p>{pageT.description}</p>
-        <p className="result-placeholder">{pageT.comingSoon || 'Coming soon.'}</p>
+        <form onSubmit={handleSubmit}>
+          <div className="form-group">
+            <label>{pageT.surname}</label>
+            <input type="text" maxLength={2} value={surname} onChange={(e) => setSurname(e.target.value)} />
+          </div>
+          <div className="form-group">
+            <label>{pageT.givenName}</label>
+            <input type="text" maxLength={2} value={givenName} onChange={(e) => setGivenName(e.target.value)} />
+          </div>
+          <div className="form-group">
+            <label>{pageT.birthDate}</label>
+            <input type="date" value={birthDate} onChange={(e) => setBirthDate(e.target.value)} />
+          </div>
+          <button type="submit" className="btn btn-primary" disabled={loading || !surname || !givenName}>
+            {loading ? pageT.loading : pageT.analyzeButton}
+          </button>
+        </form>
+        <div className="result-box">
+          {error ? (
+            <p className="result-error">{error}</p>
+          ) : analysis ? (
+            <div>
+              <p>
+                {pageT.strokes}：
+                {analysis.characters.map((c) => `${c.char} ${c.strokes}`).join(" · ")}
+              </p>
+              {analysis.grids.map((g) => (
+                <p key={g.name}>{g.name}：{g.number}（{g.element}，{g.luck}）</p>
+              ))}
+              <p>
+                {pageT.sancai}：{analysis.sancai}
+                {analysis.use_god ? ` · ${pageT.useGod}：${analysis.use_god}` : ""}
+              </p>
+              <p>{pageT.score}：{analysis.score}</p>
+            </div>
+          ) : (
+            <p className="result-placeholder">{pageT.placeholder}</p>
+          )}
+        </div>
       </div>
     </main>
   );
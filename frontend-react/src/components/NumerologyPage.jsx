@@ -1,5 +1,6 @@
 import { useState } from 'react';
 import { translations } from '../utils/translations';
+import { API_BASE } from '../utils/constants';
 import { reduceToDigit, getLifePathMeaning } from '../utils/helpers';
 
 function NumerologyPage({ onBack, language }) {
@@ -7,15 +8,29 @@ function NumerologyPage({ onBack, language }) {
   const [birthDate, setBirthDate] = useState("");
   const [result, setResult] = useState("");
 
-  const handleSubmit = (e) => {
+  const handleSubmit = async (e) => {
     e.preventDefault();
     if (!birthDate) {
       setResult(t.numerologyPage.errorNoDate);
       return;
     }
-    const digits = birthDate.replace(/-/g, "");
-    const lifePath = reduceToDigit(digits);
-    const meaning = getLifePathMeaning(lifePath);
+    let lifePath;
+    let meaning;
+    try {
+      const res = await fetch(`${API_BASE}/draw/numerology`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ birth_date: birthDate }),
+      });
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      const data = await res.json();
+      lifePath = data.result.life_path;
+      meaning = data.result.meaning;
+    } catch (_) {
+      // 后端不可用时在本地计算
+      lifePath = reduceToDigit(birthDate.replace(/-/g, ""));
+      meaning = getLifePathMeaning(lifePath);
+    }
     setResult(`${t.numerologyPage.lifePath} ${lifePath}: ${meaning}`);
   };
 
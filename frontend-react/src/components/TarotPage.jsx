@@ -1,15 +1,28 @@
 import { useState } from 'react';
 import { translations } from '../utils/translations';
-import { TAROT_DECK } from '../utils/constants';
+import { API_BASE, TAROT_DECK } from '../utils/constants';
 import { sample } from '../utils/helpers';
 
 function TarotPage({ onBack, language }) {
   const t = translations[language] || translations.zh;
   const [result, setResult] = useState("");
 
-  const draw = () => {
-    const card = sample(TAROT_DECK);
-    setResult(`${card.name}: ${card.message}`);
+  // 服务端抽牌（可复现、会保存记录）；后端不可用时在本地抽
+  const draw = async () => {
+    try {
+      const res = await fetch(`${API_BASE}/draw/tarot`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ cards: 1 }),
+      });
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      const data = await res.json();
+      const card = data.result.cards[0];
+      setResult(`${card.name}: ${card.message}`);
+    } catch (_) {
+      const card = sample(TAROT_DECK);
+      setResult(`${card.name}: ${card.message}`);
+    }
   };
 
   return (
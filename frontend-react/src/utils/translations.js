@@ -242,11 +242,34 @@ export const translations = {
       title: "姓名测试",
       description: "解析姓名笔画与五行数理，了解名字与命运的关联。",
       comingSoon: "功能即将上线，敬请期待。",
+      surname: "姓",
+      givenName: "名",
+      birthDate: "出生日期（可选，用于结合用神）",
+      analyzeButton: "开始测试",
+      loading: "分析中...",
+      placeholder: "输入姓名，查看笔画、五格与三才。",
+      strokes: "康熙笔画",
+      sancai: "三才",
+      useGod: "用神",
+      score: "综合评分",
+      error: "分析失败：",
+      unavailable: "姓名测试暂时无法使用，请稍后再试。",
     },
     dailyFortunePage: {
       title: "今日运势",
       description: "查看今日运势、宜忌与开运建议。",
       comingSoon: "功能即将上线，敬请期待。",
+      birthDate: "出生日期",
+      checkButton: "查看今日运势",
+      loading: "查询中...",
+      placeholder: "输入出生日期，查看日主今日运势。",
+      dayPillar: "今日日柱",
+      dayMaster: "日主",
+      tenGod: "十神",
+      rating: "运势指数",
+      luckyColor: "幸运色",
+      luckyDirection: "幸运方位",
+      error: "获取运势失败：",
     },
     checkInPage: {
       title: "每日签到 + 运势提醒",
@@ -572,11 +595,34 @@ export const translations = {
       title: "Name Test",
       description: "Analyze name strokes and five-elements; explore the link between name and destiny.",
       comingSoon: "Coming soon.",
+      surname: "Surname",
+      givenName: "Given name",
+      birthDate: "Birth date (optional, matches the Useful God)",
+      analyzeButton: "Analyze",
+      loading: "Analyzing...",
+      placeholder: "Enter a Chinese name to see its strokes, five grids and three talents.",
+      strokes: "Kangxi strokes",
+      sancai: "Three talents",
+      useGod: "Useful God",
+      score: "Overall score",
+      error: "Analysis failed: ",
+      unavailable: "Name analysis is temporarily unavailable. Please try again later.",
     },
     dailyFortunePage: {
       title: "Daily Fortune",
       description: "Today's fortune, auspicious tips and advice.",
       comingSoon: "Coming soon.",
+      birthDate: "Birth date",
+      checkButton: "Show today's fortune",
+      loading: "Loading...",
+      placeholder: "Enter your birth date to see today's fortune for your Day Master.",
+      dayPillar: "Today's day pillar",
+      dayMaster: "Day Master",
+      tenGod: "Ten God",
+      rating: "Rating",
+      luckyColor: "Lucky color",
+      luckyDirection: "Lucky direction",
+      error: "Failed to load fortune: ",
     },
     checkInPage: {
       title: "Daily Check-in + Fortune",
@@ -902,11 +948,34 @@ export const translations = {
       title: "Whakamātautau Ingoa",
       description: "Tātari ngā tōhu ingoa me ngā rima; tūhura te hononga ingoa me te oranga.",
       comingSoon: "Ka tae mai ā tōna wā.",
+      surname: "Ingoa whānau",
+      givenName: "Ingoa",
+      birthDate: "Rā whānau (kōwhiri)",
+      analyzeButton: "Tātari",
+      loading: "E tātari ana...",
+      placeholder: "Tāurua he ingoa Hainamana kia kite i ōna tōhu me ōna mātiti e rima.",
+      strokes: "Tōhu Kangxi",
+      sancai: "Ngā pūmanawa e toru",
+      useGod: "Atua whaihua",
+      score: "Kaute katoa",
+      error: "I rahua te tātari: ",
+      unavailable: "Kāore e wātea ana te tātari ingoa i tēnei wā. Tēnā, whakamātau anō ā muri ake.",
     },
     dailyFortunePage: {
       title: "Waimarie o te Rā",
       description: "Te waimarie o tēnei rā me ngā tohutohu.",
       comingSoon: "Ka tae mai ā tōna wā.",
+      birthDate: "Rā whānau",
+      checkButton: "Tirohia te waimarie o tēnei rā",
+      loading: "E uta ana...",
+      placeholder: "Whakauru tō rā whānau kia kite i te waimarie o tēnei rā.",
+      dayPillar: "Pou o te rā",
+      dayMaster: "Rangatira Rā",
+      tenGod: "Atua Tekau",
+      rating: "Tohu waimarie",
+      luckyColor: "Tae waimarie",
+      luckyDirection: "Aronga waimarie",
+      error: "I rahua te tiki waimarie: ",
     },
     checkInPage: {
       title: "Tāuru o te Rā + Whakamaharatanga",